@@ -3,11 +3,17 @@
 """
 ExecutorAgent Pool
 管理多个 ExecutorAgent 实例，支持并发执行
+
+调度方式：所有子问题进入池内共享的优先级工作队列，每个 Agent 对应一个 worker，
+空闲的 worker 立即领取下一个子问题（work stealing），慢问题不会阻塞排在同一 Agent 后面的问题
 """
 
 import asyncio
+import itertools
 import logging
-from typing import List, Dict
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
 from psycopg_pool import AsyncConnectionPool
 from concurrent_log_handler import ConcurrentRotatingFileHandler
 
@@ -19,15 +25,32 @@ from agents.executoragent import ExecutorAgent
 from core.config import Config
 from langchain_core.messages import HumanMessage
 from core.log_config import setup_logger
+from core.url_registry import UrlRegistry
 
 # 设置日志
 logger = setup_logger(__name__)
 
 
+@dataclass
+class WorkItem:
+    """工作队列中的一个子问题"""
+    question: str
+    thread_id: str
+    user_id: str
+    url_pool: List[str]
+    user_query: str
+    future: asyncio.Future
+    url_registry: Optional[UrlRegistry] = None  # 两阶段并发执行时共享的 URL 登记表
+    enqueued_at: float = field(default_factory=time.monotonic)
+    queue_wait: Optional[float] = None  # 入队到被 worker 领取的等待时间（秒）
+
+
 class ExecutorAgentPool:
     """ExecutorAgent 池
     
     管理多个 ExecutorAgent 实例，支持并发执行多个子问题
+    每个 Agent 同一时刻只处理一个子问题；子问题按 (优先级, 入队顺序) 由空闲 Agent 领取，
+    多个请求并发调用 execute_questions 时共享同一个队列
     """
     
     def __init__(
@@ -47,7 +70,12 @@ class ExecutorAgentPool:
         self.pool_size = pool_size
         self.model = model
         self.agents: List[ExecutorAgent] = []
-        self.agent_locks: List[asyncio.Lock] = []
+        
+        # 工作队列与 worker 绑定在首次使用时的事件循环上，延迟创建
+        self._queue: Optional["asyncio.PriorityQueue[Tuple[int, int, WorkItem]]"] = None
+        self._workers: List[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._sequence = itertools.count()
         
         self._initialize_agents()
         
@@ -58,11 +86,61 @@ class ExecutorAgentPool:
         for i in range(self.pool_size):
             agent = ExecutorAgent(self.pool, self.model)
             self.agents.append(agent)
-            self.agent_locks.append(asyncio.Lock())
             logger.debug(f"创建 ExecutorAgent {i+1}/{self.pool_size}")
         
         logger.info(f"成功创建 {len(self.agents)} 个 ExecutorAgent 实例")
     
+    def _ensure_workers(self) -> "asyncio.PriorityQueue[Tuple[int, int, WorkItem]]":
+        """在当前事件循环中启动工作队列与各 Agent 的 worker（已启动时直接返回队列）"""
+        loop = asyncio.get_running_loop()
+        if self._queue is None or self._loop is not loop or all(worker.done() for worker in self._workers):
+            self._queue = asyncio.PriorityQueue()
+            self._loop = loop
+            self._workers = [
+                asyncio.create_task(self._worker(agent_id, agent))
+                for agent_id, agent in enumerate(self.agents)
+            ]
+            logger.info(f"ExecutorAgentPool 工作队列已启动: {len(self._workers)} 个 worker")
+        return self._queue
+    
+    async def _worker(self, agent_id: int, agent: ExecutorAgent) -> None:
+        """绑定单个 Agent 的 worker：循环领取队列中的子问题并执行"""
+        assert self._queue is not None
+        queue = self._queue
+        while True:
+            _, _, item = await queue.get()
+            try:
+                if item.future.done():  # 调用方已取消
+                    continue
+                item.queue_wait = time.monotonic() - item.enqueued_at
+                logger.info(
+                    f"Agent {agent_id} 领取子问题 '{item.question}' (thread_id={item.thread_id}), "
+                    f"排队 {item.queue_wait:.2f}s, 队列剩余 {queue.qsize()}"
+                )
+                task = asyncio.create_task(self._invoke_agent_with_message(
+                    agent, item.question, item.thread_id, item.user_id, item.url_pool, item.user_query,
+                    item.url_registry
+                ))
+                # 调用方取消等待时同时取消正在执行的子问题
+                item.future.add_done_callback(lambda future, task=task: task.cancel() if future.cancelled() else None)
+                try:
+                    result = await task
+                except asyncio.CancelledError:
+                    if item.future.cancelled() and task.cancelled():
+                        continue
+                    # worker 自身被取消（清理资源），让调用方不再等待
+                    if not item.future.done():
+                        item.future.cancel()
+                    raise
+                except Exception as e:
+                    if not item.future.done():
+                        item.future.set_exception(e)
+                    continue
+                if not item.future.done():
+                    item.future.set_result(result)
+            finally:
+                queue.task_done()
+    
     async def execute_questions(
         self,
         questions: List[str],
@@ -70,7 +148,9 @@ class ExecutorAgentPool:
         base_thread_id: str,
         user_id: str ,
         url_pool: List[str],
-        
+        on_result: Optional[Callable[[Dict], Awaitable[None]]] = None,
+        priorities: Optional[List[int]] = None,
+        url_registry: Optional[UrlRegistry] = None,
     ) -> tuple[List[Dict], List[str]]:
         """并发执行多个子问题
 
@@ -80,9 +160,14 @@ class ExecutorAgentPool:
             user_id: 用户标识
             url_pool: 全局 URL 池（用于去重）
             user_query: 用户原始查询
+            on_result: 可选回调，每个子问题执行成功后立即以其结果调用（用于流式入库），
+                回调异常只记录日志，不影响执行结果
+            priorities: 可选，与 questions 对齐的优先级，数值越小越先被领取（默认均为 0，按入队顺序）
+            url_registry: 可选，共享 URL 登记表；提供时各 executor 下载前先认领 URL，已被认领的跳过
 
         Returns:
             tuple[List[Dict], List[str]]: (所有 ExecutorAgent 的结果列表, 更新后的 URL 池)
+            每个结果额外包含 queue_wait_seconds（该子问题在队列中的等待时间）
         """
         if not questions:
             logger.warning("没有子问题需要执行，planer 可能没有正确分解问题，或者所有子问题都被过滤掉了")
@@ -91,29 +176,47 @@ class ExecutorAgentPool:
         if url_pool is None:
             url_pool = []
             logger.warning("未提供 URL 池，使用空列表作为初始 URL 池,如果是第一次executor，这是正常的；如果是第二次executor，原则上来讲不应该为空")
+        if priorities is not None and len(priorities) != len(questions):
+            raise ValueError(f"priorities 长度 {len(priorities)} 与 questions 长度 {len(questions)} 不一致")
         logger.info(f"开始并发执行 {len(questions)} 个子问题 (user_id={user_id}, url_pool_size={len(url_pool)})")
 
-        # 创建任务列表
+        # 子问题全部入队，由空闲的 Agent 领取
+        queue = self._ensure_workers()
+        loop = asyncio.get_running_loop()
+        items: List[WorkItem] = []
         tasks = []
         for i, question in enumerate(questions):
-            # 使用轮询方式分配 Agent
-            agent = self.agents[i % self.pool_size]
-            agent_lock = self.agent_locks[i % self.pool_size]
             thread_id = f"{base_thread_id}_executor_{i}"
-
-            # 创建异步任务（传递新参数）
-            task = self._invoke_agent_with_message(
-                agent, agent_lock, question, thread_id, user_id, url_pool, user_query
+            item = WorkItem(
+                question=question,
+                thread_id=thread_id,
+                user_id=user_id,
+                url_pool=list(url_pool),
+                user_query=user_query,
+                future=loop.create_future(),
+                url_registry=url_registry,
             )
+            priority = priorities[i] if priorities is not None else 0
+            queue.put_nowait((priority, next(self._sequence), item))
+            items.append(item)
+
+            task = self._await_item(item)
+            if on_result is not None:
+                task = self._notify_on_result(task, on_result)
             tasks.append(task)
 
-            logger.debug(f"分配子问题 {i+1} 到 Agent {i % self.pool_size}")
+            logger.debug(f"子问题 {i+1} 入队, priority={priority}")
 
-        # 并发执行所有任务，使用 return_exceptions=True 确保单个失败不影响其他
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        # 并发等待所有子问题，使用 return_exceptions=True 确保单个失败不影响其他
+        try:
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for item in items:
+                if not item.future.done():
+                    item.future.cancel()
 
         # 处理结果
-        valid_results = [] # 结构是[{"sub_url_pool": ..., "downloaded_papers": ...}...]
+        valid_results = [] # 结构是[{"sub_url_pool": ..., "downloaded_papers": ..., "queue_wait_seconds": ...}...]
         all_sub_url_pools = []
         failed_count = 0
 
@@ -131,20 +234,42 @@ class ExecutorAgentPool:
         # 全局去重合并 URL 池
         updated_url_pool = list(set(url_pool + all_sub_url_pools))
 
+        waits = [item.queue_wait for item in items if item.queue_wait is not None]
         logger.info(f"并发执行完成: 成功 {len(valid_results)}/{len(questions)}, 失败 {failed_count}")
+        if waits:
+            logger.info(f"子问题排队时间: 平均 {sum(waits) / len(waits):.2f}s, 最长 {max(waits):.2f}s")
         logger.info(f"URL 池更新: {len(url_pool)} -> {len(updated_url_pool)} 个 URL")
 
         return valid_results, updated_url_pool
 
+    async def _await_item(self, item: WorkItem) -> Dict:
+        """等待子问题执行完成，并附上排队时间"""
+        result = await item.future
+        result["queue_wait_seconds"] = item.queue_wait
+        return result
+
+    async def _notify_on_result(
+        self,
+        task: Awaitable[Dict],
+        on_result: Callable[[Dict], Awaitable[None]]
+    ) -> Dict:
+        """等待单个子问题完成后立即把结果交给 on_result（Agent 已可领取下一个子问题）"""
+        result = await task
+        try:
+            await on_result(result)
+        except Exception as e:
+            logger.error(f"executor_pool 结果回调失败: {e}")
+        return result
+
     async def _invoke_agent_with_message(
         self,
         agent: ExecutorAgent,
-        agent_lock: asyncio.Lock,
         question: str,
         thread_id: str,
         user_id: str,
         url_pool: List[str],
-        user_query: str
+        user_query: str,
+        url_registry: Optional[UrlRegistry] = None
     ) -> Dict:
         """执行单个 ExecutorAgent，正确初始化 executor_messages
 
@@ -155,44 +280,51 @@ class ExecutorAgentPool:
             user_id: 用户标识
             url_pool: 全局 URL 池
             user_query: 用户原始查询
+            url_registry: 共享 URL 登记表（可选）
 
         Returns:
             执行结果（包含 sub_url_pool）
         """
-        async with agent_lock:
-            # 确保异步资源已初始化 self.agents 中的每个 Agent 都已正确初始化
-            await agent._ensure_initialized()
+        # 确保异步资源已初始化 self.agents 中的每个 Agent 都已正确初始化
+        await agent._ensure_initialized()
 
-            try:
-                logger.info(f"executor_pool开始处理子问题 '{question}' (user_id={user_id}, thread_id={thread_id})")
-                result = await agent.ainvoke(query=question, thread_id=thread_id,user_id=user_id, sub_url_pool=list(url_pool),user_query=user_query )
-                logger.info(f"executor 完成子问题 '{question}' 的处理")
-                sub_url_pool = result.get("sub_url_pool", [])
-                downloaded_papers = result.get("downloaded_papers", [])
-                if not sub_url_pool:
-                    logger.warning(f"executor_pool中 完成{question}后sub_url_pool 为空")
-                else:
-                    logger.info(f"executor_pool中 完成{question}后 sub_url_pool 包含 {len(sub_url_pool)} 个 URL")
-                if not downloaded_papers:
-                    logger.warning(f"executor_pool中 完成{question}后 downloaded_papers 为空")
-                else:
-                    logger.info(f"executor_pool中 完成{question}后 downloaded_papers 包含 {len(downloaded_papers)} 个结果")
+        try:
+            logger.info(f"executor_pool开始处理子问题 '{question}' (user_id={user_id}, thread_id={thread_id})")
+            result = await agent.ainvoke(query=question, thread_id=thread_id,user_id=user_id, sub_url_pool=list(url_pool),user_query=user_query, url_registry=url_registry)
+            logger.info(f"executor 完成子问题 '{question}' 的处理")
+            sub_url_pool = result.get("sub_url_pool", [])
+            downloaded_papers = result.get("downloaded_papers", [])
+            if not sub_url_pool:
+                logger.warning(f"executor_pool中 完成{question}后sub_url_pool 为空")
+            else:
+                logger.info(f"executor_pool中 完成{question}后 sub_url_pool 包含 {len(sub_url_pool)} 个 URL")
+            if not downloaded_papers:
+                logger.warning(f"executor_pool中 完成{question}后 downloaded_papers 为空")
+            else:
+                logger.info(f"executor_pool中 完成{question}后 downloaded_papers 包含 {len(downloaded_papers)} 个结果")
 
-                # 返回完整结果，包括 sub_url_pool
-                return {
-                    "sub_url_pool":sub_url_pool,
-                    "downloaded_papers": downloaded_papers
-                }
-            except Exception as e:
-                logger.error(f"executor 处理子问题 '{question}' 时出错: {e}")
-                import traceback
-                traceback.print_exc()
-                raise e
+            # 返回完整结果，包括 sub_url_pool
+            return {
+                "sub_url_pool":sub_url_pool,
+                "downloaded_papers": downloaded_papers
+            }
+        except Exception as e:
+            logger.error(f"executor 处理子问题 '{question}' 时出错: {e}")
+            import traceback
+            traceback.print_exc()
+            raise e
     
     async def cleanup(self):
         """清理所有 Agent 资源"""
         logger.info("开始清理 ExecutorAgentPool 资源")
         
+        # 停止工作队列的 worker
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+        
         cleanup_tasks = []
         for i, agent in enumerate(self.agents):
             task = agent._clean()
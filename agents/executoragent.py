@@ -5,13 +5,15 @@ from langgraph.prebuilt import ToolNode
 from core.config import Config
 from core.llms import lang_llm
 from core.mcp.context7_grep import Context7GrepMCPClient
-from typing import TypedDict, Annotated, List, Dict, Any
+from typing import TypedDict, Annotated, List, Dict, Any, Optional
 from langgraph.graph import add_messages, StateGraph, START, END, state
 from langchain_openai import ChatOpenAI, OpenAIEmbeddings
 from langchain_core.messages import AnyMessage, AIMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from mcp.types import TextContent
 from langgraph.checkpoint.postgres.aio import AsyncPostgresSaver
 from psycopg_pool import AsyncConnectionPool
+from core.url_registry import UrlRegistry
 import logging, json, asyncio, os
 from concurrent_log_handler import ConcurrentRotatingFileHandler
 from core.mcp.tools import get_tools
@@ -54,6 +56,8 @@ class ExecutorAgent:
         # 下载工具单独获取
         self.download_tools: list[BaseTool] = None  # 延迟加载
         self._context7_grep_client = None
+        # 两阶段并发执行时共享的 URL 登记表（按 thread_id，不写入检查点状态）
+        self._url_registries: Dict[str, UrlRegistry] = {}
         if pool:
             self.memory = AsyncPostgresSaver(pool) # 异步持久化存储
         else:
@@ -759,14 +763,17 @@ class ExecutorAgent:
 
         return deduplicated
 
-    async def _clean_node(self, state: ExecutorState) -> dict:
+    async def _clean_node(self, state: ExecutorState, config: RunnableConfig) -> dict:
         """
         清洗和去重节点
 
         1. 合并 search_results 和 optional_search_results
         2. 根据 URL 去重（优先级：wiki > tavily > exa > optional）
         3. 更新 sub——url_pool
+        4. 提供共享 URL 登记表时，只保留本 executor 认领成功的 URL，已被其他 executor 认领的跳过
         """
+        thread_id = (config or {}).get("configurable", {}).get("thread_id", "")
+        url_registry = self._url_registries.get(thread_id)
         try:
             search_results = state.get("search_results", [])
             optional_search_results = state.get("optional_search_results", [])
@@ -834,6 +841,8 @@ class ExecutorAgent:
                 url = paper.get("url")
                 if url and url in pool_set:
                     continue
+                if url and url_registry is not None and not await url_registry.claim(url, thread_id):
+                    continue
                 if url:
                     pool_set.add(url)
             filtered_search_results.append(paper)
@@ -844,6 +853,8 @@ class ExecutorAgent:
                 url = paper.get("url")
                 if url and url in pool_set:
                     continue
+                if url and url_registry is not None and not await url_registry.claim(url, thread_id):
+                    continue
                 if url:
                     pool_set.add(url)
             filtered_optional_papers.append(paper)
@@ -861,8 +872,11 @@ class ExecutorAgent:
             "sub_url_pool": list(pool_set)
         }
     
-    async def _download_node(self, state: ExecutorState) -> dict:
-        """下载节点：下载 deduplicated_results 和 optional_search_results 中的文档"""
+    async def _download_node(self, state: ExecutorState, config: RunnableConfig) -> dict:
+        """下载节点：下载 deduplicated_results 和 optional_search_results 中的文档
+
+        提供共享 URL 登记表时，下载失败的 URL 会被释放，另一阶段的 executor 仍可认领并下载
+        """
         deduplicated_results = state.get("deduplicated_results", [])
         optional_search_results = state.get("optional_search_results", [])
 
@@ -999,7 +1013,24 @@ class ExecutorAgent:
                 downloaded_papers.extend(result)
         
         logger.info(f"下载完成，共下载 {len(downloaded_papers)} 篇文档")
+        await self._release_failed_urls(config, all_papers, downloaded_papers)
         return {"downloaded_papers": downloaded_papers}
+
+    async def _release_failed_urls(self, config: RunnableConfig, papers: list, downloaded_papers: list) -> None:
+        """释放本 executor 认领但未下载成功的 URL"""
+        thread_id = (config or {}).get("configurable", {}).get("thread_id", "")
+        url_registry = self._url_registries.get(thread_id)
+        if url_registry is None:
+            return
+        downloaded_urls = {paper.get("url") for paper in downloaded_papers if isinstance(paper, dict)}
+        failed_urls = {
+            paper.get("url") for paper in papers
+            if isinstance(paper, dict) and paper.get("url") and paper.get("url") not in downloaded_urls
+        }
+        for url in failed_urls:
+            await url_registry.release(url, thread_id)
+        if failed_urls:
+            logger.info(f"释放 {len(failed_urls)} 个下载失败的 URL，其他 executor 可重新认领")
       
     def _build_graph(self):
         """构建 ExecutorAgent 的处理流程图"""
@@ -1034,10 +1065,23 @@ class ExecutorAgent:
         logger.info("完成 executor_graph 的初始化构造")
         return graph
     
-    async def ainvoke(self, query: str, thread_id: str,user_id:str, sub_url_pool:list[str],user_query: str ) -> Dict:
-        """执行单个子问题的完整处理流程"""
+    async def ainvoke(
+        self,
+        query: str,
+        thread_id: str,
+        user_id: str,
+        sub_url_pool: list[str],
+        user_query: str,
+        url_registry: Optional[UrlRegistry] = None
+    ) -> Dict:
+        """执行单个子问题的完整处理流程
+
+        url_registry 不为空时，下载前先在共享登记表中认领 URL（两阶段并发执行模式）
+        """
         # 确保异步资源已初始化
         await self._ensure_initialized()
+        if url_registry is not None:
+            self._url_registries[thread_id] = url_registry
 
         config = {"configurable": {"thread_id": thread_id, "user_id": user_id}}
         initial_state = {
@@ -1087,6 +1131,8 @@ class ExecutorAgent:
             logger.error(f"executor 处理子问题 '{query}' 时出错: {e}")
             traceback.print_exc()
             raise e
+        finally:
+            self._url_registries.pop(thread_id, None)
     
     async def _clean(self):
         """清理资源"""
@@ -16,6 +16,7 @@ import os,re
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import asyncio
+import functools
 import json
 import ast
 import logging
@@ -30,10 +31,12 @@ from core.rag.rag_preprocess_module import VectorStoreManager
 from core.rag.document_processor import DocumentProcessor
 from core.rag.rag_postprocess_module import RAGPostProcessModule as RAGModule
 from core.rag.models import BGERerankNodePostprocessor
+from core.rag.streaming_ingestion import StreamingIngestionPipeline
 from core.config.config import Config
 from core.llms import lang_llm, llama_llm
 from core.rag.reranker import BGEReranker
 from core.file_deduplicator import FileDeduplicator
+from core.url_registry import UrlRegistry
 from core.log_config import setup_logger
 
 # LangGraph 相关导入
@@ -203,6 +206,14 @@ class MultiAgentGraph:
         # 向量存储索引（延迟初始化）
         self.vector_store_index = None
 
+        # 流式入库：executor 结果到达即去重、切割、入库（按 thread_id 隔离）
+        self.streaming_ingestion = Config.STREAMING_INGESTION
+        self._ingestion_pipelines: Dict[str, StreamingIngestionPipeline] = {}
+
+        # 两阶段并发执行：两个阶段同时启动，通过共享 URL 登记表认领下载（按 thread_id 隔离）
+        self.overlap_stages = Config.EXECUTION_OVERLAP_STAGES
+        self._url_registries: Dict[str, UrlRegistry] = {}
+
         # 检查点存储器
         self.memory = AsyncPostgresSaver(pool)
 
@@ -322,6 +333,7 @@ class MultiAgentGraph:
         """节点 3a: 第一阶段执行 - 探索阶段 (Exploration)
 
         使用空url_pool，让 ExecutorAgent 自由探索
+        并发执行模式下与第二阶段同时运行，URL 去重由共享登记表完成，url_pool 改由 collect_second 写入
         """
         start_ts = time.monotonic()
         logger.info("[execute_first] 第一阶段执行 - 探索阶段（url_pool=[]）")
@@ -337,7 +349,7 @@ class MultiAgentGraph:
             logger.info("[execute_first] 完成 状态=skipped 耗时=%.2fs", elapsed)
             return {
                 "first_executor_results": [],
-                "url_pool": [],
+                **self._stage_url_pool_update([]),
                 **self._with_flag(state, "execute_first", "skipped")
             }
         thread_id = state.get("thread_id", "default")
@@ -350,9 +362,12 @@ class MultiAgentGraph:
             executor_results, updated_url_pool = await self.executor_pool.execute_questions(
                 questions=sub_questions_first,
                 user_query=user_query,
-                base_thread_id=thread_id,
+                # 两个阶段并发执行时 executor 的 thread_id 不能重复（URL 认领与 checkpoint 都按 thread_id 区分）
+                base_thread_id=f"{thread_id}_first",
                 user_id=user_id,
                 url_pool=[],  # 空 url_pool
+                on_result=self._stream_result_callback(thread_id, "first"),
+                url_registry=self._get_url_registry(thread_id),
             )
 
             logger.info(f"第一阶段执行完成，完成{len(executor_results)} 个子问题的检索")
@@ -366,7 +381,7 @@ class MultiAgentGraph:
             )
             return {
                 "first_executor_results": executor_results, #结构是[{"sub_url_pool": ..., "downloaded_papers": ...}...]
-                "url_pool": updated_url_pool,
+                **self._stage_url_pool_update(updated_url_pool),
                 **self._with_flag(state, "execute_first", "success")
             }
 
@@ -376,7 +391,7 @@ class MultiAgentGraph:
             logger.info("[execute_first] 完成 状态=error 耗时=%.2fs", elapsed)
             return {
                 "first_executor_results": [],
-                "url_pool": [],
+                **self._stage_url_pool_update([]),
                 **self._with_flag(state, "execute_first", "error")
             }
 
@@ -384,6 +399,7 @@ class MultiAgentGraph:
         """节点 3b: 第二阶段执行 - 精炼阶段 (Refinement)
 
         使用第一阶段收集的 url_pool，进行精准检索
+        并发执行模式下不等待第一阶段，与之共享 URL 登记表；子问题优先级低于第一阶段
         """
         start_ts = time.monotonic()
         logger.info("[execute_second] 第二阶段执行 - 精炼阶段（使用第一阶段的 url_pool）")
@@ -404,18 +420,21 @@ class MultiAgentGraph:
         thread_id = state.get("thread_id", "default")
         user_id = state.get("user_id", "default_user")
         user_query = state.get("original_query", "")
-        url_pool = state.get("url_pool", [])  # 来自第一阶段
-        if not url_pool:
+        url_pool = state.get("url_pool", [])  # 来自第一阶段（并发执行模式下为空）
+        if not url_pool and not self.overlap_stages:
             logger.warning("第一阶段没有收集到任何 URL，第二阶段将无法执行url检索去重")
         try:
             # 第二阶段：使用第一阶段收集的 url_pool
             logger.info(f"第二阶段执行: {len(sub_questions_second)} 个子问题，使用第一阶段收集的 {len(url_pool)} 个 URL")
             executor_results, updated_url_pool = await self.executor_pool.execute_questions(
                 questions=sub_questions_second,
-                base_thread_id=thread_id,
+                base_thread_id=f"{thread_id}_second",
                 user_id=user_id,
                 url_pool=url_pool,  # 使用第一阶段的 url_pool
-                user_query=user_query
+                user_query=user_query,
+                on_result=self._stream_result_callback(thread_id, "second"),
+                priorities=[1] * len(sub_questions_second) if self.overlap_stages else None,
+                url_registry=self._get_url_registry(thread_id),
             )
 
             logger.info(f"第二阶段执行完成，获得 {len(executor_results)} 个结果")
@@ -429,7 +448,7 @@ class MultiAgentGraph:
             )
             return {
                 "second_executor_results": executor_results,
-                "url_pool": updated_url_pool,
+                **self._stage_url_pool_update(updated_url_pool),
                 **self._with_flag(state, "execute_second", "success")
             }
 
@@ -442,6 +461,49 @@ class MultiAgentGraph:
                 **self._with_flag(state, "execute_second", "error")
             }
 
+    def _get_ingestion_pipeline(self, thread_id: str) -> StreamingIngestionPipeline:
+        """获取（必要时创建）当前会话的流式入库流水线"""
+        pipeline = self._ingestion_pipelines.get(thread_id)
+        if pipeline is None:
+            pipeline = StreamingIngestionPipeline(
+                document_processor=self.document_processor,
+                file_deduplicator=self.file_deduplicator,
+                index_provider=lambda: self.vector_store_index,
+                node_embedder=self.vector_store_manager.batch_embedder.embed_nodes,
+            )
+            self._ingestion_pipelines[thread_id] = pipeline
+        return pipeline
+
+    def _stream_result_callback(self, thread_id: str, stage: str):
+        """构建 ExecutorAgentPool 的 on_result 回调，非流式模式返回 None"""
+        if not self.streaming_ingestion:
+            return None
+        return functools.partial(self._get_ingestion_pipeline(thread_id).submit, stage=stage)
+
+    async def _discard_ingestion_pipeline(self, thread_id: str) -> None:
+        pipeline = self._ingestion_pipelines.pop(thread_id, None)
+        if pipeline is not None:
+            await pipeline.cancel()
+
+    def _get_url_registry(self, thread_id: str) -> Optional[UrlRegistry]:
+        """获取（必要时创建）当前会话共享的 URL 登记表，非并发执行模式返回 None"""
+        if not self.overlap_stages:
+            return None
+        registry = self._url_registries.get(thread_id)
+        if registry is None:
+            registry = UrlRegistry()
+            self._url_registries[thread_id] = registry
+        return registry
+
+    def _stage_url_pool_update(self, url_pool: List[str]) -> Dict[str, List[str]]:
+        """execute 节点对 url_pool 的更新
+
+        并发执行模式下两个 execute 节点处于同一步，不能同时写 url_pool，改由 collect_second 统一写入
+        """
+        if self.overlap_stages:
+            return {}
+        return {"url_pool": url_pool}
+
     def _dedupe_preserve_order(self, items: List[str]) -> List[str]:
         """对列表进行去重但保持原有顺序"""
         seen = set()
@@ -502,9 +564,17 @@ class MultiAgentGraph:
                     all_documents.extend(downloaded_papers)
 
             document_paths = self._extract_document_paths(all_documents)
-            unique_files, duplicate_files = self.file_deduplicator.deduplicate_file_list(document_paths)
-            unique_set = set(unique_files)
-            unique_documents = self._filter_documents_by_paths(all_documents, unique_set)
+            pipeline = self._ingestion_pipelines.get(state.get("thread_id", "default"))
+            if self.streaming_ingestion and pipeline is not None:
+                # 流式模式下去重已在结果到达时完成，这里只等待本阶段去重结束
+                unique_documents = await pipeline.wait_deduplicated("first")
+                unique_files = self._extract_document_paths(unique_documents)
+                unique_set = set(unique_files)
+                duplicate_files = [path for path in document_paths if path not in unique_set]
+            else:
+                unique_files, duplicate_files = await self.file_deduplicator.adeduplicate_file_list(document_paths)
+                unique_set = set(unique_files)
+                unique_documents = self._filter_documents_by_paths(all_documents, unique_set)
             logger.info(
                 f"第一次去重完成: 输入 {len(document_paths)} 个, 输出 {len(unique_files)} 个, "
                 f"未输出 {len(duplicate_files)} 个"
@@ -571,26 +641,36 @@ class MultiAgentGraph:
                     all_documents.extend(downloaded_papers)
 
             document_paths = self._extract_document_paths(all_documents)
-            unique_files, duplicate_files = self.file_deduplicator.deduplicate_file_list(document_paths)
-
-            reference_paths: List[str] = []
-            for item in previous_file_paths:
-                if not isinstance(item, dict):
-                    continue
-                path = item.get("path")
-                if path:
-                    reference_paths.append(path)
-            if reference_paths:
-                stage_unique_files, cross_stage_duplicates = self.file_deduplicator.deduplicate_against_reference(
-                    reference_paths,
-                    unique_files
-                )
-            else:
-                stage_unique_files = unique_files
+            pipeline = self._ingestion_pipelines.get(state.get("thread_id", "default"))
+            if self.streaming_ingestion and pipeline is not None:
+                # 流式模式下结果内与跨阶段去重均已在结果到达时完成
+                unique_documents = await pipeline.wait_deduplicated("second")
+                stage_unique_files = self._extract_document_paths(unique_documents)
+                unique_files = stage_unique_files
+                unique_set = set(stage_unique_files)
+                duplicate_files = [path for path in document_paths if path not in unique_set]
                 cross_stage_duplicates = []
+            else:
+                unique_files, duplicate_files = await self.file_deduplicator.adeduplicate_file_list(document_paths)
+
+                reference_paths: List[str] = []
+                for item in previous_file_paths:
+                    if not isinstance(item, dict):
+                        continue
+                    path = item.get("path")
+                    if path:
+                        reference_paths.append(path)
+                if reference_paths:
+                    stage_unique_files, cross_stage_duplicates = await self.file_deduplicator.adeduplicate_against_reference(
+                        reference_paths,
+                        unique_files
+                    )
+                else:
+                    stage_unique_files = unique_files
+                    cross_stage_duplicates = []
 
-            unique_set = set(stage_unique_files)
-            unique_documents = self._filter_documents_by_paths(all_documents, unique_set)
+                unique_set = set(stage_unique_files)
+                unique_documents = self._filter_documents_by_paths(all_documents, unique_set)
 
             logger.info(
                 f"第二次去重完成: 输入 {len(document_paths)} 个, 输出 {len(unique_files)} 个, "
@@ -625,9 +705,11 @@ class MultiAgentGraph:
                 len(all_documents),
                 len(unique_documents),
             )
+            url_registry = self._url_registries.get(state.get("thread_id", "default"))
             return {
                 "second_all_documents": unique_documents,
                 "second_processed_file_paths": processed_file_paths,
+                **({"url_pool": url_registry.urls()} if url_registry is not None else {}),
                 **self._with_flag(state, "collect_second", "success")
             }
 
@@ -644,11 +726,24 @@ class MultiAgentGraph:
                 **self._with_flag(state, "collect_second", "error")
             }
 
-    async def _process_documents(self, documents: List[Dict], stage_label: str) -> List:
+    async def _process_documents(
+        self,
+        documents: List[Dict],
+        stage_label: str,
+        thread_id: str = "default",
+        stage: str = ""
+    ) -> List:
         if not documents:
             logger.info(f"{stage_label}没有文档需要处理")
             return []
 
+        pipeline = self._ingestion_pipelines.get(thread_id)
+        if self.streaming_ingestion and pipeline is not None and stage:
+            # 流式模式下文档已在结果到达时切割（并在索引就绪后入库），这里只等待本阶段完成
+            llama_docs = await pipeline.wait_processed(stage)
+            logger.info(f"{stage_label}流式文档处理完成: {len(llama_docs)} 个片段")
+            return llama_docs
+
         llama_docs = await asyncio.to_thread(self._process_documents_sync, documents)
         logger.info(f"{stage_label}文档处理完成: {len(llama_docs)} 个片段")
         return llama_docs
@@ -684,7 +779,9 @@ class MultiAgentGraph:
                 **self._with_flag(state, "process_first_documents", "success")
             }
         try:
-            processed_docs = await self._process_documents(documents, "第一阶段")
+            processed_docs = await self._process_documents(
+                documents, "第一阶段", state.get("thread_id", "default"), "first"
+            )
             merged_docs = existing_docs + processed_docs
             elapsed = time.monotonic() - start_ts
             logger.info("[process_first_documents] 完成 状态=success 耗时=%.2fs 文档片段数=%d", elapsed, len(merged_docs))
@@ -728,7 +825,9 @@ class MultiAgentGraph:
                 **self._with_flag(state, "process_second_documents", "success")
             }
         try:
-            processed_docs = await self._process_documents(documents, "第二阶段")
+            processed_docs = await self._process_documents(
+                documents, "第二阶段", state.get("thread_id", "default"), "second"
+            )
             merged_docs = existing_docs + processed_docs
             elapsed = time.monotonic() - start_ts
             logger.info("[process_second_documents] 完成 状态=success 耗时=%.2fs 文档片段数=%d", elapsed, len(merged_docs))
@@ -772,13 +871,17 @@ class MultiAgentGraph:
         first_llama_docs = state.get("first_llama_docs", [])
         second_llama_docs = state.get("second_llama_docs", [])
 
+        pipeline = self._ingestion_pipelines.pop(state.get("thread_id", "default"), None)
+        if self.streaming_ingestion and pipeline is not None:
+            return await self._finish_streaming_vectorize(state, pipeline, start_ts)
+
         try:
             if first_llama_docs:
-                self.vector_store_index.insert_nodes(first_llama_docs)
+                await self.vector_store_manager.aadd_nodes(first_llama_docs)
                 logger.info(f"成功添加 {len(first_llama_docs)} 个第一阶段文档到向量库")
             
             if second_llama_docs:
-                self.vector_store_index.insert_nodes(second_llama_docs)
+                await self.vector_store_manager.aadd_nodes(second_llama_docs)
                 logger.info(f"成功添加 {len(second_llama_docs)} 个第二阶段文档到向量库")
 
             if not first_llama_docs and not second_llama_docs:
@@ -802,6 +905,36 @@ class MultiAgentGraph:
             logger.info("[vectorize_documents] 完成 状态=error 耗时=%.2fs", elapsed)
             return {**self._with_flag(state, "vectorize_documents", "error")}
 
+    async def _finish_streaming_vectorize(
+        self,
+        state: MultiAgentState,
+        pipeline: StreamingIngestionPipeline,
+        start_ts: float
+    ) -> Dict[str, Any]:
+        """流式模式的向量化收尾：排空流水线，并批量写入索引就绪前积压的节点"""
+        try:
+            summary = await pipeline.finish()
+            pending_nodes = summary["pending_nodes"]
+            if pending_nodes:
+                await self.vector_store_manager.aadd_nodes(pending_nodes)
+                logger.info(f"成功补充添加 {len(pending_nodes)} 个积压节点到向量库")
+            elapsed = time.monotonic() - start_ts
+            logger.info(
+                "[vectorize_documents] 完成 状态=success 耗时=%.2fs 流式入库=%d 补充入库=%d 首个节点耗时=%s",
+                elapsed,
+                summary["inserted"],
+                len(pending_nodes),
+                summary["first_node_latency"],
+            )
+            return {
+                **self._with_flag(state, "vectorize_documents", "success")
+            }
+        except Exception as e:
+            elapsed = time.monotonic() - start_ts
+            logger.error(f"流式向量化失败: {e}")
+            logger.info("[vectorize_documents] 完成 状态=error 耗时=%.2fs", elapsed)
+            return {**self._with_flag(state, "vectorize_documents", "error")}
+
     async def _rag_retrieve_node(self, state: MultiAgentState) -> Dict[str, Any]:
         """节点 7: RAG 检索
 
@@ -833,9 +966,11 @@ class MultiAgentGraph:
 
             # 创建 RAG 模块
             rag_module = RAGModule(
+                vector_store=self.vector_store_index,
                 retriever=retriever,
                 node_postprocessor=self.node_postprocessor,
-                top_k=Config.TOP_K
+                top_k=Config.TOP_K,
+                batch_embedder=self.vector_store_manager.batch_embedder
             )
 
             # 执行检索，获取去重后的节点
@@ -1278,10 +1413,16 @@ class MultiAgentGraph:
                         → vectorize_documents (动态入库) → rag_retrieve
                         → generate_answer → eval_answer → END
 
+        Config.EXECUTION_OVERLAP_STAGES 开启时 execute_first 与 execute_second 在 plan_query 后同时启动，
+        两阶段的 executor 通过共享 UrlRegistry 认领 URL（先认领者下载），collect_second 等待
+        collect_first 与 execute_second 都完成后执行
+
         关键设计：
         - 两阶段执行：探索（空url_pool） + 精炼（使用第一阶段url_pool）
         - 每阶段后立即去重，避免重复下载
         - vectorize_documents 在 init_vector_store 后启动，按阶段完成状态增量入库
+        - Config.STREAMING_INGESTION 开启时，每个 executor 结果到达即经 StreamingIngestionPipeline
+          去重、切割、入库，collect/process 节点只等待对应阶段完成，vectorize_documents 负责收尾
         """
         builder = StateGraph(MultiAgentState)
 
@@ -1310,8 +1451,13 @@ class MultiAgentGraph:
         builder.add_edge("plan_query", "execute_first")
         builder.add_edge("execute_first", "collect_first")
         builder.add_edge("collect_first", "process_first_documents")
-        builder.add_edge("collect_first", "execute_second")
-        builder.add_edge("execute_second", "collect_second")
+        if self.overlap_stages:
+            # 并发执行：两个阶段同时启动；collect_second 的跨阶段去重仍需等待 collect_first
+            builder.add_edge("plan_query", "execute_second")
+            builder.add_edge(["collect_first", "execute_second"], "collect_second")
+        else:
+            builder.add_edge("collect_first", "execute_second")
+            builder.add_edge("execute_second", "collect_second")
         builder.add_edge("collect_second", "process_second_documents")
 
         # 向量化前汇合：等待关键节点写入 flags
@@ -1482,6 +1628,10 @@ class MultiAgentGraph:
                 'error': str(e),
                 'answer': f"抱歉，处理您的查询时出现错误: {str(e)}"
             }
+        finally:
+            # 流程提前结束（未进入 vectorize_documents）时丢弃残留的流式流水线
+            await self._discard_ingestion_pipeline(thread_id)
+            self._url_registries.pop(thread_id, None)
 
     async def _cleanup(self):
         """清理资源"""
@@ -1497,6 +1647,9 @@ class MultiAgentGraph:
             # 清理内存
             await self.memory.aclose()
 
+            # 关闭 reranker 共享连接池
+            await self.reranker.close()
+
             logger.info("MultiAgentGraph 资源清理完成")
         except Exception as e:
             logger.error(f"资源清理失败: {e}")
@@ -61,6 +61,7 @@ class Config:
     
     # MultiAgent 配置
     EXECUTOR_POOL_SIZE = 3  # ExecutorAgent 池大小，默认 3
+    EXECUTION_OVERLAP_STAGES = False  # 两阶段 executor 并发执行，通过共享 URL 登记表认领下载，取代第二阶段等待第一阶段的 url_pool
     MAX_CHUNK_SIZE = 1000  # Markdown 切割最大长度，默认 1000 字符
     
     # 文档处理配置
@@ -68,6 +69,84 @@ class Config:
     VLLM_BASE_URL =  "http://localhost:8081"  # vllm Embedding 服务地址
     DOC_FILTER=0.8 #文档过滤分数线，低于此分数的文档将被过滤掉，默认为0.8
     BL_MODEL_NAME="text-embedding-v4" #百炼模型名称，默认为text-embedding-v4
+    PDF_CACHE_ENABLED = True  # 是否启用 PDF 转 Markdown 结果缓存
+    PDF_CACHE_PATH = "data/cache/pdf_markdown"  # PDF 转 Markdown 缓存目录
+    PDF_CACHE_MAX_BYTES = 512 * 1024 * 1024  # 缓存总大小上限，超过后按 LRU 淘汰，默认 512MB
+    DOC_PROCESS_CONCURRENCY = 4  # DocumentProcessor 并发处理文档数（PDF 转换 + IngestionPipeline），1 表示串行
+    STREAMING_INGESTION = True  # 流式入库：每个 executor 结果到达即去重、切割、入库，False 时回退为阶段结束后整批处理
+    EMBEDDING_CACHE_ENABLED = True  # 是否启用 Embedding 结果缓存（按模型名 + 文本哈希）
+    EMBEDDING_CACHE_PATH = "data/cache/embeddings"  # Embedding 缓存目录（memmap 向量矩阵 + 键索引）
+    EMBEDDING_CACHE_CAPACITY = 100000  # Embedding 缓存最大条数，满后按 LRU 复用槽位（1024 维约 400MB）
+    EMBED_BATCH_MAX_TOKENS = 8192  # 单个 embedding 请求的估算 token 上限
+    EMBED_BATCH_MAX_SIZE = 64  # 单个 embedding 请求的文本条数上限
+    EMBED_MAX_CONCURRENT = 4  # 同时在途的 embedding 请求数
+    EMBED_MAX_RETRIES = 2  # embedding 请求因连接错误 / 超时 / 5xx 失败后的整批退避重试次数
+    EMBED_BISECT_STATUS_CODES = (400, 413, 422)  # 由批次内容引起的 HTTP 状态码，只有这些错误才二分批次重试
+    RAG_BATCH_RETRIEVAL = True  # 多个子问题一次性 embedding 并批量查询 Chroma
+    RAG_RERANK_CONCURRENCY = 4  # 不同子问题的 rerank 请求并发上限
+    RAG_SEMANTIC_DEDUP = True  # 检索节点内容去重优先使用 Chroma 中已存储的 embedding（不可用时回退到 TF-IDF）
+    RAG_SEMANTIC_DEDUP_THRESHOLD = 0.95  # embedding 余弦相似度去重阈值
+    RERANK_CACHE_ENABLED = True  # 是否缓存 rerank 分数（键: 模型 + query 哈希 + passage 哈希）
+    RERANK_CACHE_CAPACITY = 50000  # 内存 LRU 缓存的最大条数
+    RERANK_CACHE_PERSIST = True  # 是否同时写入 SQLite 磁盘缓存
+    RERANK_CACHE_PATH = "data/cache/rerank_scores.sqlite3"  # Rerank 分数磁盘缓存文件
+    RERANK_BACKEND_TTL = 300  # Rerank 服务类型与模型 ID 探测结果的缓存时间（秒）
+    HTTP_POOL_MAX_CONNECTIONS = 20  # 每个共享 HTTP 客户端（每个 API 主机一个）的最大连接总数
+    HTTP_POOL_MAX_KEEPALIVE = 10  # 每个共享 HTTP 客户端保持的空闲 keep-alive 连接数
+    DOWNLOAD_POOL_MAX_CONNECTIONS = 100  # 全文下载共用客户端的最大连接总数（所有镜像主机合计）
+    DOWNLOAD_POOL_MAX_KEEPALIVE = 30  # 全文下载客户端保持的空闲 keep-alive 连接数
+    HTTP_POOL_KEEPALIVE_EXPIRY = 30.0  # 空闲 keep-alive 连接的保留时间（秒）
+    RATE_LIMIT_ENABLED = True  # 是否对外部 API 按主机限速（共享 HTTP 客户端与 grep.app 请求）
+    RATE_LIMIT_HOSTS = {  # 各主机的请求速率（次/秒），按主机名后缀匹配；未列出的主机不限速，但仍遵守 Retry-After
+        "sec.gov": 8.0,  # SEC EDGAR 公平访问上限为 10 次/秒
+        "wikipedia.org": 10.0,
+        "grep.app": 1.0,
+        "api.openalex.org": 8.0,  # OpenAlex 上限为 10 次/秒
+        "api.semanticscholar.org": 1.0,  # Semantic Scholar 公共接口 1 次/秒
+        "eutils.ncbi.nlm.nih.gov": 3.0,  # NCBI E-utilities 无 API Key 时 3 次/秒
+        "export.arxiv.org": 0.33,  # arXiv API 要求每 3 秒不超过 1 次
+        "api.crunchbase.com": 3.0,
+    }
+    RATE_LIMIT_BURST_SECONDS = 1.0  # 令牌桶容量（可累积多少秒的配置速率，至少 1 个令牌）
+    RATE_LIMIT_BACKOFF_FACTOR = 0.5  # 收到 429 / 503 时速率乘以该系数
+    RATE_LIMIT_MIN_FACTOR = 0.1  # 自适应降速的下限（配置速率的比例）
+    RATE_LIMIT_RECOVERY_STEP = 0.05  # 每个成功响应恢复的速率（配置速率的比例）
+    RATE_LIMIT_DEFAULT_BACKOFF = 2.0  # 429 响应未带 Retry-After 时暂停该主机的时间（秒）
+    RATE_LIMIT_MAX_RETRY_AFTER = 60.0  # 单次暂停的上限（秒），Retry-After 更长时不自动重试
+    RATE_LIMIT_RETRIES = 2  # 被限流的请求在等待后自动重试的次数
+    DEDUP_MINHASH_PERM = 128  # 文件去重 MinHash 签名长度
+    DEDUP_LSH_THRESHOLD = 0.3  # LSH 候选对的 Jaccard 阈值（偏低保证召回，候选对再用 TF-IDF 余弦精确校验）
+    DEDUP_SHINGLE_SIZE = 5  # 文件去重的字符 shingle 长度
+    DEDUP_INDEX_ENABLED = True  # 是否持久化文件去重指纹（MD5 / MinHash / 词频），跨阶段、跨查询复用
+    DEDUP_INDEX_PATH = "data/cache/file_fingerprints.sqlite3"  # 文件指纹索引
+    DOWNLOAD_MAX_BYTES = 100 * 1024 * 1024  # 单个下载文件（PDF / 全文 XML）的大小上限，超过时中止下载
+    DOWNLOAD_MIN_PDF_BYTES = 10000  # 小于该大小的 PDF 响应视为错误页
+    HEDGED_DOWNLOAD_ENABLED = True  # 论文有多个 PDF 链接时是否对冲下载（错开启动、首个成功即取消其余）
+    HEDGED_DOWNLOAD_MAX_PARALLEL = 3  # 对冲下载同时进行的最大链接数
+    HEDGED_DOWNLOAD_STAGGER = 1.5  # 对冲下载中前一个链接未完成时，启动下一个链接前的等待时间（秒）
+    DOWNLOAD_INDEX_PATH = "data/cache/download_index.sqlite3"  # 已下载文档索引（DOI / URL / 内容哈希 -> 文件路径）
+    SEC_TICKER_CACHE_PATH = "data/cache/sec_company_tickers.json"  # SEC company_tickers.json 磁盘缓存
+    SEC_TICKER_CACHE_TTL = 24 * 3600  # SEC 公司代码映射的刷新周期（秒）
+    SEC_TICKER_RETRY_INTERVAL = 600  # 刷新失败、沿用过期映射时，下次重新尝试刷新的间隔（秒）
+    SEC_FILING_CACHE_PATH = "data/cache/sec_filings.sqlite3"  # 年报章节解析结果缓存（键: accession number）
+    MCP_SEARCH_MAX_WORKERS = 16  # MCP 搜索服务器中同步搜索器的线程池大小（并发处理多个工具调用）
+    MCP_SEARCH_CACHE_ENABLED = True  # 是否缓存 MCP 搜索结果（键: 工具名 + 规范化参数）
+    MCP_SEARCH_CACHE_TTLS = {  # 各搜索工具结果的有效期（秒），未列出的工具（下载类）不缓存
+        "wikipedia_search": 7 * 24 * 3600,
+        "tavily_search": 6 * 3600,
+        "exa_summary_search": 6 * 3600,
+        "exa_context_search": 6 * 3600,
+        "sec_edgar_search": 24 * 3600,
+        "akshare_search": 3600,
+    }
+    MCP_SEARCH_CACHE_MAX_ENTRIES = 2000  # 内存缓存的最大条数
+    MCP_SEARCH_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 内存缓存序列化结果的总字节数上限
+    MCP_SEARCH_CACHE_PERSIST = True  # 是否同时写入 SQLite 磁盘缓存
+    MCP_SEARCH_CACHE_PATH = "data/cache/search_results.sqlite3"  # 搜索结果磁盘缓存文件
+    MCP_SESSION_START_TIMEOUT = 60  # 共享 MCP 会话的启动（含服务器初始化）超时（秒）
+    MCP_SESSION_CALL_RETRIES = 1  # MCP 工具调用因连接断开失败时，重启会话后的重试次数
+    CPU_POOL_MAX_WORKERS = 2  # 去重等 CPU 密集任务的进程池大小，<=0 时改用线程执行
+    CPU_POOL_START_METHOD = "spawn"  # 进程池启动方式（spawn 避免 fork 继承事件循环与线程状态）
 
 def get_rotating_file_handler(config=None):
     """
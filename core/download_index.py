@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+下载文档索引
+持久化记录已下载文档的 DOI、规范化 URL、内容哈希 -> 保存路径、大小、来源，
+各搜索器下载前按键 O(1) 查询，不再对不断增长的 DOC_SAVE_PATH 执行 os.listdir 扫描
+
+- 键与 download_registry 的 single-flight 键一致（canonical_download_key）
+- 查询时校验文件仍然存在，已被删除（例如被去重删除）的记录自动清理
+- SQLite WAL 模式，MCP 服务器进程与主进程可以同时读写
+- 索引建立之前已在目录中的文件由 backfill_directory 一次性补登记（每个目录只扫描一次），
+  按文件名中的 DOI 片段查找，与原先的目录扫描结果一致
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from core.config import Config
+from core.download_registry import canonical_download_key
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """分块计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DownloadIndex:
+    """基于 SQLite 的下载文档索引（线程安全）"""
+
+    def __init__(self, db_path: str):
+        """初始化
+
+        Args:
+            db_path: SQLite 文件路径
+        """
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._backfilled = set()
+        logger.info(f"初始化 DownloadIndex: db_path={db_path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟建立连接（调用方持有锁）"""
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS downloads ("
+                "path TEXT PRIMARY KEY, directory TEXT NOT NULL, doi_key TEXT, url_key TEXT, "
+                "content_hash TEXT, size INTEGER NOT NULL, source TEXT, created_at REAL NOT NULL)"
+            )
+            for column in ("doi_key", "url_key", "content_hash"):
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_downloads_{column} ON downloads ({column}, directory)"
+                )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS backfilled_directories ("
+                "directory TEXT PRIMARY KEY, files INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _lookup(self, column: str, value: str, directory: Optional[str]) -> Optional[str]:
+        """按列查询仍然存在的文件（调用方持有锁）"""
+        conn = self._connect()
+        if directory is None:
+            rows = conn.execute(
+                f"SELECT path FROM downloads WHERE {column} = ? ORDER BY created_at DESC", (value,)
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                f"SELECT path FROM downloads WHERE {column} = ? AND directory = ? ORDER BY created_at DESC",
+                (value, os.path.abspath(directory))
+            ).fetchall()
+        return self._first_existing(conn, rows)
+
+    @staticmethod
+    def _first_existing(conn: sqlite3.Connection, rows) -> Optional[str]:
+        """返回第一个仍然存在的文件，清理已被删除的记录（调用方持有锁）"""
+        stale = []
+        found = None
+        for (path,) in rows:
+            if os.path.exists(path):
+                found = path
+                break
+            stale.append((path,))
+        if stale:
+            conn.executemany("DELETE FROM downloads WHERE path = ?", stale)
+            conn.commit()
+        return found
+
+    def lookup(
+        self,
+        doi: Optional[str] = None,
+        url: Optional[str] = None,
+        directory: Optional[str] = None
+    ) -> Optional[str]:
+        """按 DOI 或 URL 查找已下载的文件
+
+        Args:
+            doi: 论文 DOI
+            url: 下载链接或网页地址
+            directory: 只查找保存在该目录下的文件，为空时不限制
+
+        Returns:
+            已存在的文件路径，未找到时返回 None
+        """
+        keys = [("doi_key", canonical_download_key(doi=doi)), ("url_key", canonical_download_key(url=url))]
+        try:
+            with self._lock:
+                for column, value in keys:
+                    if value:
+                        path = self._lookup(column, value, directory)
+                        if path:
+                            return path
+        except sqlite3.Error as e:
+            logger.warning(f"查询下载索引失败: {e}")
+        return None
+
+    def lookup_by_hash(self, content_hash: str, directory: Optional[str] = None) -> Optional[str]:
+        """按内容哈希查找内容完全相同的已下载文件"""
+        try:
+            with self._lock:
+                return self._lookup("content_hash", content_hash, directory)
+        except sqlite3.Error as e:
+            logger.warning(f"查询下载索引失败: {e}")
+            return None
+
+    def lookup_by_filename(self, fragment: str, directory: str, suffix: str = ".pdf") -> Optional[str]:
+        """查找目录中文件名包含 fragment 的已登记文件（例如 DOI 转换成的文件名片段）
+
+        Args:
+            fragment: 文件名片段
+            directory: 保存目录
+            suffix: 文件扩展名
+
+        Returns:
+            已存在的文件路径，未找到时返回 None
+        """
+        if not fragment:
+            return None
+        directory = os.path.abspath(directory)
+        try:
+            with self._lock:
+                conn = self._connect()
+                rows = conn.execute(
+                    "SELECT path FROM downloads WHERE directory = ? AND substr(path, ?) LIKE ? "
+                    "AND instr(substr(path, ?), ?) > 0 ORDER BY created_at DESC",
+                    (directory, len(directory) + 2, f"%{suffix}", len(directory) + 2, fragment)
+                ).fetchall()
+                return self._first_existing(conn, rows)
+        except sqlite3.Error as e:
+            logger.warning(f"查询下载索引失败: {e}")
+            return None
+
+    def backfill_directory(self, directory: str) -> int:
+        """一次性登记目录中索引建立之前已存在的文件（每个目录只扫描一次）
+
+        补登记的文件没有 DOI / URL / 内容哈希，只能通过 lookup_by_filename 按文件名查找；
+        之后写入的文件由 record 登记
+
+        Args:
+            directory: 保存目录
+
+        Returns:
+            本次补登记的文件数，目录已扫描过时返回 0
+        """
+        directory = os.path.abspath(directory)
+        if directory in self._backfilled:
+            return 0
+        try:
+            with self._lock:
+                conn = self._connect()
+                done = conn.execute(
+                    "SELECT 1 FROM backfilled_directories WHERE directory = ?", (directory,)
+                ).fetchone()
+                if done is not None:
+                    self._backfilled.add(directory)
+                    return 0
+                rows = []
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_file():
+                            rows.append((
+                                entry.path, directory, None, None, None, entry.stat().st_size, None, time.time()
+                            ))
+                # 已登记的文件保留原有的 DOI / URL / 哈希
+                before = conn.total_changes
+                conn.executemany("INSERT OR IGNORE INTO downloads VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                added = conn.total_changes - before
+                conn.execute(
+                    "INSERT OR REPLACE INTO backfilled_directories VALUES (?, ?, ?)",
+                    (directory, added, time.time())
+                )
+                conn.commit()
+                self._backfilled.add(directory)
+            logger.info(f"下载索引补登记完成: directory={directory}, files={added}")
+            return added
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"下载索引补登记失败: {directory}, {e}")
+            return 0
+
+    def record(
+        self,
+        path: str,
+        doi: Optional[str] = None,
+        url: Optional[str] = None,
+        source: Optional[str] = None,
+        content_hash: Optional[str] = None
+    ) -> None:
+        """登记新写入的文件（登记失败只记录日志，不影响下载结果）
+
+        Args:
+            path: 文件路径
+            doi: 论文 DOI
+            url: 下载链接或网页地址
+            source: 来源搜索器名称
+            content_hash: 内容 SHA-256，为空时读取文件计算
+        """
+        try:
+            path = os.path.abspath(path)
+            size = os.path.getsize(path)
+            if content_hash is None:
+                content_hash = file_sha256(path)
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        path, os.path.dirname(path), canonical_download_key(doi=doi),
+                        canonical_download_key(url=url), content_hash, size, source, time.time()
+                    )
+                )
+                conn.commit()
+        except (OSError, sqlite3.Error) as e:
+            logger.warning(f"登记下载索引失败: {path}, {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """索引条目数与总大小"""
+        try:
+            with self._lock:
+                count, total = self._connect().execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM downloads"
+                ).fetchone()
+            return {"entries": count, "bytes": total}
+        except sqlite3.Error as e:
+            logger.warning(f"读取下载索引统计失败: {e}")
+            return {"entries": 0, "bytes": 0}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._backfilled.clear()
+
+
+_index: Optional[DownloadIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_download_index() -> DownloadIndex:
+    """获取进程内共享的下载索引（Config.DOWNLOAD_INDEX_PATH）"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DownloadIndex(Config.DOWNLOAD_INDEX_PATH)
+        return _index
@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+下载去重协调（single-flight）
+多个 ExecutorAgent 并发下载同一篇论文/网页时，同一个规范化 URL 或 DOI 在进程内只下载一次：
+第一个请求者负责下载，其余请求者等待并复用它的结果
+
+- 同步下载（在线程池中执行的搜索器）与异步下载共用同一张表，按键协调
+- 文件通过"临时文件 + rename"原子写入，DocumentProcessor 和去重扫描不会读到写了一半的文件
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, Tuple, TypeVar
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+T = TypeVar("T")
+
+_DOI_PREFIXES = ("https://doi.org/", "http://doi.org/", "https://dx.doi.org/", "http://dx.doi.org/", "doi:")
+_TRACKING_PARAMS = ("utm_", "fbclid", "gclid")
+
+
+def canonical_download_key(url: Optional[str] = None, doi: Optional[str] = None) -> Optional[str]:
+    """生成下载去重键，优先使用 DOI
+
+    Args:
+        url: 下载链接或网页地址
+        doi: 论文 DOI（可带 https://doi.org/ 前缀）
+
+    Returns:
+        "doi:<小写 DOI>" 或 "url:<规范化 URL>"，两者都为空时返回 None
+    """
+    if doi:
+        value = doi.strip()
+        for prefix in _DOI_PREFIXES:
+            if value.lower().startswith(prefix):
+                value = value[len(prefix):]
+                break
+        if value:
+            return f"doi:{value.lower()}"
+    if url and url.strip():
+        parts = urlsplit(url.strip())
+        query = sorted(
+            (k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+            if not k.lower().startswith(_TRACKING_PARAMS)
+        )
+        path = parts.path.rstrip("/") or "/"
+        normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), path, urlencode(query), ""))
+        return f"url:{normalized}"
+    return None
+
+
+class _LeaderCancelled(Exception):
+    """负责下载的请求被取消，等待者需要重新竞争下载"""
+
+
+class SingleFlightRegistry:
+    """按键合并并发请求（线程安全，可同时被同步与异步调用方使用）"""
+
+    def __init__(self):
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.joined = 0
+
+    def _join_or_lead(self, key: str) -> Tuple[Future, bool]:
+        """返回 (Future, 是否由当前调用方负责执行)"""
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.joined += 1
+                return future, False
+            future = Future()
+            # 标记为运行中：等待者被取消时 wrap_future 无法连带取消这个共享的 Future
+            future.set_running_or_notify_cancel()
+            self._inflight[key] = future
+            self.leaders += 1
+            return future, True
+
+    def _finish(self, key: str, future: Future) -> None:
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    def run(self, key: Optional[str], func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """同步执行 func，同一键的并发调用只执行一次
+
+        Args:
+            key: 去重键，为空时直接执行
+            func: 实际的下载函数
+
+        Returns:
+            func 的返回值（等待者得到负责者的返回值，异常同样传递）
+        """
+        if not key:
+            return func(*args, **kwargs)
+        while True:
+            future, leader = self._join_or_lead(key)
+            if not leader:
+                logger.debug(f"等待进行中的下载: {key}")
+                try:
+                    return future.result()
+                except _LeaderCancelled:
+                    continue
+            try:
+                result = func(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e if isinstance(e, Exception) else _LeaderCancelled())
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                self._finish(key, future)
+
+    async def arun(self, key: Optional[str], func: Callable[..., Awaitable[T]], *args: Any, **kwargs: Any) -> T:
+        """异步执行 func，同一键的并发调用只执行一次
+
+        Args:
+            key: 去重键，为空时直接执行
+            func: 实际的下载协程函数
+
+        Returns:
+            func 的返回值（等待者得到负责者的返回值，异常同样传递）
+        """
+        if not key:
+            return await func(*args, **kwargs)
+        while True:
+            future, leader = self._join_or_lead(key)
+            if not leader:
+                logger.debug(f"等待进行中的下载: {key}")
+                try:
+                    return await asyncio.wrap_future(future)
+                except _LeaderCancelled:
+                    continue
+            try:
+                result = await func(*args, **kwargs)
+            except BaseException as e:
+                # 负责者被取消时让等待者重新竞争，而不是把取消传递给它们
+                future.set_exception(e if isinstance(e, Exception) else _LeaderCancelled())
+                raise
+            else:
+                future.set_result(result)
+                return result
+            finally:
+                self._finish(key, future)
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"leaders": self.leaders, "joined": self.joined, "in_flight": len(self._inflight)}
+
+
+download_registry = SingleFlightRegistry()
+
+
+@contextmanager
+def atomic_open(path: str, mode: str = "wb", encoding: Optional[str] = None) -> Iterator[Any]:
+    """原子写文件：先写同目录下的 .tmp 临时文件，成功后 rename 为目标文件，失败时删除临时文件
+
+    Args:
+        path: 目标文件路径
+        mode: 写入模式（"wb" 或 "w"）
+        encoding: 文本模式的编码
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def atomic_write_text(path: str, content: str, encoding: str = "utf-8") -> str:
+    """原子写入文本文件，返回文件路径"""
+    with atomic_open(path, "w", encoding=encoding) as f:
+        f.write(content)
+    return path
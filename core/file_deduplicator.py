@@ -3,27 +3,33 @@
 """
 文件去重器
 
-基于 TF-IDF 和余弦相似度的文档内容去重
+基于 MinHash/LSH 候选 + TF-IDF 余弦相似度校验的文档内容去重
 支持多种文件格式：.md, .json, .pdf, .html
 """
 
 import os
 import hashlib
 import logging
-from typing import List, Dict, Set, Tuple
+from typing import List, Dict, Optional, Set, Tuple
 from pathlib import Path
+from core.config import Config
 from core.log_config import setup_logger
+from core.process_pool import run_in_process
 
 logger = setup_logger(__name__)
 
+HASH_FEATURES = 2 ** 20  # TF-IDF 哈希特征维度
+
 # 尝试导入 sklearn，如果不可用则使用 MD5 回退方案
-TfidfVectorizer = None
-cosine_similarity = None
+HashingVectorizer = None
+TfidfTransformer = None
 np = None
 try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
-    from sklearn.metrics.pairwise import cosine_similarity
+    from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
     import numpy as np
+    from scipy.sparse import csr_matrix
+    from core.minhash_lsh import MinHasher, MinHashLSH, shingle_hashes
+    from core.fingerprint_index import FileFingerprint, FingerprintIndex, stat_files
     SKLEARN_AVAILABLE = True
 except ImportError:
     SKLEARN_AVAILABLE = False
@@ -33,19 +39,51 @@ except ImportError:
 class FileDeduplicator:
     """文件去重器
     
-    使用 TF-IDF + 余弦相似度进行内容去重
+    使用 MinHash/LSH 找候选对，再以 TF-IDF + 余弦相似度校验进行内容去重
     若 sklearn 不可用，退化为 MD5 哈希去重
     """
     
-    def __init__(self, similarity_threshold: float = 0.8, batch_size: int = 500):
+    def __init__(
+        self,
+        similarity_threshold: float = 0.8,
+        batch_size: int = 500,
+        num_perm: int = Config.DEDUP_MINHASH_PERM,
+        lsh_threshold: float = Config.DEDUP_LSH_THRESHOLD,
+        shingle_size: int = Config.DEDUP_SHINGLE_SIZE,
+        fingerprint_index: "Optional[FingerprintIndex]" = None
+    ):
         """初始化去重器
         
         Args:
             similarity_threshold: 余弦相似度阈值（默认 0.8）
-            batch_size: 批处理大小，超过此数量分批处理以保护内存
+            batch_size: 批处理大小（保留参数以兼容，LSH 在全量文件上查找候选，不再分批）
+            num_perm: MinHash 签名长度
+            lsh_threshold: LSH 候选的 Jaccard 阈值（偏低以保证召回，候选对会再精确校验）
+            shingle_size: 字符 shingle 长度
+            fingerprint_index: 文件指纹索引，为空时按 Config.DEDUP_INDEX_ENABLED 使用 DEDUP_INDEX_PATH
         """
         self.similarity_threshold = similarity_threshold
         self.batch_size = batch_size
+        self.num_perm = num_perm
+        self.lsh_threshold = lsh_threshold
+        self.shingle_size = shingle_size
+        self.min_hasher = None
+        self._hashing_vectorizer = None
+        self.fingerprint_index = None
+        if SKLEARN_AVAILABLE:
+            self.min_hasher = MinHasher(num_perm=num_perm)
+            self._hashing_vectorizer = HashingVectorizer(
+                n_features=HASH_FEATURES,
+                ngram_range=(1, 2),  # unigram + bigram
+                alternate_sign=False,
+                norm=None
+            )
+            if fingerprint_index is None and Config.DEDUP_INDEX_ENABLED:
+                fingerprint_index = FingerprintIndex(
+                    Config.DEDUP_INDEX_PATH,
+                    params=f"perm={num_perm};shingle={shingle_size};features={HASH_FEATURES}"
+                )
+            self.fingerprint_index = fingerprint_index
         self.allowed_extensions = {'.md', '.json', '.pdf'}
         
         logger.info(
@@ -161,7 +199,7 @@ class FileDeduplicator:
         if not SKLEARN_AVAILABLE:
             return self._md5_deduplicate(file_paths)
         
-        logger.info(f"使用 TF-IDF 去重: {len(file_paths)} 个文件, 阈值={self.similarity_threshold}")
+        logger.info(f"使用 MinHash/LSH + TF-IDF 去重: {len(file_paths)} 个文件, 阈值={self.similarity_threshold}")
         
         # 特殊文件：context7_grep.json 只做 MD5 去重
         special_files = [fp for fp in file_paths if os.path.basename(fp) == "context7_grep.json"]
@@ -176,102 +214,162 @@ class FileDeduplicator:
         if not normal_files:
             return special_deduped
         
-        # 分批处理以保护内存
-        if len(normal_files) > self.batch_size:
-            logger.info(f"文件数量超过 {self.batch_size}，分批处理")
-            batches = [
-                normal_files[i:i + self.batch_size]
-                for i in range(0, len(normal_files), self.batch_size)
-            ]
-            
-            all_unique = []
-            for i, batch in enumerate(batches):
-                logger.info(f"处理批次 {i+1}/{len(batches)}: {len(batch)} 个文件")
-                unique_batch = self._tfidf_deduplicate_batch(batch)
-                all_unique.extend(unique_batch)
-            
-            # 合并特殊文件和普通文件
-            return special_deduped + all_unique
-        
-        # 单批处理
-        unique_normal = self._tfidf_deduplicate_batch(normal_files)
+        unique_normal = self._lsh_deduplicate(normal_files)
         return special_deduped + unique_normal
-    
-    def _tfidf_deduplicate_batch(self, file_paths: List[str]) -> List[str]:
-        """处理单个批次的 TF-IDF 去重
-        
+
+    def _lsh_deduplicate(self, file_paths: List[str]) -> List[str]:
+        """MinHash + LSH 近似重复检测，候选对再用 TF-IDF 余弦相似度精确校验
+
+        1. 内容完全相同（MD5 相同）的文件只保留第一个
+        2. 对全部文件计算字符 shingle 的 MinHash 签名，经 LSH 分桶得到候选对（次二次复杂度）
+        3. 只对候选对计算 TF-IDF 余弦相似度，不构建 N×N 稠密矩阵
+        4. 按输入顺序保留先出现的文件，删除与已保留文件相似度超过阈值的后续文件
+
         Args:
             file_paths: 文件路径列表
-            
+
         Returns:
-            去重后的文件路径列表
+            去重后的文件路径列表（保持输入顺序）
         """
-        if not SKLEARN_AVAILABLE or TfidfVectorizer is None or cosine_similarity is None:
+        if not SKLEARN_AVAILABLE or HashingVectorizer is None or TfidfTransformer is None:
             return self._md5_deduplicate(file_paths)
 
-        # 读取文件内容
-        contents = []
+        # 读取（或从指纹索引复用）文件指纹，过滤空文件，并去掉完全相同的内容
+        fingerprints = []
         valid_paths = []
-        
-        for file_path in file_paths:
-            content = self._read_file_content(file_path)
-            if content.strip():  # 过滤空文件
-                contents.append(content)
-                valid_paths.append(file_path)
-            else:
+        seen_hashes: Set[str] = set()
+        exact_duplicates = 0
+
+        for file_path, fingerprint in zip(file_paths, self._get_fingerprints(file_paths)):
+            if fingerprint is None or fingerprint.signature.size == 0:  # 过滤空文件
                 logger.debug(f"跳过空文件: {file_path}")
-        
-        if len(valid_paths) == 0:
-            return []
-        
-        if len(valid_paths) == 1:
+                continue
+            if fingerprint.md5 in seen_hashes:
+                exact_duplicates += 1
+                logger.debug(f"检测到重复文件（MD5）: {file_path}")
+                continue
+            seen_hashes.add(fingerprint.md5)
+            fingerprints.append(fingerprint)
+            valid_paths.append(file_path)
+
+        if len(valid_paths) <= 1:
             return valid_paths
-        
+
         try:
-            # 构建 TF-IDF 向量
-            vectorizer = TfidfVectorizer(
-                max_features=5000,
-                stop_words=None,  # 不移除停用词（支持中英文）
-                ngram_range=(1, 2)  # unigram + bigram
+            # LSH 候选对
+            lsh = MinHashLSH(num_perm=self.num_perm, threshold=self.lsh_threshold)
+            pairs = lsh.candidate_pairs([fingerprint.signature for fingerprint in fingerprints])
+
+            to_keep = np.ones(len(valid_paths), dtype=bool)
+            if pairs:
+                # 只对候选对计算 TF-IDF 余弦相似度（行已 L2 归一化，逐行点积即余弦）
+                tfidf_matrix = self._tfidf_matrix(fingerprints)
+                left = np.fromiter((i for i, _ in pairs), dtype=np.int64, count=len(pairs))
+                right = np.fromiter((j for _, j in pairs), dtype=np.int64, count=len(pairs))
+                similarities = self._pair_similarities(tfidf_matrix, left, right)
+
+                similar = similarities >= self.similarity_threshold
+                neighbors: Dict[int, List[int]] = {}
+                for i, j, similarity in zip(left[similar], right[similar], similarities[similar]):
+                    neighbors.setdefault(int(i), []).append(int(j))
+                    logger.debug(
+                        f"检测到相似文件 (sim={similarity:.3f}): "
+                        f"{os.path.basename(valid_paths[i])} vs "
+                        f"{os.path.basename(valid_paths[j])}"
+                    )
+
+                # 去重逻辑：保留第一个遇到的文档，删除后续相似的
+                for i in range(len(valid_paths)):
+                    if to_keep[i] and i in neighbors:
+                        to_keep[neighbors[i]] = False
+
+            unique_files = [path for path, keep in zip(valid_paths, to_keep) if keep]
+
+            removed_count = len(valid_paths) - len(unique_files) + exact_duplicates
+            logger.info(
+                f"MinHash/LSH 去重完成: 候选对 {len(pairs)} 个, 保留 {len(unique_files)} 个, "
+                f"未输出 {removed_count} 个"
             )
-            
-            tfidf_matrix = vectorizer.fit_transform(contents)
-            
-            # 计算余弦相似度矩阵
-            similarity_matrix = cosine_similarity(tfidf_matrix)
-            
-            # 去重逻辑：保留第一个遇到的文档，删除后续相似的
-            to_keep = set(range(len(valid_paths)))
-            
-            for i in range(len(valid_paths)):
-                if i not in to_keep:
-                    continue
-                
-                for j in range(i + 1, len(valid_paths)):
-                    if j not in to_keep:
-                        continue
-                    
-                    similarity = similarity_matrix[i, j]
-                    
-                    if similarity >= self.similarity_threshold:
-                        to_keep.discard(j)
-                        logger.debug(
-                            f"检测到相似文件 (sim={similarity:.3f}): "
-                            f"{os.path.basename(valid_paths[i])} vs "
-                            f"{os.path.basename(valid_paths[j])}"
-                        )
-            
-            unique_files = [valid_paths[i] for i in sorted(to_keep)]
-            
-            removed_count = len(valid_paths) - len(unique_files)
-            logger.info(f"TF-IDF 去重完成: 保留 {len(unique_files)} 个, 未输出 {removed_count} 个")
-            
+
             return unique_files
-            
+
         except Exception as e:
-            logger.error(f"TF-IDF 去重失败，回退到 MD5 方案: {e}")
+            logger.error(f"MinHash/LSH 去重失败，回退到 MD5 方案: {e}")
             return self._md5_deduplicate(valid_paths)
 
+    @staticmethod
+    def _tfidf_matrix(fingerprints: "List[FileFingerprint]"):
+        """由指纹中保存的哈希词频重建 L2 归一化的 TF-IDF 稀疏矩阵（IDF 在当前文件集合上计算）"""
+        assert TfidfTransformer is not None
+        indptr = np.cumsum([0] + [fp.term_indices.size for fp in fingerprints])
+        counts = csr_matrix(
+            (
+                np.concatenate([fp.term_counts for fp in fingerprints]),
+                np.concatenate([fp.term_indices for fp in fingerprints]),
+                indptr,
+            ),
+            shape=(len(fingerprints), HASH_FEATURES)
+        )
+        return TfidfTransformer().fit_transform(counts).tocsr()
+
+    @staticmethod
+    def _pair_similarities(tfidf_matrix, left, right):
+        """计算候选对的余弦相似度：按右端点分组，每组一次稀疏矩阵乘法"""
+        # 哈希特征空间有 2^20 列，先压缩到实际出现的列，避免稀疏格式转换按列数分配内存
+        used_columns, compact_indices = np.unique(tfidf_matrix.indices, return_inverse=True)
+        tfidf_matrix = csr_matrix(
+            (tfidf_matrix.data, compact_indices.ravel(), tfidf_matrix.indptr),
+            shape=(tfidf_matrix.shape[0], len(used_columns))
+        )
+        similarities = np.empty(len(left), dtype=np.float64)
+        order = np.argsort(right, kind="stable")
+        boundaries = np.flatnonzero(np.diff(right[order])) + 1
+        for group in np.split(order, boundaries):
+            j = right[group[0]]
+            similarities[group] = (tfidf_matrix[left[group]] @ tfidf_matrix[j].T).toarray().ravel()
+        return similarities
+
+    def _compute_fingerprint(self, file_path: str, mtime: float, size: int) -> "FileFingerprint":
+        """读取文件并计算指纹（内容为空时签名为空数组）"""
+        assert self.min_hasher is not None and self._hashing_vectorizer is not None
+        content = self._read_file_content(file_path)
+        if not content.strip():
+            empty = np.empty(0)
+            return FileFingerprint(file_path, mtime, size, self._calculate_md5(content), empty, empty, empty)
+        counts = self._hashing_vectorizer.transform([content]).tocsr()
+        counts.sum_duplicates()
+        return FileFingerprint(
+            path=file_path,
+            mtime=mtime,
+            size=size,
+            md5=self._calculate_md5(content),
+            signature=self.min_hasher.signature(shingle_hashes(content, self.shingle_size)),
+            term_indices=counts.indices.astype(np.int32),
+            term_counts=counts.data.astype(np.float32),
+        )
+
+    def _get_fingerprints(self, file_paths: List[str]) -> "List[Optional[FileFingerprint]]":
+        """获取文件指纹：文件 (mtime, 大小) 未变化时复用指纹索引，否则读取文件重新计算并写回
+
+        Returns:
+            与 file_paths 对齐的指纹列表，文件不存在时为 None
+        """
+        stats = stat_files(file_paths)
+        cached = self.fingerprint_index.get_many(stats) if self.fingerprint_index is not None else {}
+        computed: "List[FileFingerprint]" = []
+        fingerprints: "List[Optional[FileFingerprint]]" = []
+        for file_path in file_paths:
+            fingerprint = cached.get(file_path)
+            if fingerprint is None and file_path in stats:
+                fingerprint = self._compute_fingerprint(file_path, *stats[file_path])
+                cached[file_path] = fingerprint
+                computed.append(fingerprint)
+            fingerprints.append(fingerprint)
+        if self.fingerprint_index is not None and computed:
+            self.fingerprint_index.put_many(computed)
+        logger.debug(f"文件指纹: 复用 {len(file_paths) - len(computed)} 个, 新计算 {len(computed)} 个")
+        return fingerprints
+
     def deduplicate_file_list(self, file_paths: List[str]) -> Tuple[List[str], List[str]]:
         """对文件路径列表进行去重（不做物理删除）
 
@@ -339,6 +437,41 @@ class FileDeduplicator:
 
         return kept_candidates, removed_candidates
     
+    async def adeduplicate_file_list(self, file_paths: List[str]) -> Tuple[List[str], List[str]]:
+        """deduplicate_file_list 的异步版本：在 CPU 进程池中执行，不阻塞事件循环
+
+        Args:
+            file_paths: 文件路径列表
+
+        Returns:
+            Tuple[List[str], List[str]]: (保留的文件列表, 未输出的文件列表)
+        """
+        if not file_paths:
+            return [], []
+        return await run_in_process(self.deduplicate_file_list, list(file_paths))
+
+    async def adeduplicate_against_reference(
+        self,
+        reference_paths: List[str],
+        candidate_paths: List[str]
+    ) -> Tuple[List[str], List[str]]:
+        """deduplicate_against_reference 的异步版本：在 CPU 进程池中执行，不阻塞事件循环
+
+        Args:
+            reference_paths: 参考文件路径列表（优先保留）
+            candidate_paths: 候选文件路径列表
+
+        Returns:
+            Tuple[List[str], List[str]]: (保留的候选路径, 未输出的候选路径)
+        """
+        if not candidate_paths:
+            return [], []
+        return await run_in_process(
+            self.deduplicate_against_reference,
+            list(reference_paths),
+            list(candidate_paths)
+        )
+
     def deduplicate(
         self,
         directory: str,
@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+文件指纹索引
+
+为去重持久化每个文件的指纹，键为 (路径, mtime, 大小)，文件未变化时直接复用：
+- md5: 内容 MD5，用于完全重复检测
+- signature: MinHash 签名，用于 LSH 候选
+- term_indices / term_counts: 哈希特征空间中的词频（稀疏），用于重建 TF-IDF 向量
+
+跨阶段（第一阶段文件作为参考集合）和跨查询都不必重新读取、重新向量化已见过的文件
+"""
+
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class FileFingerprint:
+    """单个文件的去重指纹"""
+    path: str
+    mtime: float
+    size: int
+    md5: str
+    signature: np.ndarray  # MinHash 签名 (uint64)
+    term_indices: np.ndarray  # 哈希特征下标 (int32)
+    term_counts: np.ndarray  # 对应词频 (float32)
+
+
+class FingerprintIndex:
+    """基于 SQLite 的文件指纹存储（线程安全，可被 pickle 到子进程后重新连接）"""
+
+    def __init__(self, db_path: str, params: str = ""):
+        """初始化指纹索引
+
+        Args:
+            db_path: SQLite 文件路径
+            params: 指纹计算参数摘要（签名长度、shingle 长度等），参数不同的旧指纹视为失效
+        """
+        self.db_path = db_path
+        self.params = params
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        logger.info(f"初始化 FingerprintIndex: db_path={db_path}, params={params}")
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_conn"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟建立连接（调用方持有锁）"""
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            # WAL 允许进程池中的多个去重进程并发读写
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS fingerprints ("
+                "path TEXT PRIMARY KEY, mtime REAL NOT NULL, size INTEGER NOT NULL, params TEXT NOT NULL, "
+                "md5 TEXT NOT NULL, signature BLOB NOT NULL, term_indices BLOB NOT NULL, term_counts BLOB NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get_many(self, stats: Dict[str, Tuple[float, int]]) -> Dict[str, FileFingerprint]:
+        """批量读取仍然有效的指纹
+
+        Args:
+            stats: 路径 -> (mtime, size)
+
+        Returns:
+            路径 -> 指纹，仅包含 mtime、大小和计算参数都与当前一致的条目
+        """
+        if not stats:
+            return {}
+        paths = list(stats)
+        found: Dict[str, FileFingerprint] = {}
+        with self._lock:
+            try:
+                conn = self._connect()
+                # SQLite 单条语句的参数个数有限，分段查询
+                for start in range(0, len(paths), 500):
+                    chunk = paths[start:start + 500]
+                    rows = conn.execute(
+                        "SELECT path, mtime, size, params, md5, signature, term_indices, term_counts "
+                        f"FROM fingerprints WHERE path IN ({','.join('?' * len(chunk))})",
+                        chunk
+                    ).fetchall()
+                    for path, mtime, size, params, md5, signature, term_indices, term_counts in rows:
+                        if (mtime, size) != stats[path] or params != self.params:
+                            continue
+                        found[path] = FileFingerprint(
+                            path=path,
+                            mtime=mtime,
+                            size=size,
+                            md5=md5,
+                            signature=np.frombuffer(signature, dtype=np.uint64),
+                            term_indices=np.frombuffer(term_indices, dtype=np.int32),
+                            term_counts=np.frombuffer(term_counts, dtype=np.float32),
+                        )
+            except sqlite3.Error as e:
+                logger.warning(f"读取文件指纹失败，将重新计算: {e}")
+        return found
+
+    def put_many(self, fingerprints: Sequence[FileFingerprint]) -> None:
+        """批量写入（覆盖同路径的旧指纹）"""
+        if not fingerprints:
+            return
+        rows = [
+            (
+                fp.path, fp.mtime, fp.size, self.params, fp.md5,
+                np.ascontiguousarray(fp.signature, dtype=np.uint64).tobytes(),
+                np.ascontiguousarray(fp.term_indices, dtype=np.int32).tobytes(),
+                np.ascontiguousarray(fp.term_counts, dtype=np.float32).tobytes(),
+            )
+            for fp in fingerprints
+        ]
+        with self._lock:
+            try:
+                conn = self._connect()
+                conn.executemany("INSERT OR REPLACE INTO fingerprints VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+                conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"写入文件指纹失败: {e}")
+
+    def close(self) -> None:
+        """关闭连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def stat_files(paths: List[str]) -> Dict[str, Tuple[float, int]]:
+    """读取文件的 (mtime, size)，不存在的文件跳过"""
+    stats: Dict[str, Tuple[float, int]] = {}
+    for path in paths:
+        try:
+            stat = Path(path).stat()
+        except OSError:
+            continue
+        stats[path] = (stat.st_mtime, stat.st_size)
+    return stats
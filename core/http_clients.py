@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+共享 HTTP 连接池
+按 base_url 复用 keep-alive（可用时启用 HTTP/2）的 httpx.AsyncClient，
+避免每次请求都重新建立 TCP/TLS 连接
+
+httpx.AsyncClient 的连接绑定在创建它的事件循环上，因此注册表按 (base_url, 事件循环) 区分
+
+- get_host_client: 搜索器按 API 主机获取客户端（同一主机的所有搜索请求共用 keep-alive 连接）
+- get_download_client: 全文下载访问的镜像主机不固定，共用一个不带 base_url 的客户端。
+  httpx 的 max_connections 限制的是整个客户端的连接总数（不是每个 origin），
+  因此下载客户端使用单独、更大的上限（Config.DOWNLOAD_POOL_*）
+- 启用 Config.RATE_LIMIT_ENABLED 时，客户端发出的每个请求都经过 core.rate_limiter 的按主机限速
+"""
+
+import asyncio
+import importlib.util
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from core.config import Config
+from core.log_config import setup_logger
+from core.rate_limiter import RateLimitedAsyncClient
+
+logger = setup_logger(__name__)
+
+# HTTP/2 依赖 h2 包（pip install "httpx[http2]"），未安装时退回 HTTP/1.1 keep-alive
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+_clients: Dict[Tuple[str, asyncio.AbstractEventLoop], httpx.AsyncClient] = {}
+_clients_lock = threading.Lock()
+
+
+def _normalize_base_url(base_url: str) -> str:
+    return (base_url or "").rstrip("/")
+
+
+def get_shared_async_client(
+    base_url: str,
+    timeout: float = 60.0,
+    headers: Optional[Dict[str, str]] = None,
+    limits: Optional[httpx.Limits] = None
+) -> httpx.AsyncClient:
+    """获取 base_url 对应的共享 AsyncClient（必须在事件循环中调用）
+
+    Args:
+        base_url: 服务地址
+        timeout: 默认请求超时（秒），仅在首次创建时生效，单次请求可通过 timeout 参数覆盖
+        headers: 默认请求头（如 API 要求的 User-Agent），仅在首次创建时生效
+        limits: 连接池限制，默认 Config.HTTP_POOL_*，仅在首次创建时生效
+
+    Returns:
+        当前事件循环下该 base_url 的共享客户端
+    """
+    loop = asyncio.get_running_loop()
+    key = (_normalize_base_url(base_url), loop)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is not None and not client.is_closed:
+            return client
+        # 顺带清理已关闭事件循环遗留的客户端
+        for stale_key in [k for k in _clients if k[1].is_closed()]:
+            _clients.pop(stale_key)
+        client_class = RateLimitedAsyncClient if Config.RATE_LIMIT_ENABLED else httpx.AsyncClient
+        client = client_class(
+            base_url=key[0],
+            timeout=timeout,
+            headers=headers,
+            http2=HTTP2_AVAILABLE,
+            limits=limits or httpx.Limits(
+                max_connections=Config.HTTP_POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.HTTP_POOL_MAX_KEEPALIVE,
+                keepalive_expiry=Config.HTTP_POOL_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _clients[key] = client
+    logger.info(f"创建共享 HTTP 客户端: base_url={key[0]}, http2={HTTP2_AVAILABLE}")
+    return client
+
+
+def get_host_client(
+    url: str,
+    timeout: float = 30.0,
+    headers: Optional[Dict[str, str]] = None
+) -> httpx.AsyncClient:
+    """按主机（scheme://host[:port]）获取共享客户端，url 可以是该主机下的任意地址"""
+    parts = urlsplit(url)
+    return get_shared_async_client(f"{parts.scheme}://{parts.netloc}", timeout=timeout, headers=headers)
+
+
+def get_download_client(timeout: float = 30.0) -> httpx.AsyncClient:
+    """获取全文下载共用的客户端（不限主机，请求需使用完整 URL）
+
+    所有执行器的 PDF 下载（含对冲下载的多路请求）都经过这一个客户端，
+    连接总数上限为 Config.DOWNLOAD_POOL_MAX_CONNECTIONS
+    """
+    limits = httpx.Limits(
+        max_connections=Config.DOWNLOAD_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=Config.DOWNLOAD_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=Config.HTTP_POOL_KEEPALIVE_EXPIRY,
+    )
+    return get_shared_async_client("", timeout=timeout, limits=limits)
+
+
+async def close_shared_async_clients(base_url: Optional[str] = None) -> None:
+    """关闭当前事件循环下的共享客户端
+
+    Args:
+        base_url: 只关闭该地址的客户端，为空时关闭全部
+    """
+    loop = asyncio.get_running_loop()
+    target = _normalize_base_url(base_url) if base_url is not None else None
+    with _clients_lock:
+        keys = [
+            key for key in _clients
+            if key[1] is loop and (target is None or key[0] == target)
+        ]
+        clients = [_clients.pop(key) for key in keys]
+    for client in clients:
+        await client.aclose()
+    if clients:
+        logger.info(f"已关闭 {len(clients)} 个共享 HTTP 客户端")
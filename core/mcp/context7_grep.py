@@ -4,13 +4,14 @@ Context7 和 Grep MCP 客户端集成模块
 使用 langchain-adapter-mcp 连接 Context7 和 Grep MCP 服务器
 提供统一的工具接口
 
-注意：这两个 MCP 服务器使用 streamable_http 传输模式连接到远程服务
+注意：Context7 使用 streamable_http 传输模式连接到远程服务，Grep 使用本地 stdio 服务器；
+两者都通过 core.mcp.session_manager 在进程内共享同一个会话
 """
 
 import os
 from typing import List, Dict, Any
 from langchain_core.tools import BaseTool
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from core.mcp.session_manager import register_mcp_server, get_mcp_tools
 
 
 class Context7GrepMCPClient:
@@ -27,7 +28,6 @@ class Context7GrepMCPClient:
         self.context7_api_key=os.getenv("CONTEXT7_API_KEY")
         self.context7_need=context7_need
         self.grep_need= grep_need
-        self._client = None
         self._tools = None
 
     def _get_proxy_env(self) -> Dict[str, str]:
@@ -71,7 +71,8 @@ class Context7GrepMCPClient:
             config["grep"] = {
                 "transport": "stdio",
                 "command": "python",
-                "args": ["core/mcp/grep_mcp/server.py"],
+                "args": ["-m", "core.mcp.grep_mcp"],
+                "cwd": os.path.dirname(os.path.dirname(os.path.dirname(__file__))),  # 项目根目录，服务器导入 core.rate_limiter
                 "env": self._get_proxy_env(),
             }
         return config
@@ -86,11 +87,12 @@ class Context7GrepMCPClient:
         if self._tools is not None:
             return self._tools
 
-        if self._client is None:
-            config = await self._get_client_config()
-            self._client = MultiServerMCPClient(config)
-
-        self._tools = await self._client.get_tools()
+        config = await self._get_client_config()
+        tools = []
+        for server_name, connection in config.items():
+            register_mcp_server(server_name, connection)
+            tools.extend(await get_mcp_tools(server_name))
+        self._tools = tools
         return self._tools
 
     async def get_context7_tools(self) -> List[BaseTool]:
@@ -117,7 +119,7 @@ class Context7GrepMCPClient:
         return [tool for tool in all_tools if "grep" in tool.name.lower()]
 
     async def close(self):
-        self._client = None
+        """释放工具引用；共享会话由 close_mcp_sessions 在进程关闭时统一关闭"""
         self._tools = None
 
 
@@ -14,6 +14,9 @@ import uvicorn
 import re
 from pydantic import Field
 
+from core.config import Config
+from core.rate_limiter import get_rate_limiter
+
 # Initialize FastMCP server for grep.app functionality
 mcp = FastMCP("grep-mcp")
 
@@ -34,6 +37,21 @@ class GrepAPIRateLimitError(GrepAPIError):
     pass
 
 
+async def _rate_limited_get(session: aiohttp.ClientSession, url: str, params: Dict[str, str]) -> aiohttp.ClientResponse:
+    """Send a GET through the shared per-host rate limiter, waiting out Retry-After on 429 before retrying."""
+    if not Config.RATE_LIMIT_ENABLED:
+        return await session.get(url, params=params)
+    limiter = get_rate_limiter(url)
+    for attempt in range(Config.RATE_LIMIT_RETRIES + 1):
+        await limiter.acquire()
+        response = await session.get(url, params=params)
+        delay = limiter.observe(response.status, response.headers.get("Retry-After"))
+        if delay is None or attempt == Config.RATE_LIMIT_RETRIES:
+            return response
+        response.release()
+    return response
+
+
 def _extract_text_from_html(html_snippet: str) -> str:
     """Extract clean text from HTML snippet by removing tags."""
     # Simple HTML tag removal using regex
@@ -230,7 +248,7 @@ async def grep_query(
         ) as session:
             url = "https://grep.app/api/search"
             
-            async with session.get(url, params=params) as response:
+            async with await _rate_limited_get(session, url, params) as response:
                 if response.status == 429:
                     raise GrepAPIRateLimitError("Rate limit exceeded. Please wait before making another request.")
                 
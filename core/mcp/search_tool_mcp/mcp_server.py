@@ -5,17 +5,24 @@ Paper Search MCP Server
 """
 
 import asyncio
+import functools
+import inspect
 import json
 import sys
 import os
 import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
 from concurrent_log_handler import ConcurrentRotatingFileHandler
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, Iterator, List
 from mcp.server import Server
 from mcp.server.stdio import stdio_server
-from mcp.types import Tool, TextContent
+from mcp.types import Tool, TextContent, ToolAnnotations
 from core.config import Config
+from core.http_clients import close_shared_async_clients
+from core.rate_limiter import get_rate_limiter_stats
 
 # 导入所有搜索器
 from tools.core_tools.wikipedia_searcher import WikipediaSearcher
@@ -25,6 +32,7 @@ from tools.core_tools.akshare_searcher import AkShareSearcher
 from tools.core_tools.exa_summary import ExaSearcherSummary
 from tools.core_tools.exa_context import ExaSearcherContext
 from tools.core_tools.paper import Paper
+from core.mcp.search_tool_mcp.search_cache import SearchResultCache
 
 # 创建 MCP Server 实例
 app = Server("paper-search-server")
@@ -51,6 +59,58 @@ akshare_searcher = AkShareSearcher()
 exa_summary_searcher = ExaSearcherSummary()
 exa_context_searcher = ExaSearcherContext()
 
+# 同步搜索器（Tavily、Exa、SEC EDGAR、AkShare）在有界线程池中执行，
+# 不阻塞 stdio server 的事件循环，多个 ExecutorAgent 的工具调用可以并发处理
+blocking_executor = ThreadPoolExecutor(
+    max_workers=Config.MCP_SEARCH_MAX_WORKERS,
+    thread_name_prefix="mcp-search"
+)
+
+# 搜索结果缓存：相同工具 + 规范化参数在 TTL 内直接返回
+search_cache = SearchResultCache(
+    ttls=Config.MCP_SEARCH_CACHE_TTLS if Config.MCP_SEARCH_CACHE_ENABLED else {},
+    max_entries=Config.MCP_SEARCH_CACHE_MAX_ENTRIES,
+    max_bytes=Config.MCP_SEARCH_CACHE_MAX_BYTES,
+    db_path=Config.MCP_SEARCH_CACHE_PATH if Config.MCP_SEARCH_CACHE_PERSIST else None
+)
+
+# 各工具正在处理中的调用数与累计完成数
+in_flight_counts: Counter = Counter()
+completed_counts: Counter = Counter()
+
+
+@contextmanager
+def track_in_flight(name: str) -> Iterator[int]:
+    """统计工具的在途调用数，返回进入时（含本次）的在途数"""
+    in_flight_counts[name] += 1
+    try:
+        yield in_flight_counts[name]
+    finally:
+        in_flight_counts[name] -= 1
+        if not in_flight_counts[name]:
+            del in_flight_counts[name]
+        completed_counts[name] += 1
+
+
+def get_server_stats() -> Dict[str, Any]:
+    """服务器负载快照：各工具在途调用数、累计完成数与线程池大小"""
+    return {
+        "in_flight": dict(in_flight_counts),
+        "in_flight_total": sum(in_flight_counts.values()),
+        "completed": dict(completed_counts),
+        "max_workers": Config.MCP_SEARCH_MAX_WORKERS,
+        "cache": search_cache.get_stats(),
+        "rate_limits": get_rate_limiter_stats(),
+    }
+
+
+async def call_searcher(method: Callable, *args, **kwargs) -> Any:
+    """调用搜索器方法：原生异步方法直接 await，同步方法放到线程池执行"""
+    if inspect.iscoroutinefunction(method):
+        return await method(*args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, functools.partial(method, *args, **kwargs))
+
 
 def paper_to_dict(paper: Paper) -> Dict[str, Any]:
     """将 Paper 对象转换为字典"""
@@ -72,6 +132,10 @@ def paper_to_dict(paper: Paper) -> Dict[str, Any]:
     }
 
 
+# 下载工具会写文件，共享会话因连接断开重启后不自动重试（见 core.mcp.session_manager）
+DOWNLOAD_TOOL_ANNOTATIONS = ToolAnnotations(readOnlyHint=False, idempotentHint=False)
+
+
 @app.list_tools()
 async def list_tools() -> List[Tool]:
     """列出所有可用的工具"""
@@ -93,6 +157,7 @@ async def list_tools() -> List[Tool]:
         ),
         Tool(
             name="wikipedia_download",
+            annotations=DOWNLOAD_TOOL_ANNOTATIONS,
             description="下载 Wikipedia 搜索结果为 Markdown 文件",
             inputSchema={
                 "type": "object",
@@ -127,6 +192,7 @@ async def list_tools() -> List[Tool]:
         ),
         Tool(
             name="tavily_download",
+            annotations=DOWNLOAD_TOOL_ANNOTATIONS,
             description="下载 Tavily 搜索结果为 Markdown 文件",
             inputSchema={
                 "type": "object",
@@ -161,6 +227,7 @@ async def list_tools() -> List[Tool]:
         ),
         Tool(
             name="sec_edgar_download",
+            annotations=DOWNLOAD_TOOL_ANNOTATIONS,
             description="下载 SEC EDGAR 搜索结果为 Markdown 文件",
             inputSchema={
                 "type": "object",
@@ -195,6 +262,7 @@ async def list_tools() -> List[Tool]:
         ),
         Tool(
             name="akshare_download",
+            annotations=DOWNLOAD_TOOL_ANNOTATIONS,
             description="下载 AkShare 搜索结果为 Markdown 文件",
             inputSchema={
                 "type": "object",
@@ -235,6 +303,7 @@ async def list_tools() -> List[Tool]:
         ),
         Tool(
             name="exa_summary_download",
+            annotations=DOWNLOAD_TOOL_ANNOTATIONS,
             description="下载 Exa Summary 搜索结果为 Markdown 文件",
             inputSchema={
                 "type": "object",
@@ -275,6 +344,7 @@ async def list_tools() -> List[Tool]:
         ),
         Tool(
             name="exa_context_download",
+            annotations=DOWNLOAD_TOOL_ANNOTATIONS,
             description="下载 Exa Context 搜索结果为 Markdown 文件",
             inputSchema={
                 "type": "object",
@@ -292,6 +362,16 @@ async def list_tools() -> List[Tool]:
                 "required": ["papers"]
             }
         ),
+
+        # 服务器状态（名称不含 search/download，不会被 get_tools 按类型分发给 Agent）
+        Tool(
+            name="server_stats",
+            description="返回 MCP Server 各工具当前的在途调用数、累计完成数与搜索缓存命中统计",
+            inputSchema={
+                "type": "object",
+                "properties": {}
+            }
+        ),
     ]
 
 
@@ -304,15 +384,11 @@ async def handle_search(searcher, arguments: Dict) -> List[Dict]:
         f"handle_search: searcher={type(searcher).__name__}, query={query}, search_type={search_type}"
     )
 
-    # WikipediaSearcher 是异步的
-    if isinstance(searcher, WikipediaSearcher):
-        papers = await searcher.search(query)
-    # ExaSearcher 是同步的，支持 type 参数
-    elif search_type and (isinstance(searcher, ExaSearcherSummary) or isinstance(searcher, ExaSearcherContext)):
-        papers =searcher.search(query, type=search_type)
-    # 其他搜索器（Tavily, SEC EDGAR, AkShare）都是同步的
+    # ExaSearcher 支持 type 参数；WikipediaSearcher 是异步的，其余同步搜索器在线程池中执行
+    if search_type and (isinstance(searcher, ExaSearcherSummary) or isinstance(searcher, ExaSearcherContext)):
+        papers = await call_searcher(searcher.search, query, type=search_type)
     else:
-        papers = searcher.search(query)
+        papers = await call_searcher(searcher.search, query)
 
     results = [paper_to_dict(p) for p in papers]
     if results:
@@ -351,10 +427,10 @@ async def handle_download(searcher, arguments: Dict) -> List[Dict]:
                     paper["published_date"] = None
         normalized_papers.append(paper)
     papers = [Paper(**p) for p in normalized_papers]
-    if isinstance(searcher, WikipediaSearcher):
-        downloaded = await searcher.download(papers, save_path) if save_path else await searcher.download(papers)
+    if save_path:
+        downloaded = await call_searcher(searcher.download, papers, save_path)
     else:
-        downloaded = searcher.download(papers, save_path) if save_path else searcher.download(papers)
+        downloaded = await call_searcher(searcher.download, papers)
 
     results = [paper_to_dict(p) for p in downloaded]
     if results:
@@ -398,15 +474,30 @@ async def call_tool(name: str, arguments: Any) -> List[TextContent]:
     
     try:
         logger.info(f"call_tool: name={name}, args={arguments}")
+        if name == "server_stats":
+            return [TextContent(type="text", text=json.dumps(get_server_stats(), ensure_ascii=False))]
         # 从映射字典中获取处理函数和搜索器
         if name in TOOL_HANDLERS:
             handler_func, searcher = TOOL_HANDLERS[name]
-            results = await handler_func(searcher, arguments)
+            cached = search_cache.get(name, arguments)
+            if cached is not None:
+                results, cache_age = cached
+                in_flight = in_flight_counts[name]
+                logger.info(f"call_tool: name={name}, 命中搜索缓存, age={cache_age:.0f}s, count={len(results)}")
+            else:
+                cache_age = None
+                with track_in_flight(name) as in_flight:
+                    logger.info(f"call_tool: name={name}, in_flight={in_flight}, in_flight_total={sum(in_flight_counts.values())}")
+                    results = await handler_func(searcher, arguments)
+                search_cache.put(name, arguments, results)
             payload = {
                 "source_tool": name,
                 "result_type": "papers",
                 "count": len(results),
-                "papers": results
+                "papers": results,
+                "in_flight": in_flight,
+                "cache_hit": cached is not None,
+                "cache_age": cache_age
             }
             logger.info(
                 f"call_tool payload: source_tool={name}, result_type=papers, count={len(results)}"
@@ -429,12 +520,17 @@ async def call_tool(name: str, arguments: Any) -> List[TextContent]:
 
 async def main():
     """主函数：启动 MCP Server (stdio 模式)"""
-    async with stdio_server() as (read_stream, write_stream):
-        await app.run(
-            read_stream,
-            write_stream,
-            app.create_initialization_options()
-        )
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            await app.run(
+                read_stream,
+                write_stream,
+                app.create_initialization_options()
+            )
+    finally:
+        blocking_executor.shutdown(wait=False, cancel_futures=True)
+        search_cache.close()
+        await close_shared_async_clients()
 
 
 if __name__ == "__main__":
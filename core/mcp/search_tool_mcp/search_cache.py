@@ -0,0 +1,194 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+搜索结果缓存
+以 (工具名, 规范化参数) 为键缓存 MCP 搜索工具的返回结果，不同子问题、不同用户的相同查询
+在有效期内直接命中，不再访问外部搜索 API
+
+- 每个工具单独配置 TTL（秒），TTL <= 0 的工具不缓存（下载类工具）
+- 内存层: OrderedDict 实现的 LRU，同时限制条数与序列化后的总字节数
+- 磁盘层（可选）: SQLite，进程重启后仍可命中，读取时按过期时间过滤
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_PURGE_INTERVAL = 200  # 每写入多少次清理一次磁盘层的过期条目
+
+
+def normalize_arguments(arguments: Dict[str, Any]) -> str:
+    """规范化工具参数：字符串去首尾空白、压缩空白并转小写，忽略空值，键排序后序列化"""
+    normalized = {}
+    for key, value in (arguments or {}).items():
+        if value is None or value == "":
+            continue
+        if isinstance(value, str):
+            value = " ".join(value.split()).casefold()
+        normalized[key] = value
+    return json.dumps(normalized, ensure_ascii=False, sort_keys=True, default=str)
+
+
+class SearchResultCache:
+    """搜索结果两级缓存（线程安全）"""
+
+    def __init__(
+        self,
+        ttls: Dict[str, float],
+        max_entries: int = 2000,
+        max_bytes: int = 64 * 1024 * 1024,
+        db_path: Optional[str] = None
+    ):
+        """初始化缓存
+
+        Args:
+            ttls: 工具名 -> 结果有效期（秒），未配置或 <= 0 的工具不缓存
+            max_entries: 内存层最大条数
+            max_bytes: 内存层序列化结果的总字节数上限
+            db_path: SQLite 文件路径，为空时只使用内存缓存
+        """
+        self.ttls = dict(ttls)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.db_path = db_path
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # key -> (created_at, expires_at, payload_json)
+        self._entries: "OrderedDict[str, Tuple[float, float, str]]" = OrderedDict()
+        self._bytes = 0
+        self._writes = 0
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if db_path:
+            try:
+                Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS search_results ("
+                    "key TEXT PRIMARY KEY, tool TEXT NOT NULL, created_at REAL NOT NULL, "
+                    "expires_at REAL NOT NULL, payload TEXT NOT NULL)"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"打开搜索结果磁盘缓存失败，仅使用内存缓存: {db_path}, {e}")
+                self._conn = None
+        logger.info(
+            f"初始化 SearchResultCache: max_entries={max_entries}, max_bytes={max_bytes}, "
+            f"db_path={db_path if self._conn else None}, ttls={self.ttls}"
+        )
+
+    def is_cacheable(self, tool: str) -> bool:
+        """该工具是否启用缓存"""
+        return self.ttls.get(tool, 0) > 0
+
+    @staticmethod
+    def make_key(tool: str, arguments: Dict[str, Any]) -> str:
+        """缓存键：工具名 + 规范化参数的 SHA-256"""
+        digest = hashlib.sha256(normalize_arguments(arguments).encode("utf-8")).hexdigest()
+        return f"{tool}:{digest}"
+
+    def _evict(self) -> None:
+        """按 LRU 淘汰到条数和字节数上限以内（调用方持有锁）"""
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, _, payload) = self._entries.popitem(last=False)
+            self._bytes -= len(payload)
+
+    def _remember(self, key: str, created_at: float, expires_at: float, payload: str) -> None:
+        """写入内存层（调用方持有锁）"""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._bytes -= len(old[2])
+        self._entries[key] = (created_at, expires_at, payload)
+        self._bytes += len(payload)
+        self._evict()
+
+    def get(self, tool: str, arguments: Dict[str, Any]) -> Optional[Tuple[List[Dict[str, Any]], float]]:
+        """查询缓存
+
+        Returns:
+            (结果列表, 缓存年龄秒数)，未命中或已过期时返回 None
+        """
+        if not self.is_cacheable(tool):
+            return None
+        key = self.make_key(tool, arguments)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] <= now:
+                self._entries.pop(key)
+                self._bytes -= len(entry[2])
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+            elif self._conn is not None:
+                try:
+                    row = self._conn.execute(
+                        "SELECT created_at, expires_at, payload FROM search_results WHERE key = ? AND expires_at > ?",
+                        (key, now)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    logger.warning(f"读取搜索结果磁盘缓存失败: {e}")
+                    row = None
+                if row is not None:
+                    entry = (row[0], row[1], row[2])
+                    self._remember(key, *entry)
+
+            counter = self.hits if entry is not None else self.misses
+            counter[tool] = counter.get(tool, 0) + 1
+        if entry is None:
+            return None
+        return json.loads(entry[2]), now - entry[0]
+
+    def put(self, tool: str, arguments: Dict[str, Any], results: List[Dict[str, Any]]) -> None:
+        """写入缓存（空结果不缓存，避免把临时失败固化）"""
+        if not self.is_cacheable(tool) or not results:
+            return
+        key = self.make_key(tool, arguments)
+        payload = json.dumps(results, ensure_ascii=False, default=str)
+        created_at = time.time()
+        expires_at = created_at + self.ttls[tool]
+        with self._lock:
+            if len(payload) <= self.max_bytes:
+                self._remember(key, created_at, expires_at, payload)
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO search_results VALUES (?, ?, ?, ?, ?)",
+                        (key, tool, created_at, expires_at, payload)
+                    )
+                    self._writes += 1
+                    if self._writes % _PURGE_INTERVAL == 0:
+                        self._conn.execute("DELETE FROM search_results WHERE expires_at <= ?", (created_at,))
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"写入搜索结果磁盘缓存失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "persistent": self._conn is not None,
+            }
+
+    def close(self) -> None:
+        """关闭磁盘缓存连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
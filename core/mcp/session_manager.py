@@ -0,0 +1,311 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+共享 MCP 会话管理
+每个 MCP 服务器在进程内只启动一次，所有 ExecutorAgent、PlannerAgent 和 Context7GrepMCPClient
+通过同一个长连接 ClientSession 并发调用工具（MCP 协议按请求 id 复用同一连接）
+
+- 会话在独立的后台任务中建立并保持，调用方只持有会话引用
+- 只有连接层错误（会话流关闭、管道断开、服务器进程退出）才重启会话，超时、协议错误等直接抛出，
+  不影响其他调用方正在使用的会话；重启后只重试未标注为非幂等（idempotentHint=False）的工具
+- ClientSession 绑定在创建它的事件循环上，因此注册表按 (服务器名, 事件循环) 区分
+"""
+
+import asyncio
+import json
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import anyio
+from langchain_core.tools import BaseTool, StructuredTool, ToolException
+from langchain_mcp_adapters.client import MultiServerMCPClient
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+from core.config import Config
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+_connections: Dict[str, Dict[str, Any]] = {}
+_sessions: Dict[Tuple[str, asyncio.AbstractEventLoop], "SharedMCPSession"] = {}
+_registry_lock = threading.Lock()
+
+_CONNECTION_ERRORS = (
+    anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream,
+    ConnectionError, EOFError,
+)
+
+
+def _is_connection_error(error: BaseException) -> bool:
+    """是否为连接层错误（会话流关闭、管道断开、服务器进程退出）"""
+    if isinstance(error, _CONNECTION_ERRORS):
+        return True
+    if isinstance(error, McpError):
+        return error.error.code == CONNECTION_CLOSED
+    if isinstance(error, BaseExceptionGroup):
+        return all(_is_connection_error(e) for e in error.exceptions)
+    return False
+
+
+class SharedMCPSession:
+    """单个 MCP 服务器的共享长连接会话"""
+
+    def __init__(self, server_name: str, connection: Dict[str, Any]):
+        """初始化
+
+        Args:
+            server_name: 服务器名称
+            connection: MultiServerMCPClient 的连接配置
+        """
+        self.server_name = server_name
+        self.connection = connection
+        self.generation = 0  # 每次成功建立会话加一，用于避免并发调用重复重启
+        self.restarts = 0
+        self.calls = 0
+        self.in_flight = 0
+        self._session = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._error: Optional[BaseException] = None
+        self._lock = asyncio.Lock()
+        self._tools: Optional[List[BaseTool]] = None
+
+    @property
+    def alive(self) -> bool:
+        return self._session is not None and self._task is not None and not self._task.done()
+
+    async def _run(self) -> None:
+        """后台任务：建立会话并保持到收到停止信号或连接断开"""
+        client = MultiServerMCPClient({self.server_name: self.connection})
+        try:
+            async with client.session(self.server_name) as session:
+                self._session = session
+                self.generation += 1
+                logger.info(f"MCP 会话已建立: server={self.server_name}, generation={self.generation}")
+                self._ready.set()
+                await self._stop.wait()
+        except Exception as e:
+            self._error = e
+            logger.error(f"MCP 会话异常结束: server={self.server_name}, error={e}")
+        finally:
+            self._session = None
+            self._ready.set()
+
+    async def _start(self) -> None:
+        """启动后台会话任务并等待会话就绪（调用方持有锁）"""
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error = None
+        self._task = asyncio.create_task(self._run(), name=f"mcp-session-{self.server_name}")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=Config.MCP_SESSION_START_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            raise RuntimeError(
+                f"MCP 服务器 {self.server_name} 在 {Config.MCP_SESSION_START_TIMEOUT} 秒内未完成初始化"
+            )
+        if self._session is None:
+            raise RuntimeError(f"MCP 服务器 {self.server_name} 启动失败: {self._error}")
+
+    async def _stop_task(self) -> None:
+        """停止后台会话任务（调用方持有锁）"""
+        task, self._task = self._task, None
+        if task is None or task.done():
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(task, timeout=Config.MCP_SESSION_START_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            task.cancel()
+        except Exception as e:
+            logger.warning(f"关闭 MCP 会话时出错: server={self.server_name}, error={e}")
+
+    async def acquire(self) -> Tuple[Any, int]:
+        """获取可用会话，会话未建立或已断开时（重新）启动
+
+        Returns:
+            (ClientSession, 会话代数)
+        """
+        if self.alive:
+            return self._session, self.generation
+        async with self._lock:
+            if not self.alive:
+                if self._task is not None:
+                    self.restarts += 1
+                    logger.warning(f"MCP 会话已断开，重新启动: server={self.server_name}")
+                await self._stop_task()
+                await self._start()
+            return self._session, self.generation
+
+    async def restart(self, generation: int) -> None:
+        """重启会话；只有仍是出错时的那一代会话才重启，避免并发失败的调用重复重启"""
+        async with self._lock:
+            if self.generation != generation or not self.alive:
+                return
+            self.restarts += 1
+            logger.warning(f"重启 MCP 会话: server={self.server_name}, generation={generation}")
+            await self._stop_task()
+            await self._start()
+
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any], retry: bool = True) -> Any:
+        """通过共享会话调用工具，连接层错误时重启会话，其余错误直接抛出
+
+        Args:
+            tool_name: 工具名称
+            arguments: 工具参数
+            retry: 会话重启后是否重试本次调用（非幂等工具为 False）
+
+        Returns:
+            单段文本结果返回字符串，多段时返回字符串列表
+        """
+        self.calls += 1
+        self.in_flight += 1
+        try:
+            attempts = Config.MCP_SESSION_CALL_RETRIES + 1 if retry else 1
+            for attempt in range(attempts):
+                session, generation = await self.acquire()
+                try:
+                    result = await session.call_tool(tool_name, arguments)
+                except Exception as e:
+                    if not _is_connection_error(e) and self.alive:
+                        raise
+                    logger.warning(
+                        f"MCP 会话连接断开，重启会话: server={self.server_name}, "
+                        f"tool={tool_name}, error={e}"
+                    )
+                    await self.restart(generation)
+                    if attempt + 1 >= attempts:
+                        raise
+                    continue
+                return _convert_call_result(result)
+        finally:
+            self.in_flight -= 1
+
+    async def get_tools(self) -> List[BaseTool]:
+        """获取服务器提供的工具（LangChain 工具，调用经由共享会话）"""
+        if self._tools is not None:
+            return self._tools
+        session, _ = await self.acquire()
+        listed = await session.list_tools()
+        self._tools = [self._to_langchain_tool(tool) for tool in listed.tools]
+        logger.info(f"加载 MCP 工具: server={self.server_name}, tools={[t.name for t in self._tools]}")
+        return self._tools
+
+    def _to_langchain_tool(self, tool: Any) -> BaseTool:
+        """将 MCP 工具定义转换为调用共享会话的 StructuredTool"""
+        tool_name = tool.name
+
+        annotations = getattr(tool, "annotations", None)
+        # 未标注的工具视为可重试，明确标注为非幂等的（如下载工具）不重试
+        retry = annotations is None or annotations.idempotentHint is not False
+
+        async def call(**arguments: Any) -> Any:
+            return await self.call_tool(tool_name, arguments, retry=retry)
+
+        return StructuredTool(
+            name=tool_name,
+            description=tool.description or "",
+            args_schema=tool.inputSchema,
+            coroutine=call,
+            metadata=annotations.model_dump() if annotations is not None else None,
+        )
+
+    async def close(self) -> None:
+        """关闭会话"""
+        async with self._lock:
+            await self._stop_task()
+        self._tools = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "alive": self.alive,
+            "generation": self.generation,
+            "restarts": self.restarts,
+            "calls": self.calls,
+            "in_flight": self.in_flight,
+        }
+
+
+def _convert_call_result(result: Any) -> Any:
+    """将 CallToolResult 转换为工具返回值，工具报错时抛出 ToolException"""
+    texts = []
+    for content in result.content:
+        text = getattr(content, "text", None)
+        if text is None:
+            text = json.dumps(content.model_dump(), ensure_ascii=False, default=str)
+        texts.append(text)
+    if result.isError:
+        raise ToolException("\n".join(texts))
+    if len(texts) == 1:
+        return texts[0]
+    return texts
+
+
+def register_mcp_server(server_name: str, connection: Dict[str, Any]) -> None:
+    """登记 MCP 服务器连接配置（重复登记相同配置无副作用，配置变化时下次获取会话生效）
+
+    Args:
+        server_name: 服务器名称
+        connection: MultiServerMCPClient 的连接配置
+    """
+    with _registry_lock:
+        if _connections.get(server_name) != connection:
+            if server_name in _connections:
+                logger.info(f"MCP 服务器配置变化，重新登记: server={server_name}")
+            _connections[server_name] = connection
+
+
+def get_shared_session(server_name: str) -> SharedMCPSession:
+    """获取当前事件循环下该服务器的共享会话（必须在事件循环中调用）"""
+    loop = asyncio.get_running_loop()
+    key = (server_name, loop)
+    stale = []
+    with _registry_lock:
+        connection = _connections.get(server_name)
+        if connection is None:
+            raise ValueError(f"MCP 服务器未登记: {server_name}")
+        shared = _sessions.get(key)
+        if shared is not None and shared.connection != connection:
+            stale.append(shared)
+            shared = None
+        if shared is None:
+            # 顺带清理已关闭事件循环遗留的会话
+            for stale_key in [k for k in _sessions if k[1].is_closed()]:
+                _sessions.pop(stale_key)
+            shared = SharedMCPSession(server_name, connection)
+            _sessions[key] = shared
+    for old in stale:
+        asyncio.create_task(old.close())
+    return shared
+
+
+async def get_mcp_tools(server_name: str) -> List[BaseTool]:
+    """获取服务器的工具列表，首次调用时启动服务器"""
+    return await get_shared_session(server_name).get_tools()
+
+
+async def close_mcp_sessions(server_name: Optional[str] = None) -> None:
+    """关闭当前事件循环下的共享会话
+
+    Args:
+        server_name: 只关闭该服务器的会话，为空时关闭全部
+    """
+    loop = asyncio.get_running_loop()
+    with _registry_lock:
+        keys = [
+            key for key in _sessions
+            if key[1] is loop and (server_name is None or key[0] == server_name)
+        ]
+        sessions = [_sessions.pop(key) for key in keys]
+    for shared in sessions:
+        await shared.close()
+    if sessions:
+        logger.info(f"已关闭 {len(sessions)} 个共享 MCP 会话")
+
+
+def get_mcp_session_stats() -> Dict[str, Dict[str, Any]]:
+    """各服务器共享会话的统计信息（重启次数、调用数、进行中的调用数）"""
+    with _registry_lock:
+        return {name: shared.get_stats() for (name, _), shared in _sessions.items()}
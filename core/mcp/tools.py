@@ -13,7 +13,7 @@ from langgraph.prebuilt.interrupt import HumanInterruptConfig, HumanInterrupt
 from langgraph.types import interrupt, Command
 from langchain_core.tools import tool
 from core.config import Config
-from langchain_mcp_adapters.client import MultiServerMCPClient
+from core.mcp.session_manager import register_mcp_server, get_mcp_tools
 from dotenv import load_dotenv
 
 # 设置日志基本配置，级别为DEBUG或INFO
@@ -158,21 +158,20 @@ async def get_tools(tool_type: str = "all") -> list[BaseTool]:
 
     logger.info(f"环境变量验证通过: TAVILY_API_KEY 和 EXA_API_KEY 已配置")
     
-    client = MultiServerMCPClient({
-        "paper-search": {
-            "command": "python",
-            "args": ["-m", "core.mcp.search_tool_mcp.mcp_server"],
-            "cwd": os.path.dirname(os.path.dirname(os.path.dirname(__file__))),  # 项目根目录
-            "env": {
-                "TAVILY_API_KEY": tavily_key,
-                "EXA_API_KEY": exa_key
-            },
-            "transport": "stdio"
-        }
+    # 所有 agent 共用进程内唯一的 paper-search 服务器，首次调用时启动
+    register_mcp_server("paper-search", {
+        "command": "python",
+        "args": ["-m", "core.mcp.search_tool_mcp.mcp_server"],
+        "cwd": os.path.dirname(os.path.dirname(os.path.dirname(__file__))),  # 项目根目录
+        "env": {
+            "TAVILY_API_KEY": tavily_key,
+            "EXA_API_KEY": exa_key
+        },
+        "transport": "stdio"
     })
     
     # 从MCP Server中获取可提供使用的全部工具
-    all_tools = await client.get_tools()
+    all_tools = await get_mcp_tools("paper-search")
     
     # 根据工具类型过滤
     if tool_type == "search":
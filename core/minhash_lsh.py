@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+MinHash + LSH 近似重复检测
+
+- shingle_hashes: 文本 -> 字符 k-gram 的 32 位哈希集合（NumPy 向量化滚动哈希）
+- MinHasher: 哈希集合 -> 定长 MinHash 签名（one permutation hashing），签名逐位相等的比例估计 Jaccard 相似度
+- MinHashLSH: 按 band 分桶，只有至少一个 band 完全相同的文档才成为候选对，
+  候选生成为次二次复杂度，候选对再由调用方用精确相似度校验
+"""
+
+from typing import Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+_EMPTY = np.uint64((1 << 64) - 1)
+_DENSIFY_OFFSET = np.uint64(1 << 32)  # 大于任何桶内取值，保证借用值与原值不会冲突
+_ROLLING_BASE = np.uint32(1000003)
+
+
+def shingle_hashes(text: str, k: int = 5) -> np.ndarray:
+    """计算文本字符 k-gram 的 32 位哈希（去重后返回）
+
+    文本先转小写并压缩空白，按字符切分因此同样适用于中文
+
+    Args:
+        text: 文本内容
+        k: shingle 长度（字符数）
+
+    Returns:
+        np.uint32 数组；文本短于 k 时整段文本作为一个 shingle
+    """
+    normalized = " ".join(text.lower().split())
+    if not normalized:
+        return np.empty(0, dtype=np.uint32)
+    codes = np.frombuffer(normalized.encode("utf-32-le"), dtype=np.uint32)
+    k = max(1, min(k, len(codes)))
+    count = len(codes) - k + 1
+    hashes = np.zeros(count, dtype=np.uint32)
+    with np.errstate(over="ignore"):
+        for offset in range(k):
+            hashes = hashes * _ROLLING_BASE + codes[offset:offset + count]
+    return np.unique(hashes)
+
+
+class MinHasher:
+    """MinHash 签名生成器
+
+    采用 one permutation hashing：每个 shingle 只哈希一次，按哈希值分到 num_perm 个桶，
+    每个桶取最小值作为签名的一位；空桶用右侧最近非空桶的值加距离偏移填充（rotation densification）。
+    与 num_perm 次独立置换相比计算量从 O(n * num_perm) 降为 O(n)，签名逐位相等比例仍可估计 Jaccard。
+    相同 num_perm、seed 生成的签名可互相比较。
+    """
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        """初始化
+
+        Args:
+            num_perm: 签名长度（桶数）
+            seed: 随机种子
+        """
+        self.num_perm = num_perm
+        generator = np.random.RandomState(seed)
+        self._mask = np.uint64(generator.randint(0, 1 << 32, dtype=np.uint64))
+        self._multiplier = np.uint64(generator.randint(1, 1 << 62, dtype=np.uint64) * 2 + 1)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        """计算哈希集合的 MinHash 签名
+
+        Args:
+            hashes: shingle_hashes 的返回值
+
+        Returns:
+            长度为 num_perm 的 np.uint64 数组（空集合时全为最大值）
+        """
+        signature = np.full(self.num_perm, _EMPTY, dtype=np.uint64)
+        if len(hashes) == 0:
+            return signature
+        with np.errstate(over="ignore"):
+            mixed = ((np.asarray(hashes, dtype=np.uint64) ^ self._mask) * self._multiplier) >> np.uint64(32)
+        bins = (mixed % np.uint64(self.num_perm)).astype(np.int64)
+        np.minimum.at(signature, bins, mixed // np.uint64(self.num_perm))
+
+        filled = np.nonzero(signature != _EMPTY)[0]
+        if len(filled) < self.num_perm:
+            positions = np.arange(self.num_perm)
+            nearest = filled[np.searchsorted(filled, positions) % len(filled)]
+            distance = ((nearest - positions) % self.num_perm).astype(np.uint64)
+            signature = signature[nearest] + distance * _DENSIFY_OFFSET
+        return signature
+
+
+def optimal_bands(num_perm: int, threshold: float) -> Tuple[int, int]:
+    """选择 (bands, rows)，使 LSH S 曲线的拐点 (1/b)^(1/r) 最接近 threshold
+
+    Args:
+        num_perm: 签名长度
+        threshold: 期望的 Jaccard 候选阈值
+
+    Returns:
+        (bands, rows)，bands * rows <= num_perm
+    """
+    candidates = [(num_perm // rows, rows) for rows in range(1, num_perm + 1)]
+    return min(candidates, key=lambda br: abs((1.0 / br[0]) ** (1.0 / br[1]) - threshold))
+
+
+class MinHashLSH:
+    """MinHash 签名的 band 分桶索引"""
+
+    def __init__(self, num_perm: int = 128, threshold: float = 0.3):
+        """初始化
+
+        Args:
+            num_perm: 签名长度（需与 MinHasher 一致）
+            threshold: 候选 Jaccard 阈值，偏低可提高召回（候选对会再做精确校验）
+        """
+        self.bands, self.rows = optimal_bands(num_perm, threshold)
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(self.bands)]
+
+    def _band_keys(self, signature: np.ndarray) -> Iterable[Tuple[int, bytes]]:
+        for band in range(self.bands):
+            start = band * self.rows
+            yield band, signature[start:start + self.rows].tobytes()
+
+    def insert(self, key: int, signature: np.ndarray) -> None:
+        """加入一个签名"""
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def query(self, signature: np.ndarray) -> Set[int]:
+        """返回与签名至少一个 band 相同的已加入键"""
+        candidates: Set[int] = set()
+        for band, band_key in self._band_keys(signature):
+            candidates.update(self._buckets[band].get(band_key, ()))
+        return candidates
+
+    def candidate_pairs(self, signatures: List[np.ndarray]) -> List[Tuple[int, int]]:
+        """按顺序依次查询并加入，返回所有候选对 (i, j)，i < j"""
+        pairs: List[Tuple[int, int]] = []
+        for j, signature in enumerate(signatures):
+            pairs.extend((i, j) for i in sorted(self.query(signature)))
+            self.insert(j, signature)
+        return pairs
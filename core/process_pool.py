@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+CPU 密集任务进程池
+文件读取、TF-IDF 向量化、相似度计算等去重任务放到进程池中执行，
+避免一个请求的去重阻塞所有并发请求共享的事件循环
+
+进程池按需创建、进程内共享；CPU_POOL_MAX_WORKERS <= 0 时退化为线程池执行（同样不阻塞事件循环）
+提交的函数和参数需要可以被 pickle（模块级函数、绑定到可 pickle 对象的方法）
+"""
+
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional, TypeVar
+
+from core.config import Config
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+T = TypeVar("T")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool() -> Optional[ProcessPoolExecutor]:
+    """获取共享进程池（未启用时返回 None）"""
+    global _pool
+    if Config.CPU_POOL_MAX_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=Config.CPU_POOL_MAX_WORKERS,
+                mp_context=multiprocessing.get_context(Config.CPU_POOL_START_METHOD)
+            )
+            logger.info(
+                f"创建 CPU 进程池: max_workers={Config.CPU_POOL_MAX_WORKERS}, "
+                f"start_method={Config.CPU_POOL_START_METHOD}"
+            )
+        return _pool
+
+
+def _discard_pool(pool: ProcessPoolExecutor) -> None:
+    """丢弃已损坏的进程池，下次调用时重建"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+async def run_in_process(func: Callable[..., T], *args: Any) -> T:
+    """在共享进程池中执行 func(*args) 并等待结果
+
+    Args:
+        func: 可 pickle 的可调用对象
+        *args: 位置参数（需可 pickle）
+
+    Returns:
+        func 的返回值；进程池损坏（如子进程被 OOM 杀死）时重建进程池，并在线程中重试本次任务
+    """
+    pool = get_process_pool()
+    if pool is None:
+        return await asyncio.to_thread(func, *args)
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(pool, func, *args)
+    except BrokenProcessPool as e:
+        logger.warning(f"CPU 进程池已损坏，将重建并在线程中执行本次任务: {e}")
+        _discard_pool(pool)
+        return await asyncio.to_thread(func, *args)
+
+
+def shutdown_process_pool(wait: bool = True) -> None:
+    """关闭共享进程池（进程退出时调用）"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+        logger.info("CPU 进程池已关闭")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+批量 Embedding 客户端
+按 token 预算切分批次、多个请求并发发往 bge-m3（TEI）服务。批次内容导致的失败（400/413、
+返回数量不匹配）二分重试，连接错误、超时与 5xx 整批退避重试，
+为节点预先写入 embedding，使 VectorStoreIndex.insert_nodes 不再逐 10 条串行请求
+"""
+
+import asyncio
+import re
+from typing import List, Optional, Sequence
+
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.schema import BaseNode, MetadataMode
+
+from core.config import Config
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# CJK 字符大致按 1 字 1 token 估算，其余字符按 4 字符 1 token 估算
+_CJK_PATTERN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估算文本 token 数（不依赖具体 tokenizer）"""
+    cjk_count = len(_CJK_PATTERN.findall(text))
+    return max(1, cjk_count + (len(text) - cjk_count + 3) // 4)
+
+
+class EmbeddingCountMismatchError(RuntimeError):
+    """embedding 服务返回的向量数量与请求的文本数量不一致"""
+
+
+def _status_code(error: Exception) -> Optional[int]:
+    """取出 openai / httpx 异常中的 HTTP 状态码"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_batch_content_error(error: Exception) -> bool:
+    """错误是否由批次内容引起（请求体过大、个别文本非法、返回数量不匹配），只有这类错误值得二分批次"""
+    if isinstance(error, EmbeddingCountMismatchError):
+        return True
+    return _status_code(error) in Config.EMBED_BISECT_STATUS_CODES
+
+
+class BatchEmbeddingClient:
+    """按 token 预算批量、并发计算 embedding
+
+    - 批次: 累计估算 token 数不超过 max_batch_tokens，条数不超过 max_batch_size
+    - 并发: 最多 max_concurrent 个批次同时在途
+    - 重试: 批次内容导致的失败二分为两半分别重试（单条文本仍失败时直接抛出）；
+      连接错误、超时与 5xx 整批按 max_retries 退避重试后抛出，服务不可用时不会拆成大量请求
+    """
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        max_batch_tokens: int = Config.EMBED_BATCH_MAX_TOKENS,
+        max_batch_size: int = Config.EMBED_BATCH_MAX_SIZE,
+        max_concurrent: int = Config.EMBED_MAX_CONCURRENT,
+        max_retries: int = Config.EMBED_MAX_RETRIES
+    ):
+        """初始化批量 Embedding 客户端
+
+        Args:
+            embed_model: 底层 Embedding 模型（可以是带缓存的 CachedEmbedding）
+            max_batch_tokens: 单个请求的估算 token 上限
+            max_batch_size: 单个请求的文本条数上限
+            max_concurrent: 同时在途的请求数
+            max_retries: 请求因连接错误 / 超时 / 5xx 失败后的整批重试次数
+        """
+        self.embed_model = embed_model
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_retries = max_retries
+
+        logger.info(
+            f"初始化 BatchEmbeddingClient: max_batch_tokens={max_batch_tokens}, "
+            f"max_batch_size={max_batch_size}, max_concurrent={self.max_concurrent}"
+        )
+
+    def plan_batches(self, texts: Sequence[str]) -> List[List[int]]:
+        """按 token 预算把文本下标切分为批次（保持原有顺序）"""
+        batches: List[List[int]] = []
+        current: List[int] = []
+        current_tokens = 0
+        for idx, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if current and (
+                current_tokens + tokens > self.max_batch_tokens
+                or len(current) >= self.max_batch_size
+            ):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(idx)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _embed_batch(self, texts: List[str], attempt: int = 0) -> List[Embedding]:
+        try:
+            embeddings = await self.embed_model._aget_text_embeddings(texts)
+            if len(embeddings) != len(texts):
+                raise EmbeddingCountMismatchError(
+                    f"embedding 返回数量不匹配: {len(embeddings)} != {len(texts)}"
+                )
+            return embeddings
+        except Exception as e:
+            if is_batch_content_error(e):
+                if len(texts) == 1:
+                    logger.error(f"单条文本 embedding 失败: {e}")
+                    raise
+                mid = len(texts) // 2
+                logger.warning(f"embedding 批次失败({len(texts)} 条)，二分重试: {e}")
+                # 两半依次重试，占用同一个并发槽位，不突破 max_concurrent
+                left = await self._embed_batch(texts[:mid])
+                right = await self._embed_batch(texts[mid:])
+                return left + right
+            if attempt >= self.max_retries:
+                logger.error(f"embedding 请求({len(texts)} 条)重试 {attempt} 次后仍失败: {e}")
+                raise
+            delay = 0.5 * (2 ** attempt)
+            logger.warning(f"embedding 请求失败({len(texts)} 条)，{delay:.1f}s 后整批重试: {e}")
+            await asyncio.sleep(delay)
+            return await self._embed_batch(texts, attempt + 1)
+
+    async def embed_texts(self, texts: Sequence[str]) -> List[Embedding]:
+        """批量计算文本 embedding，结果与输入顺序一致"""
+        if not texts:
+            return []
+        batches = self.plan_batches(texts)
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def run(batch: List[int]) -> List[Embedding]:
+            async with semaphore:
+                return await self._embed_batch([texts[i] for i in batch])
+
+        batch_results = await asyncio.gather(*(run(batch) for batch in batches))
+        results: List[Embedding] = [[] for _ in texts]
+        for batch, embeddings in zip(batches, batch_results):
+            for idx, embedding in zip(batch, embeddings):
+                results[idx] = embedding
+        logger.info(f"批量 embedding 完成: {len(texts)} 条文本, {len(batches)} 个请求")
+        return results
+
+    async def embed_nodes(self, nodes: Sequence[BaseNode]) -> None:
+        """为尚无 embedding 的节点写入 embedding（insert_nodes 会直接复用）"""
+        pending = [node for node in nodes if node.embedding is None]
+        if not pending:
+            return
+        texts = [node.get_content(metadata_mode=MetadataMode.EMBED) for node in pending]
+        embeddings = await self.embed_texts(texts)
+        for node, embedding in zip(pending, embeddings):
+            node.embedding = embedding
+
+    def embed_nodes_sync(self, nodes: Sequence[BaseNode]) -> None:
+        """同步版本的 embed_nodes（仅供没有运行中事件循环的调用方使用，事件循环中请 await embed_nodes）"""
+        asyncio.run(self.embed_nodes(nodes))
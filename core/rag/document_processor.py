@@ -26,6 +26,7 @@ from llama_index.core.extractors import QuestionsAnsweredExtractor
 from llama_index.core.ingestion import IngestionPipeline
 from core.config import Config
 from core.rag.models import PDFParser, JsonReader
+from core.rag.markdown_cache import MarkdownCache
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -54,7 +55,9 @@ class DocumentProcessor:
         embedding_model: BaseEmbedding,
         llm: LLM,
         mineru_base_url: str = Config.MINERU_BASE_URL,
-        max_chunk_size: int = Config.MAX_CHUNK_SIZE
+        max_chunk_size: int = Config.MAX_CHUNK_SIZE,
+        markdown_cache: Optional[MarkdownCache] = None,
+        max_concurrency: int = Config.DOC_PROCESS_CONCURRENCY
     ):
         """初始化文档处理器
         
@@ -63,16 +66,23 @@ class DocumentProcessor:
             llm: 用于问题改写的 LLM
             mineru_base_url: MinerU 服务地址（用于创建 MinerUClient）
             max_chunk_size: Markdown 切割最大长度
+            markdown_cache: PDF 转 Markdown 结果缓存（为空且 Config.PDF_CACHE_ENABLED 时自动创建）
+            max_concurrency: 单次 get_nodes 中同时处理的文档数上限（1 表示串行）
         """
         self.embedding_model = embedding_model
         self.llm = llm
         self.mineru_base_url = mineru_base_url
         self.max_chunk_size = max_chunk_size
+        self.max_concurrency = max(1, max_concurrency)
         self._nodes_lock = asyncio.Lock()
         
         # 初始化 PDFParser（用于 PDF 转 Markdown）
         self.pdf_parser = PDFParser(mineru_server_url=mineru_base_url)
         self.json_parser = JsonReader()
+        # 初始化 PDF 转 Markdown 缓存（以 PDF 内容哈希 + 解析参数为键）
+        if markdown_cache is None and Config.PDF_CACHE_ENABLED:
+            markdown_cache = MarkdownCache(parser_settings={"backend": self.pdf_parser.backend})
+        self.markdown_cache = markdown_cache
         # 初始化 MarkdownReader（负责从文件系统加载 Markdown 文档）
         self.markdown_reader = MarkItDownReader()
         
@@ -102,167 +112,59 @@ class DocumentProcessor:
             ]
         )
         
-        logger.info(f"初始化 DocumentProcessor: mineru_url={mineru_base_url}, max_chunk_size={max_chunk_size}")
+        logger.info(
+            f"初始化 DocumentProcessor: mineru_url={mineru_base_url}, max_chunk_size={max_chunk_size}, "
+            f"max_concurrency={self.max_concurrency}"
+        )
     
     async def get_nodes(
         self,
-        documents: List[Dict]
+        documents: List[Dict],
+        include_optional_file: bool = True
     ) -> List[BaseNode]:
         """处理文档：转换、切割、问题改写
+
+        文档加载（含 PDF 转 Markdown）与 IngestionPipeline 均按文档粒度并发执行，
+        并发数由 max_concurrency 控制（为 1 时退化为逐个串行处理）；
+        单个文档失败只跳过该文档，结果按输入顺序返回。
         
         Args:
             documents: 文档元数据列表（支持字段: extra.saved_path/local_path/file_path/path,
                 source/title/url）
+            include_optional_file: 是否追加可选工具保存的 context7_grep.json
+                （流式入库时按批次调用，该文件由 get_optional_file_nodes 在全部结果处理完后单独读取）
             
         Returns:
             处理后的 Node 列表（包含改写问题的元数据）
         """
         async with self._nodes_lock:
-            logger.info(f"开始处理 {len(documents)} 个文档")
-            json_nodes:List[BaseNode ]= []
+            logger.info(f"开始处理 {len(documents)} 个文档 (max_concurrency={self.max_concurrency})")
+            if include_optional_file:
+                optional_file=os.path.join(Config.DOC_SAVE_PATH, "context7_grep.json")  # 可选文件的添加
+                documents.append({"extra": {"saved_path": optional_file}})
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+
+            # 1. 先将所有原始文件转为 LlamaIndex Document（Markdown 文本），gather 保证结果与输入顺序一致
+            loaded = await asyncio.gather(
+                *(self._load_document_limited(doc_meta, semaphore) for doc_meta in documents)
+            )
+            json_nodes: List[BaseNode] = []
             docs_for_pipeline: List[Document] = []
-            optional_file=os.path.join(Config.DOC_SAVE_PATH, "context7_grep.json")  # 可选文件的添加
-            documents.append({"extra": {"saved_path": optional_file}})
-            # 1. 先将所有原始文件转为 LlamaIndex Document（Markdown 文本）
-            for doc_meta in documents:
-                # 获取文档路径
-                extra = doc_meta.get("extra")
-                saved_path = extra.get("saved_path") if isinstance(extra, dict) else ""
-                local_path = (
-                    saved_path
-                    or doc_meta.get("local_path")
-                    or doc_meta.get("file_path")
-                    or doc_meta.get("path")
-                    or ""
-                )
-                if not local_path:
-                   logger.warning(f"文档路径为空: {doc_meta.get('title', 'unknown')}")
-                   continue
-                if not os.path.exists(local_path):
-                    logger.warning(f"文档路径不存在: {local_path}")
-                    continue
-                # 判断文件类型
-                file_ext = os.path.splitext(local_path)[1].lower()
-                source = doc_meta.get("source") or "联网检索"
-                title = doc_meta.get("title") or Path(local_path).stem
-                url = doc_meta.get("url") or source
-                base_metadata = {
-                    "source": source, #来源或"联网检索"
-                    "title": title, #title或文件名
-                    "url": url,#url或来源或"unknown"
-                    "path": local_path,
-                }
-                json_docs:List[Dict] = []
-                if file_ext == '.pdf':
-                    # PDF 转 Markdown
-                    markdown_text = await self._pdf_to_markdown(local_path)
-                    if not markdown_text:
-                        logger.error(f"文件存在，但是PDF 转 Markdown 失败: {local_path}")
-                        continue
-                    temp_doc = Document(
-                        text=markdown_text,
-                        metadata=base_metadata,
-                    )
-                    docs_for_pipeline.append(temp_doc)
-                    logger.info(f"PDF 文档 {local_path} 转换为 Markdown 并加入 pipeline")
-
-                elif file_ext in ['.md', '.markdown']:
-                    # 使用 MarkdownReader 加载 Markdown 文件
-                    try:
-                        md_docs = self.markdown_reader.load_data(file_path=Path(local_path))
-                    except Exception as exc:
-                        logger.warning(
-                            "Markdown 文档加载失败，已跳过: %s, error: %s",
-                            local_path,
-                            exc,
-                        )
-                        continue
-                    if not md_docs:
-                        logger.error(f"文档存在，但Markdown 文档加载失败: {local_path}")
-                        continue
-
-                    for d in md_docs:
-                        d.metadata = base_metadata
-                        docs_for_pipeline.append(d)
-                    logger.info(f"Markdown 文档 {local_path} 加载为 {len(md_docs)} 个 Document 并加入 pipeline")
-                
-                elif file_ext == '.json':
-                    # 使用 JsonReader 加载 JSON 文件
-                    json_lines = self.json_parser.read_json_lines(local_path)
-                    
-                    for line in json_lines:
-                        if not line.strip():
-                            continue
-                        try:
-                            json_docs.append(json.loads(line))
-                        except json.JSONDecodeError:
-                            logger.warning(f"JSON 行解析失败，已跳过: {line[:200]}")
-                    if not json_docs:
-                        logger.warning(f"文档存在，但JSON文档加载失败或内容为空: {local_path}")
-                        continue
-                    for item in json_docs:
-                        if not isinstance(item, dict):
-                            logger.warning(f"JSON 文档条目格式错误，已跳过: {item}")
-                            continue
-                        meta_data = item.get("metadata")
-                        source = item.get("source") or "联网搜索"
-                        library_id = None
-                        if not isinstance(meta_data, dict):
-                            logger.warning(f"可选工具保存的JSON文档中的条目缺少'metadata'字段")
-                        else:
-                            library_id = meta_data.get("library_id")
-                        base_metadata = {
-                            "source": source,
-                            "path": local_path,
-                        }
-                        if library_id:
-                            base_metadata["library_id"] = library_id
-                        node=TextNode(text=item.get("text", ""), metadata=base_metadata)
-                        if not item.get("text", "").strip():
-                            logger.warning(f"JSON文档中的条目文本为空:{item}")
-                        json_nodes.append(node)
-                else:
-                    logger.warning(f"不支持的文件类型{file_ext}，跳过: {local_path}")
-                    continue
+            for pipeline_docs, doc_json_nodes in loaded:
+                docs_for_pipeline.extend(pipeline_docs)
+                json_nodes.extend(doc_json_nodes)
 
             if not docs_for_pipeline:
                 logger.error("使用lama_index的MarkdownReader和PDFParser处理文档失败，未生成任何Document对象")
                 raise ValueError("document-process中没有可处理的文档")
 
             # 2. 通过 IngestionPipeline 执行：MarkdownElementNodeParser -> SentenceSplitter -> QuestionsAnsweredExtractor
+            # 每个文档单独运行 pipeline，是为了跳过个别出错的文档，保证其他文档能继续处理，而不是整个批次都失败
             logger.info(f"开始通过 IngestionPipeline 处理 {len(docs_for_pipeline)} 个 文档")
-            nodes: List[BaseNode] = []
-            def _resolve_doc_path(doc: Document) -> str:
-                metadata = getattr(doc, "metadata", None)
-                if isinstance(metadata, dict):
-                    return (
-                        metadata.get("path")
-                        or metadata.get("file_path")
-                        or metadata.get("local_path")
-                        or metadata.get("title")
-                        or metadata.get("url")
-                        or metadata.get("source")
-                        or ""
-                    )
-                return ""
-
-            for doc in docs_for_pipeline: #使用for循环是为了跳过个别出错的文档，保证其他文档能继续处理，而不是整个批次都失败
-                try:
-                    nodes.extend(
-                        await self.ingestion_pipeline.arun(
-                            documents=[doc],
-                            in_place=True,
-                            show_progress=False,
-                        )
-                    )
-                except Exception as e:
-                    doc_path = _resolve_doc_path(doc)
-                    logger.error(
-                        "IngestionPipeline 处理失败，已跳过文档: %s, error: %s",
-                        doc_path or "unknown",
-                        e,
-                    )
-                    continue
+            node_groups = await asyncio.gather(
+                *(self._run_pipeline_limited(doc, semaphore) for doc in docs_for_pipeline)
+            )
+            nodes: List[BaseNode] = [node for group in node_groups for node in group]
 
             # 3. 返回处理后的节点列表
             logger.info(f"文档处理完成: {len(nodes)} 个节点")
@@ -270,11 +172,190 @@ class DocumentProcessor:
                 logger.info(f"另外添加了 {len(json_nodes)} 个来自 可选工具JSON 文档的节点")
                 nodes.extend(json_nodes)
             return nodes
+
+    async def get_optional_file_nodes(self) -> List[BaseNode]:
+        """只处理可选工具保存的 context7_grep.json
+
+        流式入库时各 executor 会持续向该文件追加结果，需在全部结果处理完后读取一次
+
+        Returns:
+            来自 JSON 文档的节点列表，文件不存在或为空时返回空列表
+        """
+        optional_file = os.path.join(Config.DOC_SAVE_PATH, "context7_grep.json")
+        if not os.path.exists(optional_file):
+            return []
+        async with self._nodes_lock:
+            _, json_nodes = await self._load_document({"extra": {"saved_path": optional_file}})
+        logger.info(f"可选工具JSON 文档处理完成: {len(json_nodes)} 个节点")
+        return json_nodes
+
+    async def _load_document_limited(
+        self,
+        doc_meta: Dict,
+        semaphore: asyncio.Semaphore
+    ) -> Tuple[List[Document], List[BaseNode]]:
+        """在并发上限内加载单个文档，异常只影响当前文档"""
+        async with semaphore:
+            try:
+                return await self._load_document(doc_meta)
+            except Exception as e:
+                logger.error(f"文档加载失败，已跳过: {self._resolve_meta_path(doc_meta) or 'unknown'}, error: {e}")
+                return [], []
+
+    def _resolve_meta_path(self, doc_meta: Dict) -> str:
+        extra = doc_meta.get("extra")
+        saved_path = extra.get("saved_path") if isinstance(extra, dict) else ""
+        return (
+            saved_path
+            or doc_meta.get("local_path")
+            or doc_meta.get("file_path")
+            or doc_meta.get("path")
+            or ""
+        )
+
+    async def _load_document(self, doc_meta: Dict) -> Tuple[List[Document], List[BaseNode]]:
+        """将单个原始文件转为 pipeline 待处理的 Document 以及可直接入库的 JSON 节点
+
+        Args:
+            doc_meta: 文档元数据
+
+        Returns:
+            (待进入 IngestionPipeline 的 Document 列表, 来自 JSON 文件的 TextNode 列表)
+        """
+        docs_for_pipeline: List[Document] = []
+        json_nodes: List[BaseNode] = []
+        # 获取文档路径
+        local_path = self._resolve_meta_path(doc_meta)
+        if not local_path:
+            logger.warning(f"文档路径为空: {doc_meta.get('title', 'unknown')}")
+            return docs_for_pipeline, json_nodes
+        if not os.path.exists(local_path):
+            logger.warning(f"文档路径不存在: {local_path}")
+            return docs_for_pipeline, json_nodes
+        # 判断文件类型
+        file_ext = os.path.splitext(local_path)[1].lower()
+        source = doc_meta.get("source") or "联网检索"
+        title = doc_meta.get("title") or Path(local_path).stem
+        url = doc_meta.get("url") or source
+        base_metadata = {
+            "source": source, #来源或"联网检索"
+            "title": title, #title或文件名
+            "url": url,#url或来源或"unknown"
+            "path": local_path,
+        }
+        json_docs:List[Dict] = []
+        if file_ext == '.pdf':
+            # PDF 转 Markdown
+            markdown_text = await self._pdf_to_markdown(local_path)
+            if not markdown_text:
+                logger.error(f"文件存在，但是PDF 转 Markdown 失败: {local_path}")
+                return docs_for_pipeline, json_nodes
+            temp_doc = Document(
+                text=markdown_text,
+                metadata=base_metadata,
+            )
+            docs_for_pipeline.append(temp_doc)
+            logger.info(f"PDF 文档 {local_path} 转换为 Markdown 并加入 pipeline")
+
+        elif file_ext in ['.md', '.markdown']:
+            # 使用 MarkdownReader 加载 Markdown 文件
+            try:
+                md_docs = self.markdown_reader.load_data(file_path=Path(local_path))
+            except Exception as exc:
+                logger.warning(
+                    "Markdown 文档加载失败，已跳过: %s, error: %s",
+                    local_path,
+                    exc,
+                )
+                return docs_for_pipeline, json_nodes
+            if not md_docs:
+                logger.error(f"文档存在，但Markdown 文档加载失败: {local_path}")
+                return docs_for_pipeline, json_nodes
+
+            for d in md_docs:
+                d.metadata = base_metadata
+                docs_for_pipeline.append(d)
+            logger.info(f"Markdown 文档 {local_path} 加载为 {len(md_docs)} 个 Document 并加入 pipeline")
+
+        elif file_ext == '.json':
+            # 使用 JsonReader 加载 JSON 文件
+            json_lines = self.json_parser.read_json_lines(local_path)
+
+            for line in json_lines:
+                if not line.strip():
+                    continue
+                try:
+                    json_docs.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"JSON 行解析失败，已跳过: {line[:200]}")
+            if not json_docs:
+                logger.warning(f"文档存在，但JSON文档加载失败或内容为空: {local_path}")
+                return docs_for_pipeline, json_nodes
+            for item in json_docs:
+                if not isinstance(item, dict):
+                    logger.warning(f"JSON 文档条目格式错误，已跳过: {item}")
+                    continue
+                meta_data = item.get("metadata")
+                source = item.get("source") or "联网搜索"
+                library_id = None
+                if not isinstance(meta_data, dict):
+                    logger.warning(f"可选工具保存的JSON文档中的条目缺少'metadata'字段")
+                else:
+                    library_id = meta_data.get("library_id")
+                base_metadata = {
+                    "source": source,
+                    "path": local_path,
+                }
+                if library_id:
+                    base_metadata["library_id"] = library_id
+                node=TextNode(text=item.get("text", ""), metadata=base_metadata)
+                if not item.get("text", "").strip():
+                    logger.warning(f"JSON文档中的条目文本为空:{item}")
+                json_nodes.append(node)
+        else:
+            logger.warning(f"不支持的文件类型{file_ext}，跳过: {local_path}")
+        return docs_for_pipeline, json_nodes
+
+    async def _run_pipeline_limited(
+        self,
+        doc: Document,
+        semaphore: asyncio.Semaphore
+    ) -> List[BaseNode]:
+        """在并发上限内对单个 Document 运行 IngestionPipeline，失败时返回空列表"""
+        async with semaphore:
+            try:
+                return await self.ingestion_pipeline.arun(
+                    documents=[doc],
+                    in_place=True,
+                    show_progress=False,
+                )
+            except Exception as e:
+                logger.error(
+                    "IngestionPipeline 处理失败，已跳过文档: %s, error: %s",
+                    self._resolve_doc_path(doc) or "unknown",
+                    e,
+                )
+                return []
+
+    @staticmethod
+    def _resolve_doc_path(doc: Document) -> str:
+        metadata = getattr(doc, "metadata", None)
+        if isinstance(metadata, dict):
+            return (
+                metadata.get("path")
+                or metadata.get("file_path")
+                or metadata.get("local_path")
+                or metadata.get("title")
+                or metadata.get("url")
+                or metadata.get("source")
+                or ""
+            )
+        return ""
     
     async def _pdf_to_markdown(self, pdf_path: str) -> str:
         """将 PDF 转换为 Markdown
 
-        使用 PDFParser 进行转换
+        优先读取 MarkdownCache，未命中时使用 PDFParser 进行转换并写回缓存
 
         Args:
             pdf_path: PDF 文件路径
@@ -282,12 +363,26 @@ class DocumentProcessor:
         Returns:
             Markdown 文本
         """
+        cache_key = None
+        if self.markdown_cache is not None:
+            try:
+                cache_key = await asyncio.to_thread(self.markdown_cache.make_key, pdf_path)
+                cached_text = await asyncio.to_thread(self.markdown_cache.get, cache_key)
+            except Exception as e:
+                logger.warning(f"读取 PDF 转换缓存失败，直接转换: {pdf_path}, {e}")
+                cached_text = None
+            if cached_text:
+                logger.info(f"PDF 转换缓存命中: {pdf_path}, 长度: {len(cached_text)}, 统计: {self.markdown_cache.get_stats()}")
+                return cached_text
+
         logger.info(f"开始转换 PDF: {pdf_path}")
 
         try:
             markdown_text = await self.pdf_parser.parse_pdf_to_markdown(pdf_path)
             if markdown_text:
                 logger.info(f"PDF 转换成功: {pdf_path}, 长度: {len(markdown_text)}")
+                if self.markdown_cache is not None and cache_key:
+                    await asyncio.to_thread(self.markdown_cache.put, cache_key, markdown_text)
                 return markdown_text
             else:
                 logger.error(f"PDF 转换失败: 返回内容为空")
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Embedding 结果缓存
+以 (模型名, 文本哈希) 为键持久化向量，避免相同 chunk / 子问题被重复发送到 bge-m3 服务
+
+存储结构（每个模型一个目录，均为定长数组文件，按槽位原地读写）：
+- vectors.f32: float32 向量矩阵 (capacity, dim)，np.memmap
+- keys.u8:     每个槽位的键 sha256 摘要 (capacity, 32)
+- access.i64:  每个槽位的最近访问时钟，0 表示空槽，用于重启后恢复 LRU 顺序
+- meta.json:   模型名、维度、容量
+"""
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from pydantic import Field, PrivateAttr
+
+from core.config import Config
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+KEY_BYTES = 32
+
+
+class EmbeddingCacheStore:
+    """基于 memmap 的定长向量缓存，满后按 LRU 复用槽位
+
+    仅保证单进程内线程安全（同一缓存目录不要被多个进程同时写入）
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str = Config.EMBEDDING_CACHE_PATH,
+        capacity: int = Config.EMBEDDING_CACHE_CAPACITY
+    ):
+        """初始化缓存
+
+        Args:
+            model_name: Embedding 模型名称（不同模型使用不同目录）
+            cache_dir: 缓存根目录
+            capacity: 最多缓存的向量条数（已有缓存以其 meta.json 中的容量为准）
+        """
+        self.model_name = model_name
+        self.dir = Path(cache_dir) / re.sub(r"[^\w.-]", "_", model_name or "default")
+        self.capacity = capacity
+        self.dim: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.memmap] = None
+        self._keys: Optional[np.memmap] = None
+        self._access: Optional[np.memmap] = None
+        self._slots: "OrderedDict[bytes, int]" = OrderedDict()
+        self._free: List[int] = []
+        self._clock = 0
+
+        try:
+            self._open_existing()
+        except Exception as e:
+            logger.warning(f"加载 Embedding 缓存失败，将重新创建: {self.dir}, {e}")
+            self._reset()
+        logger.info(
+            f"初始化 EmbeddingCacheStore: dir={self.dir}, dim={self.dim}, "
+            f"entries={len(self._slots)}/{self.capacity}"
+        )
+
+    def _reset(self) -> None:
+        self.dim = None
+        self._vectors = self._keys = self._access = None
+        self._slots.clear()
+        self._free = []
+        self._clock = 0
+
+    def _open_arrays(self, mode: str) -> None:
+        assert self.dim is not None
+        self._vectors = np.memmap(self.dir / "vectors.f32", dtype=np.float32, mode=mode, shape=(self.capacity, self.dim))
+        self._keys = np.memmap(self.dir / "keys.u8", dtype=np.uint8, mode=mode, shape=(self.capacity, KEY_BYTES))
+        self._access = np.memmap(self.dir / "access.i64", dtype=np.int64, mode=mode, shape=(self.capacity,))
+
+    def _open_existing(self) -> None:
+        meta_path = self.dir / "meta.json"
+        if not meta_path.exists():
+            return
+        meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if meta.get("model_name") != self.model_name:
+            raise ValueError(f"缓存模型不匹配: {meta.get('model_name')} != {self.model_name}")
+        self.dim = int(meta["dim"])
+        self.capacity = int(meta["capacity"])
+        self._open_arrays(mode="r+")
+        assert self._access is not None and self._keys is not None
+
+        occupied = np.nonzero(self._access)[0]
+        for slot in occupied[np.argsort(self._access[occupied], kind="stable")]:
+            self._slots[bytes(self._keys[slot])] = int(slot)
+        self._free = [int(slot) for slot in np.nonzero(self._access == 0)[0][::-1]]
+        self._clock = int(self._access.max()) if len(occupied) else 0
+
+    def _create(self, dim: int) -> None:
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.dim = dim
+        (self.dir / "meta.json").write_text(
+            json.dumps({"model_name": self.model_name, "dim": dim, "capacity": self.capacity}),
+            encoding="utf-8"
+        )
+        self._open_arrays(mode="w+")
+        self._free = list(range(self.capacity - 1, -1, -1))
+        logger.info(f"创建 Embedding 缓存: {self.dir}, dim={dim}, capacity={self.capacity}")
+
+    def make_key(self, kind: str, text: str) -> bytes:
+        """计算缓存键: sha256(模型名 + 类型(query/text) + 文本)"""
+        digest = hashlib.sha256()
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\0" + kind.encode("utf-8") + b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.digest()
+
+    def _touch(self, key: bytes, slot: int) -> None:
+        assert self._access is not None
+        self._clock += 1
+        self._access[slot] = self._clock
+        self._slots.move_to_end(key)
+
+    def get_many(self, keys: Sequence[bytes]) -> List[Optional[List[float]]]:
+        """批量查询，未命中的位置返回 None"""
+        results: List[Optional[List[float]]] = []
+        with self._lock:
+            for key in keys:
+                slot = self._slots.get(key)
+                if slot is None or self._vectors is None:
+                    self.misses += 1
+                    results.append(None)
+                    continue
+                results.append(self._vectors[slot].tolist())
+                self._touch(key, slot)
+                self.hits += 1
+        return results
+
+    def put_many(self, keys: Sequence[bytes], vectors: Sequence[Sequence[float]]) -> None:
+        """批量写入，缓存满时复用最久未访问的槽位"""
+        with self._lock:
+            for key, vector in zip(keys, vectors):
+                if self.dim is None:
+                    self._create(len(vector))
+                if len(vector) != self.dim:
+                    logger.warning(f"向量维度 {len(vector)} 与缓存维度 {self.dim} 不一致，跳过写入")
+                    continue
+                assert self._vectors is not None and self._keys is not None
+                slot = self._slots.get(key)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        _, slot = self._slots.popitem(last=False)
+                    self._slots[key] = slot
+                    self._keys[slot] = np.frombuffer(key, dtype=np.uint8)
+                self._vectors[slot] = np.asarray(vector, dtype=np.float32)
+                self._touch(key, slot)
+
+    def flush(self) -> None:
+        """将 memmap 中的修改刷到磁盘"""
+        with self._lock:
+            for array in (self._vectors, self._keys, self._access):
+                if array is not None:
+                    array.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                "model_name": self.model_name,
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._slots),
+                "capacity": self.capacity,
+                "dim": self.dim,
+            }
+
+
+class CachedEmbedding(BaseEmbedding):
+    """带持久化缓存的 Embedding 包装器
+
+    对外与被包装的模型行为一致，只把缓存未命中的文本交给底层模型
+    """
+
+    embed_model: BaseEmbedding = Field(description="被包装的 Embedding 模型")
+    _store: EmbeddingCacheStore = PrivateAttr()
+
+    def __init__(
+        self,
+        embed_model: BaseEmbedding,
+        store: Optional[EmbeddingCacheStore] = None,
+        **kwargs: Any
+    ):
+        """初始化包装器
+
+        Args:
+            embed_model: 底层 Embedding 模型（如 OpenAILikeEmbedding）
+            store: 缓存存储，为空时按模型名在 Config.EMBEDDING_CACHE_PATH 下创建
+        """
+        kwargs.setdefault("model_name", embed_model.model_name)
+        kwargs.setdefault("embed_batch_size", embed_model.embed_batch_size)
+        kwargs.setdefault("callback_manager", embed_model.callback_manager)
+        super().__init__(embed_model=embed_model, **kwargs)
+        self._store = store or EmbeddingCacheStore(model_name=embed_model.model_name)
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def store(self) -> EmbeddingCacheStore:
+        return self._store
+
+    def _lookup(self, kind: str, texts: List[str]):
+        keys = [self._store.make_key(kind, text) for text in texts]
+        cached = self._store.get_many(keys)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        return keys, cached, missing
+
+    def _merge(self, keys, cached, missing, new_vectors: List[Embedding]) -> List[Embedding]:
+        self._store.put_many([keys[i] for i in missing], new_vectors)
+        # 每批写入后刷盘，进程异常退出也不会丢失已计算的向量
+        self._store.flush()
+        for i, vector in zip(missing, new_vectors):
+            cached[i] = vector
+        return cached
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        keys, cached, missing = self._lookup("query", [query])
+        if missing:
+            return self._merge(keys, cached, missing, [self.embed_model._get_query_embedding(query)])[0]
+        return cached[0]
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        keys, cached, missing = self._lookup("query", [query])
+        if missing:
+            return self._merge(keys, cached, missing, [await self.embed_model._aget_query_embedding(query)])[0]
+        return cached[0]
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    async def _aget_text_embedding(self, text: str) -> Embedding:
+        return (await self._aget_text_embeddings([text]))[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, cached, missing = self._lookup("text", texts)
+        if not missing:
+            return cached
+        new_vectors = self.embed_model._get_text_embeddings([texts[i] for i in missing])
+        return self._merge(keys, cached, missing, new_vectors)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys, cached, missing = self._lookup("text", texts)
+        if not missing:
+            return cached
+        new_vectors = await self.embed_model._aget_text_embeddings([texts[i] for i in missing])
+        return self._merge(keys, cached, missing, new_vectors)
+
+
+def with_embedding_cache(embed_model: Optional[BaseEmbedding]) -> Optional[BaseEmbedding]:
+    """按 Config.EMBEDDING_CACHE_ENABLED 为 Embedding 模型套上缓存（重复调用不会重复包装）"""
+    if embed_model is None or not Config.EMBEDDING_CACHE_ENABLED or isinstance(embed_model, CachedEmbedding):
+        return embed_model
+    try:
+        return CachedEmbedding(embed_model=embed_model)
+    except Exception as e:
+        logger.warning(f"Embedding 缓存初始化失败，直接使用原模型: {e}")
+        return embed_model
@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+PDF 转 Markdown 结果缓存
+以 PDF 内容哈希 + 解析参数为键，将 MinerU 的转换结果持久化到磁盘，
+按总大小做 LRU 淘汰，避免同一篇论文在不同查询中被重复转换
+"""
+
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+from core.config import Config
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class MarkdownCache:
+    """PDF → Markdown 磁盘缓存
+
+    - 缓存键: sha256(PDF 内容) + 解析参数（backend 等）
+    - 存储: {cache_dir}/{key[:2]}/{key}.md
+    - 淘汰: 总字节数超过 max_bytes 时按最近访问时间（LRU）删除
+    - 线程安全: 多个阶段的文档处理可能在不同线程中同时访问
+    """
+
+    def __init__(
+        self,
+        cache_dir: str = Config.PDF_CACHE_PATH,
+        max_bytes: int = Config.PDF_CACHE_MAX_BYTES,
+        parser_settings: Optional[Dict[str, str]] = None
+    ):
+        """初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存总大小上限（字节）
+            parser_settings: 影响转换结果的解析参数，参与缓存键计算
+        """
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.settings_digest = self._digest_settings(parser_settings or {})
+        self._lock = threading.Lock()
+        # key -> 文件大小，按访问先后排序（最久未访问的在前）
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._load_entries()
+        logger.info(
+            f"初始化 MarkdownCache: dir={self.cache_dir}, entries={len(self._entries)}, "
+            f"size={self._total_bytes}/{self.max_bytes}"
+        )
+
+    @staticmethod
+    def _digest_settings(settings: Dict[str, str]) -> str:
+        canonical = "&".join(f"{key}={settings[key]}" for key in sorted(settings))
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+    def _load_entries(self) -> None:
+        """扫描缓存目录，按 mtime 恢复 LRU 顺序"""
+        found = []
+        for md_path in self.cache_dir.glob("*/*.md"):
+            try:
+                stat = md_path.stat()
+            except OSError:
+                continue
+            found.append((stat.st_mtime, md_path.stem, stat.st_size))
+        found.sort()
+        for _, key, size in found:
+            self._entries[key] = size
+            self._total_bytes += size
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.md"
+
+    def make_key(self, pdf_path: str) -> str:
+        """计算缓存键: PDF 内容哈希 + 解析参数摘要
+
+        Args:
+            pdf_path: PDF 文件路径
+
+        Returns:
+            缓存键（十六进制字符串）
+        """
+        content_hash = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                content_hash.update(block)
+        return f"{content_hash.hexdigest()}_{self.settings_digest}"
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存的 Markdown，未命中返回 None"""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            path = self._entry_path(key)
+            try:
+                markdown_text = path.read_text(encoding="utf-8")
+                os.utime(path, None)
+            except OSError as e:
+                logger.warning(f"读取 Markdown 缓存失败，按未命中处理: {path}, {e}")
+                self._total_bytes -= self._entries.pop(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return markdown_text
+
+    def put(self, key: str, markdown_text: str) -> None:
+        """写入缓存（临时文件 + rename 保证原子性），并按需淘汰"""
+        if not markdown_text:
+            return
+        data = markdown_text.encode("utf-8")
+        if len(data) > self.max_bytes:
+            logger.debug(f"Markdown 超过缓存上限，不缓存: key={key}, size={len(data)}")
+            return
+        path = self._entry_path(key)
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.warning(f"写入 Markdown 缓存失败: {path}, {e}")
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                return
+            if key in self._entries:
+                self._total_bytes -= self._entries.pop(key)
+            self._entries[key] = len(data)
+            self._total_bytes += len(data)
+            self._evict()
+
+    def _evict(self) -> None:
+        """淘汰最久未访问的条目，直到总大小不超过上限（调用方持有锁）"""
+        while self._total_bytes > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                self._entry_path(key).unlink()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.warning(f"删除 Markdown 缓存失败: key={key}, {e}")
+            logger.debug(f"淘汰 Markdown 缓存: key={key}, size={size}")
+
+    def get_stats(self) -> Dict[str, int]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "total_bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+            }
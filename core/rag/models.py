@@ -241,14 +241,16 @@ class PDFParser:
     使用 mineru 命令行工具将 PDF 转换为 Markdown
     """
     
-    def __init__(self, mineru_server_url: str = "http://localhost:30000"):
+    def __init__(self, mineru_server_url: str = "http://localhost:30000", backend: str = "vlm-http-client"):
         """
         初始化 PDF 解析器
         
         Args:
             mineru_server_url: MinerU 服务的 URL 地址
+            backend: mineru 解析后端（-b 参数），参与转换结果缓存键的计算
         """
         self.mineru_server_url = mineru_server_url
+        self.backend = backend
         self.logger = logging.getLogger(__name__)
     
     async def parse_pdf_to_markdown(self, pdf_path: str) -> str:
@@ -281,7 +283,7 @@ class PDFParser:
                 "mineru",
                 "-p", pdf_path,
                 "-o", temp_dir,
-                "-b", "vlm-http-client",
+                "-b", self.backend,
                 "-u", self.mineru_server_url
             ]
             
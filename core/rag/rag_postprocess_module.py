@@ -5,14 +5,20 @@ RAG 检索后处理模块--负责从index->retirever->重排序->过滤->去重-
 构建好问题池
 """
 
+import asyncio
 import logging
+import math
 import re
-from typing import List
+from typing import Any, Dict, List, Optional
+import numpy as np
 from concurrent_log_handler import ConcurrentRotatingFileHandler
 from llama_index.core import VectorStoreIndex
-from llama_index.core.schema import NodeWithScore, QueryBundle
+from llama_index.core.schema import BaseNode, NodeWithScore, QueryBundle, TextNode
+from llama_index.core.vector_stores.utils import metadata_dict_to_node
 from core.config import Config
 from core.rag.models import BGERerankNodePostprocessor
+from core.rag.batch_embedding import BatchEmbeddingClient
+from core.process_pool import run_in_process
 from llama_index.core.base.base_retriever import BaseRetriever
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
@@ -41,6 +47,74 @@ except ImportError:
     cosine_similarity = None
     logger.warning("scikit-learn 未安装，将跳过内容相似度去重")
 
+try:
+    from llama_index.vector_stores.chroma import ChromaVectorStore
+except ImportError:
+    ChromaVectorStore = None
+    logger.warning("llama-index-vector-stores-chroma 未安装，将跳过批量检索")
+
+
+def _text_similarity_keep_indices(contents: List[str], threshold: float) -> List[int]:
+    """TF-IDF + 余弦相似度去重，返回保留的下标（先出现者优先）
+
+    模块级函数，便于提交到进程池执行
+
+    Args:
+        contents: 规范化后的文本列表
+        threshold: 相似度阈值，达到阈值的后续文本被去掉
+
+    Returns:
+        保留的下标列表（升序）
+    """
+    assert TfidfVectorizer is not None
+    assert cosine_similarity is not None
+
+    vectorizer = TfidfVectorizer(
+        max_features=5000,
+        stop_words=None,
+        ngram_range=(1, 2)
+    )
+
+    tfidf_matrix = vectorizer.fit_transform(contents)
+    similarity_matrix = cosine_similarity(tfidf_matrix)
+
+    to_keep = set(range(len(contents)))
+    for i in range(len(contents)):
+        if i not in to_keep:
+            continue
+
+        for j in range(i + 1, len(contents)):
+            if j not in to_keep:
+                continue
+
+            if similarity_matrix[i, j] >= threshold:
+                to_keep.discard(j)
+
+    return sorted(to_keep)
+
+
+def _embedding_keep_mask(embeddings: np.ndarray, threshold: float) -> np.ndarray:
+    """基于 embedding 余弦相似度的贪心去重
+
+    一次矩阵乘法得到全部两两相似度；按顺序（调用方已按分数降序排列）保留节点，
+    并屏蔽其后与之相似度达到阈值的节点
+
+    Args:
+        embeddings: (n, d) 的 embedding 矩阵
+        threshold: 余弦相似度阈值
+
+    Returns:
+        长度为 n 的布尔保留掩码
+    """
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    normalized = embeddings / np.maximum(norms, 1e-12)
+    similarity = normalized @ normalized.T
+    keep = np.ones(len(embeddings), dtype=bool)
+    for i in range(len(embeddings)):
+        if keep[i]:
+            keep[i + 1:] &= similarity[i, i + 1:] < threshold
+    return keep
+
 
 # 答案生成提示词
 ANSWER_GENERATION_PROMPT = """
@@ -76,7 +150,12 @@ class RAGPostProcessModule:
         vector_store: VectorStoreIndex=None,
         retriever:BaseRetriever=None,
         node_postprocessor: BGERerankNodePostprocessor=None,
-        top_k: int = Config.TOP_K
+        top_k: int = Config.TOP_K,
+        batch_embedder: BatchEmbeddingClient=None,
+        rerank_concurrency: int = Config.RAG_RERANK_CONCURRENCY,
+        batch_retrieval: bool = Config.RAG_BATCH_RETRIEVAL,
+        semantic_dedup: bool = Config.RAG_SEMANTIC_DEDUP,
+        semantic_dedup_threshold: float = Config.RAG_SEMANTIC_DEDUP_THRESHOLD
     ):
         """初始化 RAG 模块
         
@@ -85,10 +164,32 @@ class RAGPostProcessModule:
             node_postprocessor: BGE Reranker 节点后处理器
             llm: 用于生成回答的 LLM（已废弃，保留兼容性）
             top_k: 每个问题检索的文档数
+            batch_embedder: 批量 Embedding 客户端，与 Chroma 向量库同时提供时启用批量检索
+            rerank_concurrency: 不同问题的 rerank 请求并发上限
+            batch_retrieval: 是否启用批量检索
+            semantic_dedup: 是否用 Chroma 中已存储的 embedding 做内容去重（不可用时回退到 TF-IDF）
+            semantic_dedup_threshold: embedding 余弦相似度去重阈值
         """
         self.vector_store = vector_store
         self.node_postprocessor = node_postprocessor
         self.top_k = top_k
+        self.batch_embedder = batch_embedder
+        self.rerank_concurrency = max(1, rerank_concurrency)
+        self.semantic_dedup = semantic_dedup
+        self.semantic_dedup_threshold = semantic_dedup_threshold
+        # 批量检索与 embedding 读取直接访问 Chroma collection
+        self._chroma_collection = None
+        if (
+            ChromaVectorStore is not None
+            and self.vector_store is not None
+            and isinstance(self.vector_store.vector_store, ChromaVectorStore)
+        ):
+            self._chroma_collection = self.vector_store.vector_store.client
+        self.batch_retrieval = (
+            batch_retrieval
+            and batch_embedder is not None
+            and self._chroma_collection is not None
+        )
         # 预构建 retriever，避免每个问题重复创建
         if retriever:
             self.retriever = retriever
@@ -99,7 +200,10 @@ class RAGPostProcessModule:
         # 问题池，用于存储所有相关问题（去重后）
         self.question_pool = []
         
-        logger.info(f"初始化 RAGModule: top_k={top_k}")
+        logger.info(
+            f"初始化 RAGModule: top_k={top_k}, batch_retrieval={self.batch_retrieval}, "
+            f"rerank_concurrency={self.rerank_concurrency}, semantic_dedup={semantic_dedup}"
+        )
     
     async def retrieve_postprecess(
         self,
@@ -116,22 +220,28 @@ class RAGPostProcessModule:
         """
         logger.info(f"开始 RAG 检索，planner问题数: {len(planner_questions)}")
         
-        # 1. 对每个问题单独检索、重排序、过滤
-        all_reranked_nodes = []
-        for i, question in enumerate(planner_questions, 1):
+        # 1. 批量检索所有问题，再并发重排序、过滤
+        retrieved = await self._retrieve_questions(planner_questions)
+        semaphore = asyncio.Semaphore(self.rerank_concurrency)
+        
+        async def rerank(i: int, question: str, nodes: Optional[List[NodeWithScore]]) -> List[NodeWithScore]:
+            if nodes is None:
+                return []
             try:
-                # 初步检索
-                nodes = await self._retrieve_single_question(question)
-                logger.debug(f"问题 {i}/{len(planner_questions)} 初步检索到 {len(nodes)} 个节点")
-                
                 # 使用 BGERerankNodePostprocessor 进行重排序和过滤
-                reranked_nodes = await self._rerank_and_filter(question, nodes)
+                async with semaphore:
+                    reranked_nodes = await self._rerank_and_filter(question, nodes)
                 logger.debug(f"问题 {i}/{len(planner_questions)} 重排序+过滤后保留 {len(reranked_nodes)} 个节点")
-                
-                all_reranked_nodes.extend(reranked_nodes)
+                return reranked_nodes
             except Exception as e:
                 logger.error(f"处理问题 {i} 失败: {e}")
-                continue
+                return []
+        
+        reranked_lists = await asyncio.gather(*(
+            rerank(i, question, nodes)
+            for i, (question, nodes) in enumerate(zip(planner_questions, retrieved), 1)
+        ))
+        all_reranked_nodes = [node for nodes in reranked_lists for node in nodes]
         
         logger.info(f"所有问题检索并重排序完成，共 {len(all_reranked_nodes)} 个节点")
 
@@ -139,8 +249,15 @@ class RAGPostProcessModule:
         unique_nodes = self._deduplicate_by_node_id(all_reranked_nodes)
         logger.info(f"去重后保留 {len(unique_nodes)} 个节点")
 
-        # 2.1 内容相似度去重（保留高分节点）
-        unique_nodes = self._deduplicate_by_text_similarity(unique_nodes)
+        # 2.1 内容相似度去重（保留高分节点）：优先使用已存储的 embedding，不可用时回退到 TF-IDF
+        semantic_nodes = await self._deduplicate_by_embedding(unique_nodes) if self.semantic_dedup else None
+        if semantic_nodes is not None:
+            unique_nodes = semantic_nodes
+        else:
+            unique_nodes = await self._deduplicate_by_text_similarity(unique_nodes)
+        # 语义去重关闭时，检索附带的 embedding 同样不能进入图状态
+        for nws in unique_nodes:
+            nws.node.embedding = None
         logger.info(f"内容去重后保留 {len(unique_nodes)} 个节点")
         
         # 3. 构建 question_pool
@@ -149,6 +266,97 @@ class RAGPostProcessModule:
         
         return unique_nodes
     
+    async def _retrieve_questions(
+        self,
+        questions: List[str]
+    ) -> List[Optional[List[NodeWithScore]]]:
+        """检索所有问题的相关语料
+        
+        可批量时一次 embedding + 一次 Chroma 多向量查询；否则（或批量失败时）逐个问题并发检索
+        
+        Args:
+            questions: 问题列表
+            
+        Returns:
+            与 questions 一一对应的节点列表，检索失败的问题为 None
+        """
+        if self.batch_retrieval and questions:
+            try:
+                return await self._retrieve_batch(questions)
+            except Exception as e:
+                logger.warning(f"批量检索失败，回退到逐个问题检索: {e}")
+        
+        async def retrieve(i: int, question: str) -> Optional[List[NodeWithScore]]:
+            try:
+                nodes = await self._retrieve_single_question(question)
+                logger.debug(f"问题 {i}/{len(questions)} 初步检索到 {len(nodes)} 个节点")
+                return nodes
+            except Exception as e:
+                logger.error(f"处理问题 {i} 失败: {e}")
+                return None
+        
+        return list(await asyncio.gather(*(
+            retrieve(i, question) for i, question in enumerate(questions, 1)
+        )))
+    
+    async def _retrieve_batch(
+        self,
+        questions: List[str]
+    ) -> List[List[NodeWithScore]]:
+        """批量检索：所有问题一起 embedding，再用全部查询向量一次查询 Chroma
+        
+        bge-m3 的 query 与文本 embedding 不区分指令前缀，因此直接复用文本 embedding 接口
+        
+        Args:
+            questions: 问题列表
+            
+        Returns:
+            与 questions 一一对应的节点列表
+        """
+        assert self.batch_embedder is not None and self._chroma_collection is not None
+        query_embeddings = await self.batch_embedder.embed_texts(questions)
+        include = ["documents", "metadatas", "distances"]
+        if self.semantic_dedup:
+            # 同时取回节点 embedding，供后续语义去重使用
+            include.append("embeddings")
+        results = await asyncio.to_thread(
+            self._chroma_collection.query,
+            query_embeddings=query_embeddings,
+            n_results=self.top_k,
+            include=include,
+        )
+        
+        batched_nodes = []
+        for q_idx in range(len(questions)):
+            nodes = []
+            embeddings = results.get("embeddings")
+            embeddings = embeddings[q_idx] if embeddings is not None else [None] * len(results["ids"][q_idx])
+            for node_id, text, metadata, distance, embedding in zip(
+                results["ids"][q_idx],
+                results["documents"][q_idx],
+                results["metadatas"][q_idx],
+                results["distances"][q_idx],
+                embeddings,
+            ):
+                # 与 ChromaVectorStore.query 一致: 相似度 = exp(-distance)
+                node = self._metadata_to_node(node_id, text, metadata)
+                if embedding is not None:
+                    node.embedding = np.asarray(embedding, dtype=float).tolist()
+                nodes.append(NodeWithScore(node=node, score=math.exp(-distance)))
+            logger.debug(f"问题 {q_idx + 1}/{len(questions)} 初步检索到 {len(nodes)} 个节点")
+            batched_nodes.append(nodes)
+        
+        logger.info(f"批量检索完成: {len(questions)} 个问题，单次 Chroma 查询")
+        return batched_nodes
+    
+    @staticmethod
+    def _metadata_to_node(node_id: str, text: Optional[str], metadata: Optional[Dict[str, Any]]) -> BaseNode:
+        """将 Chroma 返回的 metadata 还原为节点"""
+        try:
+            return metadata_dict_to_node(metadata, text=text)
+        except Exception:
+            return TextNode(text=text or "", id_=node_id, metadata=metadata or {})
+    
     async def _retrieve_single_question(
         self,
         question: str
@@ -164,8 +372,8 @@ class RAGPostProcessModule:
         Raises:
             Exception: 检索失败时抛出异常
         """
-        # 使用在 __init__ 中构建好的 retriever，避免重复创建
-        nodes = self.retriever.retrieve(question)
+        # 使用在 __init__ 中构建好的 retriever，避免重复创建；放到线程中执行，不阻塞事件循环
+        nodes = await asyncio.to_thread(self.retriever.retrieve, question)
         return nodes
     
     async def _rerank_and_filter(
@@ -237,45 +445,86 @@ class RAGPostProcessModule:
         cleaned = " ".join(cleaned.split())
         return cleaned
 
-    def _deduplicate_by_text_similarity(
+    async def _fetch_embeddings(self, node_ids: List[str]) -> Dict[str, np.ndarray]:
+        """从 Chroma 按 id 读取已存储的 embedding"""
+        if self._chroma_collection is None or not node_ids:
+            return {}
+        results = await asyncio.to_thread(
+            self._chroma_collection.get,
+            ids=node_ids,
+            include=["embeddings"],
+        )
+        embeddings = results.get("embeddings")
+        if embeddings is None:
+            return {}
+        return {
+            node_id: np.asarray(embedding, dtype=float)
+            for node_id, embedding in zip(results["ids"], embeddings)
+            if embedding is not None
+        }
+
+    async def _deduplicate_by_embedding(
+        self,
+        nodes: List[NodeWithScore]
+    ) -> Optional[List[NodeWithScore]]:
+        """基于已存储 embedding 的语义去重（保留高分节点）
+
+        检索结果自带的 embedding 直接使用，缺失的按 id 从 Chroma 补取；
+        相似度为一次矩阵乘法，不再重新拟合 TF-IDF。embedding 只用于去重，完成后从节点上清除，
+        避免随检索结果写入图状态
+
+        Args:
+            nodes: 按分数降序排列的节点列表
+
+        Returns:
+            去重后的节点列表；存在无法取得 embedding 的节点时返回 None，由调用方回退到 TF-IDF
+        """
+        try:
+            if len(nodes) <= 1:
+                return nodes
+
+            missing_ids = [nws.node.node_id for nws in nodes if nws.node.embedding is None]
+            try:
+                fetched = await self._fetch_embeddings(missing_ids)
+            except Exception as e:
+                logger.warning(f"读取节点 embedding 失败，回退到 TF-IDF 去重: {e}")
+                return None
+
+            vectors = []
+            for nws in nodes:
+                embedding = nws.node.embedding
+                vector = np.asarray(embedding, dtype=float) if embedding is not None else fetched.get(nws.node.node_id)
+                if vector is None:
+                    logger.debug(f"节点 {nws.node.node_id} 缺少 embedding，回退到 TF-IDF 去重")
+                    return None
+                vectors.append(vector)
+            if len({vector.shape for vector in vectors}) != 1:
+                logger.warning("节点 embedding 维度不一致，回退到 TF-IDF 去重")
+                return None
+
+            keep = _embedding_keep_mask(np.vstack(vectors), self.semantic_dedup_threshold)
+            return [nws for nws, flag in zip(nodes, keep) if flag]
+        finally:
+            # 无论是否回退到 TF-IDF，都不让 embedding 随节点进入图状态与 checkpoint
+            for nws in nodes:
+                nws.node.embedding = None
+
+    async def _deduplicate_by_text_similarity(
         self,
         nodes: List[NodeWithScore]
     ) -> List[NodeWithScore]:
-        """基于 TF-IDF + 余弦相似度的内容去重"""
+        """基于 TF-IDF + 余弦相似度的内容去重（向量化与相似度矩阵在 CPU 进程池中计算）"""
         if not nodes or len(nodes) <= 1:
             return nodes
 
         if not SKLEARN_AVAILABLE or TfidfVectorizer is None or cosine_similarity is None:
             return nodes
 
-        assert TfidfVectorizer is not None
-        assert cosine_similarity is not None
-
         contents = [self._normalize_content(node.node.get_content()) for node in nodes]
         if not any(contents):
             return nodes
 
-        vectorizer = TfidfVectorizer(
-            max_features=5000,
-            stop_words=None,
-            ngram_range=(1, 2)
-        )
-
-        tfidf_matrix = vectorizer.fit_transform(contents)
-        similarity_matrix = cosine_similarity(tfidf_matrix)
-
-        to_keep = set(range(len(nodes)))
-        for i in range(len(nodes)):
-            if i not in to_keep:
-                continue
-
-            for j in range(i + 1, len(nodes)):
-                if j not in to_keep:
-                    continue
-
-                if similarity_matrix[i, j] >= Config.DOC_FILTER:
-                    to_keep.discard(j)
-
+        to_keep = set(await run_in_process(_text_similarity_keep_indices, contents, Config.DOC_FILTER))
         deduped = [node for idx, node in enumerate(nodes) if idx in to_keep]
         return deduped
     
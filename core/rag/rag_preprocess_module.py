@@ -6,6 +6,7 @@ RAG 检索前处理模块
 """
 
 import os
+import asyncio
 import json
 import logging
 from pathlib import Path
@@ -20,6 +21,8 @@ from llama_index.core.embeddings import BaseEmbedding
 from chromadb import PersistentClient
 from llama_index.embeddings.openai_like import OpenAILikeEmbedding
 from core.config import Config
+from core.rag.embedding_cache import with_embedding_cache
+from core.rag.batch_embedding import BatchEmbeddingClient
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -60,8 +63,11 @@ class VectorStoreManager:
         """
         self.persist_dir = persist_dir
         self.collection_name = collection_name
-        self.embedding_model = embedding_model or self._get_local_embedding_model()
+        # 套上持久化 Embedding 缓存，重复的 chunk / 子问题不再请求 embedding 服务
+        self.embedding_model = with_embedding_cache(embedding_model or self._get_local_embedding_model())
         # self.embedding_model = embedding_model
+        # 入库前按 token 预算批量、并发预计算 embedding
+        self.batch_embedder = BatchEmbeddingClient(self.embedding_model)
         self.chroma_client = None
         self.vector_store = None
         self.index = None
@@ -219,7 +225,8 @@ class VectorStoreManager:
             logger.info("检测到已有向量数据，直接加载现有索引")
             self.index = VectorStoreIndex.from_vector_store(
                 vector_store=self.vector_store,
-                storage_context=storage_context
+                storage_context=storage_context,
+                embed_model=self.embedding_model
             )
         else:
             # 否则从基础数据构建新索引
@@ -242,7 +249,8 @@ class VectorStoreManager:
             logger.info(f"开始构建向量索引，文档数量: {len(documents)}")
             self.index = VectorStoreIndex.from_documents(
                 documents=documents,
-                storage_context=storage_context
+                storage_context=storage_context,
+                embed_model=self.embedding_model
             )
             
             # 持久化
@@ -274,6 +282,8 @@ class VectorStoreManager:
             logger.info("索引未初始化，尝试加载或构建向量库")
             self.load_or_build_index()
         
+        # 先批量并发计算 embedding，insert_nodes 会直接使用节点上已有的 embedding
+        self.batch_embedder.embed_nodes_sync(nodes)
         # 添加文档到索引
         self.index.insert_nodes(nodes)
         
@@ -283,6 +293,33 @@ class VectorStoreManager:
         
         return self.index
     
+    async def aadd_nodes(
+        self,
+        nodes: List[BaseNode]
+    ) -> VectorStoreIndex:
+        """异步版本的 add_nodes（供运行在事件循环中的调用方使用）
+        
+        Args:
+             nodes: LlamaIndex TextNode 列表
+            
+        Returns:
+            更新后的 VectorStoreIndex
+        """
+        if not nodes:
+            logger.warning("没有文档需要添加")
+            return self.index
+        
+        logger.info(f"开始添加 {len(nodes)} 个新文档到向量库")
+        
+        if self.index is None:
+            logger.info("索引未初始化，尝试加载或构建向量库")
+            await asyncio.to_thread(self.load_or_build_index)
+        
+        await self.batch_embedder.embed_nodes(nodes)
+        await asyncio.to_thread(self.index.insert_nodes, nodes)
+        
+        return self.index
+    
     def load_or_build_index(self) -> VectorStoreIndex:
         """智能加载或构建向量索引
         
@@ -323,7 +360,8 @@ class VectorStoreManager:
                         storage_context = StorageContext.from_defaults(vector_store=self.vector_store)
                         self.index = VectorStoreIndex.from_vector_store(
                             vector_store=self.vector_store,
-                            storage_context=storage_context
+                            storage_context=storage_context,
+                            embed_model=self.embedding_model
                         )
                         logger.info("成功从本地加载向量索引")
                         return self.index
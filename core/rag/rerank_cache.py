@@ -0,0 +1,161 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Rerank 分数缓存
+以 (reranker 模型, query 哈希, passage 哈希) 为键缓存相关性分数，
+rag_retrieve 重试或不同用户的相似问题只需把未命中的 passage 发往 TEI/vLLM
+
+- 内存层: OrderedDict 实现的 LRU，条数上限 capacity
+- 磁盘层（可选）: SQLite，进程重启后仍可命中
+"""
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from core.config import Config
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+CacheKey = Tuple[str, str, str]
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class RerankScoreCache:
+    """Rerank 分数两级缓存（线程安全）"""
+
+    def __init__(
+        self,
+        capacity: int = Config.RERANK_CACHE_CAPACITY,
+        db_path: Optional[str] = None
+    ):
+        """初始化缓存
+
+        Args:
+            capacity: 内存 LRU 的最大条数
+            db_path: SQLite 文件路径，为空时只使用内存缓存
+        """
+        self.capacity = capacity
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, float]" = OrderedDict()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if db_path:
+            try:
+                Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+                self._conn = sqlite3.connect(db_path, check_same_thread=False)
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS rerank_scores ("
+                    "model TEXT NOT NULL, query_hash TEXT NOT NULL, passage_hash TEXT NOT NULL, "
+                    "score REAL NOT NULL, PRIMARY KEY (model, query_hash, passage_hash))"
+                )
+                self._conn.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"打开 Rerank 磁盘缓存失败，仅使用内存缓存: {db_path}, {e}")
+                self._conn = None
+        logger.info(f"初始化 RerankScoreCache: capacity={capacity}, db_path={db_path if self._conn else None}")
+
+    def _remember(self, key: CacheKey, score: float) -> None:
+        """写入内存 LRU（调用方持有锁）"""
+        self._entries[key] = score
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def get_many(self, model: str, query: str, passages: Sequence[str]) -> List[Optional[float]]:
+        """批量查询分数，未命中的位置返回 None"""
+        query_hash = _digest(query)
+        keys = [(model, query_hash, _digest(passage)) for passage in passages]
+        scores: List[Optional[float]] = [None] * len(keys)
+        with self._lock:
+            for i, key in enumerate(keys):
+                score = self._entries.get(key)
+                if score is not None:
+                    self._entries.move_to_end(key)
+                    scores[i] = score
+
+            missing = [i for i, score in enumerate(scores) if score is None]
+            if missing and self._conn is not None:
+                passage_hashes = list({keys[i][2] for i in missing})
+                try:
+                    rows = self._conn.execute(
+                        "SELECT passage_hash, score FROM rerank_scores WHERE model = ? AND query_hash = ? "
+                        f"AND passage_hash IN ({','.join('?' * len(passage_hashes))})",
+                        (model, query_hash, *passage_hashes)
+                    ).fetchall()
+                except sqlite3.Error as e:
+                    logger.warning(f"读取 Rerank 磁盘缓存失败: {e}")
+                    rows = []
+                found = dict(rows)
+                for i in missing:
+                    score = found.get(keys[i][2])
+                    if score is not None:
+                        scores[i] = score
+                        self._remember(keys[i], score)
+
+            hit_count = sum(score is not None for score in scores)
+            self.hits += hit_count
+            self.misses += len(scores) - hit_count
+        return scores
+
+    def put_many(self, model: str, query: str, passages: Sequence[str], scores: Sequence[float]) -> None:
+        """批量写入分数"""
+        query_hash = _digest(query)
+        rows = [(model, query_hash, _digest(passage), float(score)) for passage, score in zip(passages, scores)]
+        if not rows:
+            return
+        with self._lock:
+            for model_name, q_hash, p_hash, score in rows:
+                self._remember((model_name, q_hash, p_hash), score)
+            if self._conn is not None:
+                try:
+                    self._conn.executemany("INSERT OR REPLACE INTO rerank_scores VALUES (?, ?, ?, ?)", rows)
+                    self._conn.commit()
+                except sqlite3.Error as e:
+                    logger.warning(f"写入 Rerank 磁盘缓存失败: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取缓存统计信息"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "persistent": self._conn is not None,
+            }
+
+    def close(self) -> None:
+        """关闭磁盘缓存连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_shared_cache: Optional[RerankScoreCache] = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_rerank_cache() -> Optional[RerankScoreCache]:
+    """获取进程内共享的 Rerank 分数缓存，Config.RERANK_CACHE_ENABLED 关闭时返回 None"""
+    global _shared_cache
+    if not Config.RERANK_CACHE_ENABLED:
+        return None
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = RerankScoreCache(
+                capacity=Config.RERANK_CACHE_CAPACITY,
+                db_path=Config.RERANK_CACHE_PATH if Config.RERANK_CACHE_PERSIST else None
+            )
+        return _shared_cache
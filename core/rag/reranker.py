@@ -1,13 +1,15 @@
 import asyncio
 import logging
 import os
-from typing import Any, Awaitable, Dict, List, Optional, cast
+import time
+from typing import Any, Dict, List, Optional, Tuple, cast
 
 import httpx
-from tei_client import HttpClient
 
 from concurrent_log_handler import ConcurrentRotatingFileHandler
 from core.config import Config
+from core.http_clients import close_shared_async_clients, get_shared_async_client
+from core.rag.rerank_cache import RerankScoreCache, get_shared_rerank_cache
 
 # 设置日志
 logger = logging.getLogger(__name__)
@@ -25,74 +27,95 @@ handler.setFormatter(logging.Formatter(
 ))
 logger.addHandler(handler)
 
+# 各 base_url 的服务探测结果，所有 BGEReranker 实例共享: base_url -> (backend, model_id, 过期时间)
+_backend_cache: Dict[str, Tuple[str, str, float]] = {}
+
 
 class BGEReranker:
-    """BGE Reranker 类，使用 tei_client 调用 TEI 部署的 bge-reranker"""
+    """BGE Reranker 类，调用 TEI / vLLM 部署的 bge-reranker
+
+    同一 base_url 的所有实例共享一个 keep-alive（可用时 HTTP/2）连接池，
+    服务类型与模型 ID 的探测结果按 RERANK_BACKEND_TTL 缓存
+    """
     
     def __init__(
         self,
         base_url: str = Config.RERANK_BASE_URL,
-        batch_size: int = Config.RERANK_BATCH_SIZE,
-        max_concurrent: int = Config.RERANK_MAX_CONCURRENT
-    ):
+        batch_size: int = Config.RERANK_BATCH_SIZE,
+        max_concurrent: int = Config.RERANK_MAX_CONCURRENT,
+        model_name: str = Config.RERANK_MODEL,
+        score_cache: Optional[RerankScoreCache] = None
+    ):
         """初始化 BGE Reranker
         
         Args:
             base_url: TEI API 地址
-            batch_size: 批处理大小（保留参数以兼容，但 TEI 本身支持批量）
-            max_concurrent: 最大并发请求数（保留参数以兼容）
+            batch_size: 单个 rerank 请求的最大文档数，超出时在客户端切块
+            max_concurrent: 同时在途的 rerank 请求数上限（同一实例的所有调用共享）
+            model_name: reranker 模型名称，作为分数缓存的命名空间
+            score_cache: 分数缓存，为空时使用进程内共享缓存（RERANK_CACHE_ENABLED 关闭时不缓存）
         """
-        self.base_url = base_url or Config.RERANK_BASE_URL
+        self.base_url = base_url or Config.RERANK_BASE_URL
+        self.batch_size = max(1, batch_size)
+        self.max_concurrent = max(1, max_concurrent)
+        self._semaphores: Dict[asyncio.AbstractEventLoop, asyncio.Semaphore] = {}
+        self.model_name = model_name
+        self.score_cache = score_cache or get_shared_rerank_cache()
         self.backend: Optional[str] = None
-        self.client = HttpClient(url=self.base_url)
-        self.vllm_client: Optional[httpx.AsyncClient] = None
+        self.model_id = ""  # 服务端模型 ID，vLLM 请求需要
+        self._backend_expires_at = 0.0
         self.vllm_model_id = os.getenv("VLLM_RERANK_MODEL_ID", "")
 
-        logger.info(f"初始化 BGEReranker: base_url={self.base_url}")
+        logger.info(
+            f"初始化 BGEReranker: base_url={self.base_url}, batch_size={self.batch_size}, "
+            f"max_concurrent={self.max_concurrent}"
+        )
+
+    def _get_client(self) -> httpx.AsyncClient:
+        return get_shared_async_client(self.base_url, timeout=60.0)
 
     async def _detect_backend(self) -> None:
-        if self.backend:
+        now = time.monotonic()
+        if self.backend and now < self._backend_expires_at:
             return
-        async with httpx.AsyncClient(base_url=self.base_url, timeout=10.0) as probe_client:
-            try:
-                response = await probe_client.get("/info")
-                if response.status_code == 200:
-                    payload = response.json()
-                    if isinstance(payload, dict) and payload.get("model_type"):
-                        self.backend = "tei"
-                        return
-            except Exception:
-                pass
+        cached = _backend_cache.get(self.base_url)
+        if cached is None or now >= cached[2]:
+            backend, model_id = await self._probe_backend()
+            cached = (backend, model_id, now + Config.RERANK_BACKEND_TTL)
+            _backend_cache[self.base_url] = cached
+            logger.info(f"识别 rerank 服务: base_url={self.base_url}, backend={backend}, model_id={model_id}")
+        self.backend, self.model_id, self._backend_expires_at = cached
 
-            try:
-                response = await probe_client.get("/v1/models")
-                if response.status_code == 200:
-                    self.backend = "vllm"
-                    return
-            except Exception:
-                pass
+    async def _probe_backend(self) -> Tuple[str, str]:
+        """探测服务类型，返回 (backend, model_id)"""
+        client = self._get_client()
+        try:
+            response = await client.get("/info", timeout=10.0)
+            if response.status_code == 200:
+                payload = response.json()
+                if isinstance(payload, dict) and payload.get("model_type"):
+                    return "tei", str(payload.get("model_id") or "")
+        except Exception:
+            pass
 
-        raise RuntimeError(f"无法识别 rerank 服务类型: {self.base_url}")
+        response = None
+        try:
+            response = await client.get("/v1/models", timeout=10.0)
+        except Exception:
+            pass
+        if response is not None and response.status_code == 200:
+            return "vllm", self.vllm_model_id or self._parse_vllm_model_id(response.json())
 
-    async def _get_vllm_client(self) -> httpx.AsyncClient:
-        if self.vllm_client is None:
-            self.vllm_client = httpx.AsyncClient(base_url=self.base_url, timeout=60.0)
-        return self.vllm_client
+        raise RuntimeError(f"无法识别 rerank 服务类型: {self.base_url}")
 
-    async def _resolve_vllm_model_id(self) -> str:
-        if self.vllm_model_id:
-            return self.vllm_model_id
-        vllm_client = await self._get_vllm_client()
-        response = await vllm_client.get("/v1/models")
-        response.raise_for_status()
-        payload = response.json()
+    @staticmethod
+    def _parse_vllm_model_id(payload: Any) -> str:
         data = payload.get("data", []) if isinstance(payload, dict) else []
         if not data:
             raise RuntimeError("vLLM /v1/models 未返回任何模型")
         model_id = data[0].get("id")
         if not model_id:
             raise RuntimeError("vLLM /v1/models 返回结果缺少 model id")
-        self.vllm_model_id = model_id
         return model_id
 
     def _parse_scores(self, items: List[Any]) -> List[Dict[str, float]]:
@@ -122,8 +145,71 @@ class BGEReranker:
                 "index": parsed_index,
                 "score": parsed_score
             })
-        rerank_results.sort(key=lambda x: x["score"], reverse=True)
-        return rerank_results
+        rerank_results.sort(key=lambda x: x["score"], reverse=True)
+        return rerank_results
+
+    async def _rerank_backend(self, query: str, documents: List[str]) -> List[Dict[str, float]]:
+        """请求 TEI/vLLM 服务计算分数，失败时抛出异常"""
+        await self._detect_backend()
+        client = self._get_client()
+        if self.backend == "tei":
+            response = await client.post("/rerank", json={"query": query, "texts": documents})
+            response.raise_for_status()
+            payload = response.json()
+            return self._parse_scores(payload if isinstance(payload, list) else [])
+
+        response = await client.post(
+            "/v1/rerank",
+            json={
+                "model": self.model_id,
+                "query": query,
+                "documents": documents,
+            },
+        )
+        response.raise_for_status()
+        payload = response.json()
+        results = payload.get("results", []) if isinstance(payload, dict) else []
+        return self._parse_scores(list(results))
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        """获取当前事件循环对应的并发信号量（同步接口可能在不同事件循环中调用）"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            self._semaphores = {
+                existing: sem for existing, sem in self._semaphores.items() if not existing.is_closed()
+            }
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_concurrent)
+        return semaphore
+
+    async def _rerank_chunked(self, query: str, documents: List[str]) -> List[Optional[float]]:
+        """按 batch_size 切块并发请求，返回与 documents 对齐的分数（失败块为 None）"""
+        semaphore = self._get_semaphore()
+        starts = list(range(0, len(documents), self.batch_size))
+
+        async def run(start: int) -> List[Dict[str, float]]:
+            async with semaphore:
+                return await self._rerank_backend(query, documents[start:start + self.batch_size])
+
+        chunk_results = await asyncio.gather(*(run(start) for start in starts), return_exceptions=True)
+
+        scores: List[Optional[float]] = [None] * len(documents)
+        failed_chunks = 0
+        for start, result in zip(starts, chunk_results):
+            if isinstance(result, BaseException):
+                failed_chunks += 1
+                logger.error(f"rerank 分块请求失败: offset={start}, {result}")
+                continue
+            chunk_len = min(self.batch_size, len(documents) - start)
+            for item in result:
+                # 块内下标映射为全局下标
+                if 0 <= item["index"] < chunk_len:
+                    scores[start + item["index"]] = item["score"]
+        if failed_chunks == len(starts):
+            raise RuntimeError(f"rerank 全部 {failed_chunks} 个分块请求失败")
+        if failed_chunks:
+            logger.error(f"rerank {failed_chunks}/{len(starts)} 个分块失败，对应文档没有分数")
+        return scores
     
     async def rerank_async(self, query: str, documents: List[str]) -> List[Dict[str, float]]:
         """异步对文档进行重排序
@@ -134,43 +220,61 @@ class BGEReranker:
             
         Returns:
             重排序结果列表，每个元素包含 {"index": int, "score": float}
-            按分数从高到低排序
+            按分数从高到低排序；rerank 请求失败、没有分数的文档不出现在结果中（不再编造默认分数）
         """
         if not documents:
             logger.warning("文档列表为空，跳过 rerank")
             return []
         
-        try:
-            logger.info(f"开始异步 rerank，查询: {query[:50]}..., 文档数量: {len(documents)}")
-            await self._detect_backend()
-            if self.backend == "tei":
-                result = await self.client.async_rerank(query=query, texts=documents)
-                ranks = getattr(result, "ranks", result)
-                rerank_results = self._parse_scores(list(ranks))
-            else:
-                vllm_client = await self._get_vllm_client()
-                model_id = await self._resolve_vllm_model_id()
-                response = await vllm_client.post(
-                    "/v1/rerank",
-                    json={
-                        "model": model_id,
-                        "query": query,
-                        "documents": documents,
-                    },
-                )
-                response.raise_for_status()
-                payload = response.json()
-                results = payload.get("results", []) if isinstance(payload, dict) else []
-                rerank_results = self._parse_scores(list(results))
-
-            logger.info(f"异步 Rerank 完成，返回 {len(rerank_results)} 个结果")
-            return rerank_results
-
-        except Exception as e:
-            logger.error(f"异步 Rerank 过程出错: {e}")
-            import traceback
-            traceback.print_exc()
-            return [{"index": i, "score": 0.5} for i in range(len(documents))]
+        # 先查分数缓存，只把未命中的文档发往服务端（SQLite 查询放到工作线程，不阻塞事件循环）
+        if self.score_cache is not None:
+            scores: List[Optional[float]] = await asyncio.to_thread(
+                self.score_cache.get_many, self.model_name, query, documents
+            )
+        else:
+            scores = [None] * len(documents)
+        missing = [i for i, score in enumerate(scores) if score is None]
+        
+        if missing:
+            try:
+                logger.info(
+                    f"开始异步 rerank，查询: {query[:50]}..., 文档数量: {len(documents)}, "
+                    f"缓存命中: {len(documents) - len(missing)}"
+                )
+                missing_scores = await self._rerank_chunked(query, [documents[i] for i in missing])
+            except Exception as e:
+                logger.error(f"异步 Rerank 过程出错，{len(missing)} 个未命中缓存的文档没有分数，从结果中剔除: {e}")
+                import traceback
+                traceback.print_exc()
+                missing_scores = [None] * len(missing)
+            
+            # 子集下标映射回原始下标；失败分块的文档没有分数，不写缓存，也不返回
+            fresh_indices = []
+            for original_index, score in zip(missing, missing_scores):
+                if score is None:
+                    continue
+                scores[original_index] = score
+                fresh_indices.append(original_index)
+            unscored = len(missing) - len(fresh_indices)
+            if unscored:
+                logger.error(f"rerank 失败，剔除 {unscored}/{len(documents)} 个没有分数的文档")
+            if self.score_cache is not None and fresh_indices:
+                await asyncio.to_thread(
+                    self.score_cache.put_many,
+                    self.model_name,
+                    query,
+                    [documents[i] for i in fresh_indices],
+                    [cast(float, scores[i]) for i in fresh_indices]
+                )
+        else:
+            logger.info(f"Rerank 全部命中缓存，文档数量: {len(documents)}")
+        
+        rerank_results = [
+            {"index": i, "score": score} for i, score in enumerate(scores) if score is not None
+        ]
+        rerank_results.sort(key=lambda x: x["score"], reverse=True)
+        logger.info(f"异步 Rerank 完成，返回 {len(rerank_results)} 个结果")
+        return rerank_results
     
     def rerank(self, query: str, documents: List[str]) -> List[Dict[str, float]]:
         """同步接口：对文档进行重排序
@@ -192,29 +296,10 @@ class BGEReranker:
         
         return loop.run_until_complete(self.rerank_async(query, documents))
     
-    async def close(self):
-        """关闭 TEI 客户端"""
-        if self.client is not None:
-            close_method = getattr(self.client, "close", None)
-            if callable(close_method):
-                result = close_method()
-                if asyncio.iscoroutine(result):
-                    await cast(Awaitable[object], result)
-                logger.info("BGEReranker TEI 客户端已关闭")
-        if self.vllm_client is not None:
-            await self.vllm_client.aclose()
-            logger.info("BGEReranker vLLM 客户端已关闭")
-    
-    def __del__(self):
-        """析构函数，确保客户端关闭"""
-        try:
-            loop = asyncio.get_event_loop()
-            if loop.is_running():
-                loop.create_task(self.close())
-            else:
-                loop.run_until_complete(self.close())
-        except Exception:
-            pass
+    async def close(self):
+        """关闭当前事件循环下该 base_url 的共享连接池（其他实例下次请求时会自动重建）"""
+        await close_shared_async_clients(self.base_url)
+        logger.info("BGEReranker 连接池已关闭")
 
 
 # 测试代码
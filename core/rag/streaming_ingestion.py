@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+流式入库流水线
+每个 ExecutorAgent 的结果一到达就依次经过：去重 -> DocumentProcessor 切割 -> 向量化入库，
+各阶段之间用 asyncio.Queue 衔接，不再等待全部 executor 完成后整批处理
+"""
+
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from llama_index.core import VectorStoreIndex
+from llama_index.core.schema import BaseNode
+
+from core.file_deduplicator import FileDeduplicator
+from core.log_config import setup_logger
+from core.rag.document_processor import DocumentProcessor
+
+logger = setup_logger(__name__)
+
+
+@dataclass
+class IngestionItem:
+    """流水线中的一个 executor 结果"""
+    stage: str  # 所属执行阶段（first / second）
+    result: Dict[str, Any]  # executor 返回的 {"sub_url_pool": ..., "downloaded_papers": ...}
+    documents: List[Dict] = field(default_factory=list)  # 去重后保留的文档元数据
+    nodes: List[BaseNode] = field(default_factory=list)  # 切割后的节点
+    deduplicated: asyncio.Event = field(default_factory=asyncio.Event)
+    processed: asyncio.Event = field(default_factory=asyncio.Event)
+
+
+class StreamingIngestionPipeline:
+    """流式入库流水线
+
+    dedup -> process -> insert 三个阶段各由一个 worker 消费上游队列：
+    - dedup: 先在结果内部去重，再与此前已保留的文件做跨结果去重（先到先得）
+    - process: 调用 DocumentProcessor.get_nodes 生成节点；输入关闭后再读取一次 executor 持续追加的
+      context7_grep.json
+    - insert: 向量索引就绪后立即 insert_nodes；索引始终未就绪时节点保留在 pending_nodes 中
+    """
+
+    def __init__(
+        self,
+        document_processor: DocumentProcessor,
+        file_deduplicator: FileDeduplicator,
+        index_provider: Callable[[], Optional[VectorStoreIndex]],
+        index_poll_interval: float = 0.5,
+        node_embedder: Optional[Callable[[List[BaseNode]], Awaitable[None]]] = None
+    ):
+        """初始化流水线
+
+        Args:
+            document_processor: 文档处理器
+            file_deduplicator: 文件去重器
+            index_provider: 返回当前向量索引的回调（未初始化时返回 None）
+            index_poll_interval: 等待向量索引就绪的轮询间隔（秒）
+            node_embedder: 入库前为节点批量预计算 embedding 的协程（可选）
+        """
+        self.document_processor = document_processor
+        self.file_deduplicator = file_deduplicator
+        self.index_provider = index_provider
+        self.index_poll_interval = index_poll_interval
+        self.node_embedder = node_embedder
+
+        self.items: List[IngestionItem] = []
+        self.accepted_paths: List[str] = []
+        self.inserted_count = 0
+        self.pending_nodes: List[BaseNode] = []
+        self.first_node_latency: Optional[float] = None
+
+        self._dedup_queue: "asyncio.Queue[Optional[IngestionItem]]" = asyncio.Queue()
+        self._process_queue: "asyncio.Queue[Optional[IngestionItem]]" = asyncio.Queue()
+        self._insert_queue: "asyncio.Queue[Optional[IngestionItem]]" = asyncio.Queue()
+        self._closing = False
+        self._started_at = time.monotonic()
+        self._workers = [
+            asyncio.create_task(self._dedup_worker()),
+            asyncio.create_task(self._process_worker()),
+            asyncio.create_task(self._insert_worker()),
+        ]
+        logger.info("StreamingIngestionPipeline 已启动")
+
+    # ------------------------------------------------------------------
+    # 对外接口
+    # ------------------------------------------------------------------
+
+    async def submit(self, result: Dict[str, Any], stage: str) -> None:
+        """提交一个 executor 结果（可直接作为 ExecutorAgentPool 的 on_result 回调）"""
+        item = IngestionItem(stage=stage, result=result if isinstance(result, dict) else {})
+        self.items.append(item)
+        await self._dedup_queue.put(item)
+
+    async def wait_deduplicated(self, stage: str) -> List[Dict]:
+        """等待某阶段已提交的结果全部完成去重，返回该阶段保留的文档元数据"""
+        items = [item for item in self.items if item.stage == stage]
+        await asyncio.gather(*(item.deduplicated.wait() for item in items))
+        return [doc for item in items for doc in item.documents]
+
+    async def wait_processed(self, stage: str) -> List[BaseNode]:
+        """等待某阶段已提交的结果全部完成切割，返回该阶段的节点"""
+        items = [item for item in self.items if item.stage == stage]
+        await asyncio.gather(*(item.processed.wait() for item in items))
+        return [node for item in items for node in item.nodes]
+
+    async def finish(self) -> Dict[str, Any]:
+        """关闭输入并等待所有阶段排空
+
+        Returns:
+            {"inserted": 已入库节点数, "pending_nodes": 因索引未就绪而未入库的节点,
+             "first_node_latency": 首个节点可检索的耗时（秒）}
+        """
+        self._closing = True
+        await self._dedup_queue.put(None)
+        await asyncio.gather(*self._workers)
+        logger.info(
+            f"StreamingIngestionPipeline 结束: 结果 {len(self.items)} 个, 入库节点 {self.inserted_count} 个, "
+            f"待入库节点 {len(self.pending_nodes)} 个, 首个节点耗时 {self.first_node_latency}"
+        )
+        return {
+            "inserted": self.inserted_count,
+            "pending_nodes": self.pending_nodes,
+            "first_node_latency": self.first_node_latency,
+        }
+
+    async def cancel(self) -> None:
+        """放弃流水线（流程提前结束时调用）"""
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+
+    # ------------------------------------------------------------------
+    # 各阶段 worker
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _get_document_path(doc: Dict) -> str:
+        if not isinstance(doc, dict):
+            return ""
+        extra = doc.get("extra")
+        if isinstance(extra, dict) and extra.get("saved_path"):
+            return extra["saved_path"]
+        return doc.get("local_path") or doc.get("file_path") or doc.get("path") or ""
+
+    async def _deduplicate_item(self, item: IngestionItem) -> None:
+        documents = item.result.get("downloaded_papers", []) or []
+        paths = list(dict.fromkeys(p for p in (self._get_document_path(d) for d in documents) if p))
+        unique_files, _ = await self.file_deduplicator.adeduplicate_file_list(paths)
+        if self.accepted_paths and unique_files:
+            unique_files, _ = await self.file_deduplicator.adeduplicate_against_reference(
+                self.accepted_paths,
+                unique_files
+            )
+        allowed: Set[str] = set(unique_files)
+        seen: Set[str] = set()
+        for doc in documents:
+            path = self._get_document_path(doc)
+            if not path or path not in allowed or path in seen:
+                continue
+            seen.add(path)
+            item.documents.append(doc)
+        self.accepted_paths.extend(path for path in unique_files if os.path.exists(path))
+
+    async def _dedup_worker(self) -> None:
+        while True:
+            item = await self._dedup_queue.get()
+            if item is None:
+                await self._process_queue.put(None)
+                return
+            try:
+                await self._deduplicate_item(item)
+                logger.info(f"[stream] {item.stage} 阶段结果去重完成，保留 {len(item.documents)} 个文档")
+            except Exception as e:
+                logger.error(f"[stream] 去重失败，跳过该结果: {e}")
+            finally:
+                item.deduplicated.set()
+            await self._process_queue.put(item)
+
+    def _get_nodes_sync(self, documents: List[Dict]) -> List[BaseNode]:
+        return asyncio.run(self.document_processor.get_nodes(documents, include_optional_file=False))
+
+    def _get_optional_file_nodes_sync(self) -> List[BaseNode]:
+        return asyncio.run(self.document_processor.get_optional_file_nodes())
+
+    async def _process_optional_file(self) -> None:
+        """全部结果切割完成后读取一次 context7_grep.json（此时 executor 已不再追加）"""
+        item = IngestionItem(stage="optional", result={})
+        try:
+            item.nodes = await asyncio.to_thread(self._get_optional_file_nodes_sync)
+            logger.info(f"[stream] 可选工具结果切割完成，生成 {len(item.nodes)} 个节点")
+        except Exception as e:
+            logger.error(f"[stream] 可选工具结果处理失败: {e}")
+        finally:
+            item.processed.set()
+        if item.nodes:
+            await self._insert_queue.put(item)
+
+    async def _process_worker(self) -> None:
+        while True:
+            item = await self._process_queue.get()
+            if item is None:
+                await self._process_optional_file()
+                await self._insert_queue.put(None)
+                return
+            try:
+                if item.documents:
+                    item.nodes = await asyncio.to_thread(self._get_nodes_sync, list(item.documents))
+                    logger.info(f"[stream] {item.stage} 阶段结果切割完成，生成 {len(item.nodes)} 个节点")
+            except Exception as e:
+                logger.error(f"[stream] 文档处理失败，跳过该结果: {e}")
+            finally:
+                item.processed.set()
+            if item.nodes:
+                await self._insert_queue.put(item)
+
+    async def _wait_for_index(self) -> Optional[VectorStoreIndex]:
+        index = self.index_provider()
+        while index is None and not self._closing:
+            await asyncio.sleep(self.index_poll_interval)
+            index = self.index_provider()
+        return index
+
+    async def _insert_worker(self) -> None:
+        while True:
+            item = await self._insert_queue.get()
+            if item is None:
+                return
+            index = await self._wait_for_index()
+            if index is None:
+                self.pending_nodes.extend(item.nodes)
+                continue
+            try:
+                if self.node_embedder is not None:
+                    await self.node_embedder(item.nodes)
+                await asyncio.to_thread(index.insert_nodes, item.nodes)
+            except Exception as e:
+                logger.error(f"[stream] 节点入库失败，留待批量入库: {e}")
+                self.pending_nodes.extend(item.nodes)
+                continue
+            self.inserted_count += len(item.nodes)
+            if self.first_node_latency is None:
+                self.first_node_latency = time.monotonic() - self._started_at
+                logger.info(f"[stream] 首批节点已可检索，耗时 {self.first_node_latency:.2f}s")
+            logger.info(f"[stream] {item.stage} 阶段入库 {len(item.nodes)} 个节点，累计 {self.inserted_count} 个")
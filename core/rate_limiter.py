@@ -0,0 +1,217 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+外部 API 按主机限速
+SEC EDGAR、Wikipedia、grep.app、OpenAlex、Semantic Scholar、NCBI 等接口都有速率限制，
+多个执行器同时访问同一主机时容易触发 429，再各自 sleep 重试。这里为每个主机维护一个
+进程内共享的令牌桶，所有请求先取令牌再发出
+
+- 速率按主机名后缀在 Config.RATE_LIMIT_HOSTS 中配置，未配置的主机不限速
+- 收到 429/503 时遵守 Retry-After（秒数或 HTTP 日期），期间该主机的请求全部排队
+- 自适应速率：被限流时按比例降速，之后每个成功响应逐步恢复到配置速率
+- 记录每个主机的排队时间（总计 / 最大）与被限流次数
+
+令牌桶以虚拟调度（GCRA）实现：只记录下一个令牌的理论可用时间，等价于容量 burst、
+速率 rate 的令牌桶，状态由线程锁保护，不绑定事件循环
+"""
+
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+from core.config import Config
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 响应头
+
+    Args:
+        value: 响应头的值（秒数或 HTTP 日期）
+
+    Returns:
+        需要等待的秒数，无法解析时返回 None
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, OverflowError):
+        return None
+
+
+class HostRateLimiter:
+    """单个主机的令牌桶（线程安全，可在多个事件循环中共用）"""
+
+    def __init__(self, name: str, rate: Optional[float], burst: Optional[float] = None):
+        """初始化
+
+        Args:
+            name: 主机或主机规则名称
+            rate: 配置速率（次/秒），为 None 时不限速，只遵守 Retry-After
+            burst: 令牌桶容量，默认为 Config.RATE_LIMIT_BURST_SECONDS 秒的配置速率（至少 1）
+        """
+        self.name = name
+        self.max_rate = rate
+        self.rate = rate
+        if burst is None:
+            burst = (rate or 0) * Config.RATE_LIMIT_BURST_SECONDS
+        self.burst = max(1.0, burst)
+        self._tat = 0.0  # 令牌桶理论到达时间
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self._requests = 0
+        self._queued = 0
+        self._throttled = 0
+        self._queue_time_total = 0.0
+        self._queue_time_max = 0.0
+
+    def _reserve(self) -> float:
+        """预约一个令牌，返回需要等待的秒数（调用方持有锁）"""
+        now = time.monotonic()
+        start = max(now, self._blocked_until)
+        if self.rate:
+            interval = 1.0 / self.rate
+            tat = max(self._tat, start)
+            start = max(start, tat - (self.burst - 1) * interval)
+            self._tat = tat + interval
+        return start - now
+
+    async def acquire(self) -> float:
+        """等待取得一个令牌
+
+        Returns:
+            本次排队时间（秒）
+        """
+        with self._lock:
+            wait = self._reserve()
+            self._requests += 1
+            if wait > 0:
+                self._queued += 1
+                self._queue_time_total += wait
+                self._queue_time_max = max(self._queue_time_max, wait)
+        if wait > 0:
+            if wait >= 1.0:
+                logger.debug(f"限速排队: host={self.name}, wait={wait:.2f}s")
+            await asyncio.sleep(wait)
+        return max(0.0, wait)
+
+    def observe(self, status_code: int, retry_after: Optional[str] = None) -> Optional[float]:
+        """根据响应调整速率
+
+        Args:
+            status_code: 响应状态码
+            retry_after: Retry-After 响应头
+
+        Returns:
+            被限流且可以自动重试时返回等待时间（秒），否则返回 None
+        """
+        with self._lock:
+            if status_code not in THROTTLE_STATUS_CODES:
+                if self.rate and self.rate < self.max_rate:
+                    self.rate = min(self.max_rate, self.rate + self.max_rate * Config.RATE_LIMIT_RECOVERY_STEP)
+                return None
+            # 503 不带 Retry-After 时多为服务故障，不视为限流
+            delay = parse_retry_after(retry_after)
+            if delay is None:
+                if status_code != 429:
+                    return None
+                delay = Config.RATE_LIMIT_DEFAULT_BACKOFF
+            self._throttled += 1
+            if self.rate:
+                self.rate = max(
+                    self.max_rate * Config.RATE_LIMIT_MIN_FACTOR, self.rate * Config.RATE_LIMIT_BACKOFF_FACTOR
+                )
+            blocked = min(delay, Config.RATE_LIMIT_MAX_RETRY_AFTER)
+            self._blocked_until = max(self._blocked_until, time.monotonic() + blocked)
+            if self.rate:
+                # 暂停结束后按新速率逐个放行，不把排队的请求一次性放出
+                self._tat = self._blocked_until + (self.burst - 1) / self.rate
+        logger.warning(
+            f"主机限流: host={self.name}, status={status_code}, retry_after={delay:.1f}s, "
+            f"rate={self.rate if self.rate else 'unlimited'}"
+        )
+        return delay if delay <= Config.RATE_LIMIT_MAX_RETRY_AFTER else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        """请求数、排队次数与排队时间、被限流次数、当前速率"""
+        with self._lock:
+            return {
+                "rate": self.rate,
+                "max_rate": self.max_rate,
+                "requests": self._requests,
+                "queued": self._queued,
+                "throttled": self._throttled,
+                "queue_time_total": round(self._queue_time_total, 3),
+                "queue_time_max": round(self._queue_time_max, 3),
+            }
+
+
+_limiters: Dict[str, HostRateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def _match_host(host: str) -> Tuple[str, Optional[float]]:
+    """按主机名后缀匹配配置，返回 (限速器名称, 速率)"""
+    host = host.lower().rstrip(".")
+    for suffix, rate in Config.RATE_LIMIT_HOSTS.items():
+        if host == suffix or host.endswith("." + suffix):
+            return suffix, rate
+    return host, None
+
+
+def get_rate_limiter(url_or_host: str) -> HostRateLimiter:
+    """获取主机对应的共享限速器
+
+    Args:
+        url_or_host: 完整 URL 或主机名
+
+    Returns:
+        该主机（或匹配的主机规则，例如各语言的 wikipedia.org 共用一个）的限速器
+    """
+    host = urlsplit(url_or_host).hostname if "://" in url_or_host else url_or_host
+    name, rate = _match_host(host or "")
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = HostRateLimiter(name, rate)
+        return limiter
+
+
+def get_rate_limiter_stats() -> Dict[str, Dict[str, Any]]:
+    """各主机限速器的统计信息"""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.get_stats() for limiter in limiters}
+
+
+class RateLimitedAsyncClient(httpx.AsyncClient):
+    """发送前按主机取令牌、被限流时按 Retry-After 等待并重试的 AsyncClient"""
+
+    async def send(self, request: httpx.Request, **kwargs: Any) -> httpx.Response:
+        limiter = get_rate_limiter(request.url.host)
+        # 流式请求体无法重放，只重试请求体已在内存中的请求
+        retries = Config.RATE_LIMIT_RETRIES if isinstance(request.stream, httpx.ByteStream) else 0
+        for attempt in range(retries + 1):
+            await limiter.acquire()
+            response = await super().send(request, **kwargs)
+            delay = limiter.observe(response.status_code, response.headers.get("Retry-After"))
+            if delay is None or attempt == retries:
+                return response
+            await response.aclose()
+            logger.info(f"请求被限流，{delay:.1f}s 后重试 ({attempt + 1}/{retries}): {request.url}")
+        return response
@@ -0,0 +1,166 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+流式文件下载
+各搜索器下载 PDF（以及 PMC XML 全文）时共用：响应分块直接写入同目录临时文件，
+不再把整个响应缓冲在内存中再校验，多个 30~80 MB 的 PDF 并发下载时不会造成内存峰值
+
+- 按网络到达的块写入（不重新拼块），读到前几个字节就校验文件头（PDF 为 %PDF），
+  HTML 登录页、验证码页等立即中止
+- Content-Length 或实际读取量超过上限时中止
+- 边下载边计算 SHA-256，供下载索引登记时直接使用
+- 临时文件 + rename 原子落盘，校验失败时不留下任何文件
+
+hedged_download 在多个镜像链接之间对冲：按优先级错开启动多个下载，第一个成功的胜出，
+其余立即取消；某个链接失败时马上启动下一个，不再逐个链接串行重试
+"""
+
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, Tuple, TypeVar
+
+import httpx
+
+from core.config import Config
+from core.download_registry import atomic_open
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+T = TypeVar("T")
+
+PDF_MAGIC = b"%PDF"
+
+
+class DownloadRejected(Exception):
+    """响应不符合要求（状态码、文件头、大小），下载中止"""
+
+
+@dataclass
+class StreamedFile:
+    """流式下载完成的文件"""
+    path: str
+    size: int
+    sha256: str
+
+
+async def stream_download(
+    client: httpx.AsyncClient,
+    url: str,
+    file_path: str,
+    *,
+    magic: Optional[bytes] = PDF_MAGIC,
+    min_bytes: int = 0,
+    max_bytes: Optional[int] = None,
+    headers: Optional[Dict[str, str]] = None,
+    params: Optional[Dict[str, Any]] = None,
+    timeout: float = 30.0
+) -> Optional[StreamedFile]:
+    """流式下载单个 URL 到 file_path
+
+    Args:
+        client: HTTP 客户端
+        url: 下载链接
+        file_path: 保存路径
+        magic: 期望的文件头，为 None 时不校验
+        min_bytes: 最小文件大小，更小的响应视为无效（例如错误页）
+        max_bytes: 最大文件大小，默认 Config.DOWNLOAD_MAX_BYTES
+        headers: 请求头
+        params: 查询参数
+        timeout: 请求超时（秒）
+
+    Returns:
+        下载成功返回 StreamedFile，响应无效或请求失败返回 None
+    """
+    if max_bytes is None:
+        max_bytes = Config.DOWNLOAD_MAX_BYTES
+    try:
+        async with client.stream(
+            "GET", url, headers=headers, params=params, follow_redirects=True, timeout=timeout
+        ) as response:
+            if response.status_code != 200:
+                raise DownloadRejected(f"HTTP {response.status_code}")
+            content_length = response.headers.get("Content-Length")
+            if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+                raise DownloadRejected(f"Content-Length {content_length} 超过上限 {max_bytes}")
+
+            digest = hashlib.sha256()
+            size = 0
+            head = b""
+            with atomic_open(file_path, "wb") as f:
+                async for chunk in response.aiter_bytes():
+                    if magic and len(head) < len(magic):
+                        head += chunk[:len(magic) - len(head)]
+                        if len(head) >= len(magic) and head != magic:
+                            raise DownloadRejected(f"文件头不匹配: {head!r}")
+                    size += len(chunk)
+                    if size > max_bytes:
+                        raise DownloadRejected(f"文件超过上限 {max_bytes} 字节")
+                    digest.update(chunk)
+                    f.write(chunk)
+                if magic and head != magic:
+                    raise DownloadRejected("响应内容过短，无法校验文件头")
+                if size < min_bytes:
+                    raise DownloadRejected(f"文件过小: {size} 字节")
+    except DownloadRejected as e:
+        logger.debug(f"下载中止: {url}, {e}")
+        return None
+    except Exception as e:
+        # 镜像链接格式错误（InvalidURL）、流读取中断（StreamError）等都只放弃当前链接，不影响其余候选
+        logger.debug(f"下载失败: {url}, {type(e).__name__}: {e}")
+        return None
+    return StreamedFile(path=file_path, size=size, sha256=digest.hexdigest())
+
+
+async def hedged_download(
+    urls: Sequence[str],
+    attempt: Callable[[str], Awaitable[Optional[T]]],
+    *,
+    max_parallel: Optional[int] = None,
+    stagger: Optional[float] = None
+) -> Optional[Tuple[str, T]]:
+    """对冲下载：按顺序错开启动候选链接的下载，取第一个成功的结果并取消其余下载
+
+    Args:
+        urls: 候选链接，按优先级排序（重复和空链接会被忽略）
+        attempt: 下载单个链接的协程函数，成功返回非 None
+        max_parallel: 同时进行的下载数，默认 Config.HEDGED_DOWNLOAD_MAX_PARALLEL
+        stagger: 前一个下载未结束时，启动下一个候选链接前的等待时间（秒），
+                 默认 Config.HEDGED_DOWNLOAD_STAGGER；前一个失败时立即启动下一个
+
+    Returns:
+        (胜出的链接, attempt 的返回值)，全部失败时返回 None
+    """
+    if max_parallel is None:
+        max_parallel = Config.HEDGED_DOWNLOAD_MAX_PARALLEL
+    if stagger is None:
+        stagger = Config.HEDGED_DOWNLOAD_STAGGER
+    max_parallel = max(1, max_parallel)
+    candidates = list(dict.fromkeys(url for url in urls if url))
+    running: Dict[asyncio.Task, str] = {}
+    try:
+        while candidates or running:
+            if candidates and len(running) < max_parallel:
+                url = candidates.pop(0)
+                running[asyncio.create_task(attempt(url))] = url
+            # 还能启动新的候选链接时，最多等待 stagger 秒
+            can_start = bool(candidates) and len(running) < max_parallel
+            done, _ = await asyncio.wait(
+                running, timeout=stagger if can_start else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                url = running.pop(task)
+                if task.exception() is not None:
+                    logger.debug(f"对冲下载失败: {url}, {task.exception()}")
+                    continue
+                result = task.result()
+                if result is not None:
+                    logger.debug(f"对冲下载胜出: {url}，取消其余 {len(running)} 个下载")
+                    return url, result
+        return None
+    finally:
+        for task in running:
+            task.cancel()
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
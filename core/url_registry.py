@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+共享 URL 登记表
+两阶段 executor 并发执行时替代"第一阶段结束后传递 url_pool"的做法：
+同一会话的所有 ExecutorAgent 共用一个登记表，先认领（claim）某个 URL 的 executor 负责下载，
+其余 executor 遇到已认领的 URL 直接跳过
+"""
+
+import asyncio
+from typing import Dict, Iterable, List, Optional
+
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+
+class UrlRegistry:
+    """异步安全的 URL 认领表（同一事件循环内使用）"""
+
+    def __init__(self, initial_urls: Optional[Iterable[str]] = None):
+        """初始化
+
+        Args:
+            initial_urls: 预先登记的 URL（视为已被认领，例如上一轮已经下载过的 URL）
+        """
+        self._owners: Dict[str, str] = {}
+        self._lock = asyncio.Lock()
+        for url in initial_urls or []:
+            key = self._normalize(url)
+            if key:
+                self._owners.setdefault(key, "")
+
+    @staticmethod
+    def _normalize(url: str) -> str:
+        return (url or "").strip()
+
+    async def claim(self, url: str, owner: str) -> bool:
+        """认领 URL
+
+        Args:
+            url: 待下载的 URL
+            owner: 认领者标识（executor 的 thread_id）
+
+        Returns:
+            True 表示认领成功（或已由同一认领者认领），应由调用方下载；False 表示已被其他 executor 认领
+        """
+        key = self._normalize(url)
+        if not key:
+            return False
+        async with self._lock:
+            current = self._owners.setdefault(key, owner)
+        if current != owner:
+            logger.debug(f"URL 已被 {current or '历史记录'} 认领，跳过: {key}")
+            return False
+        return True
+
+    async def release(self, url: str, owner: str) -> None:
+        """释放自己认领的 URL（例如下载失败后允许其他 executor 重试）"""
+        key = self._normalize(url)
+        async with self._lock:
+            if self._owners.get(key) == owner:
+                del self._owners[key]
+
+    def urls(self) -> List[str]:
+        """当前已登记的全部 URL"""
+        return list(self._owners)
+
+    def __len__(self) -> int:
+        return len(self._owners)
+
+    def __contains__(self, url: str) -> bool:
+        return self._normalize(url) in self._owners
@@ -17,6 +17,8 @@ from psycopg_pool import AsyncConnectionPool
 from concurrent_log_handler import ConcurrentRotatingFileHandler
 
 from core.config import Config
+from core.process_pool import shutdown_process_pool
+from core.mcp.session_manager import close_mcp_sessions
 from agents.multi_agent import MultiAgent
 from api.routes import router
 
@@ -116,6 +118,14 @@ async def lifespan(app: FastAPI):
             except Exception as e:
                 logger.error(f"连接池关闭失败: {e}")
         
+        try:
+            await close_mcp_sessions()
+            logger.info("✓ 共享 MCP 会话关闭完成")
+        except Exception as e:
+            logger.error(f"共享 MCP 会话关闭失败: {e}")
+        
+        shutdown_process_pool(wait=False)
+        
         logger.info("系统已关闭")
 
 
@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.schema import TextNode
+
+from core.rag.batch_embedding import BatchEmbeddingClient, estimate_tokens
+
+
+class PayloadTooLarge(Exception):
+    status_code = 413
+
+
+class FlakyEmbedding(BaseEmbedding):
+    """超过 max_ok 条的批次直接失败，用于验证二分重试；同时记录并发峰值"""
+
+    max_ok: int = 2
+    batch_sizes: List[int] = []
+    in_flight: int = 0
+    peak: int = 0
+
+    def _vector(self, text: str) -> List[float]:
+        return [float(len(text)), 1.0]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._vector(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        return self._vector(text)
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            self.batch_sizes.append(len(texts))
+            if len(texts) > self.max_ok:
+                raise PayloadTooLarge("batch too large")
+            return [self._vector(text) for text in texts]
+        finally:
+            self.in_flight -= 1
+
+
+class DownEmbedding(FlakyEmbedding):
+    """模拟 embedding 服务不可用：每次请求都连接失败"""
+
+    async def _aget_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.batch_sizes.append(len(texts))
+        raise ConnectionError("connection refused")
+
+
+def run_batch_embedding_test():
+    assert estimate_tokens("你好世界") == 4
+    assert estimate_tokens("abcdefgh") == 2
+
+    model = FlakyEmbedding(model_name="bge-m3")
+    client = BatchEmbeddingClient(model, max_batch_tokens=10, max_batch_size=4, max_concurrent=2, max_retries=0)
+
+    # 按 token 预算切分: 每条 "x" * 12 约 3 token，10 token 以内最多 3 条
+    texts = ["x" * 12] * 7
+    assert client.plan_batches(texts) == [[0, 1, 2], [3, 4, 5], [6]]
+    # 超长单条文本独占一个批次
+    assert client.plan_batches(["y" * 100, "z"]) == [[0], [1]]
+
+    # 3 条的批次失败后二分重试，结果仍与输入顺序一致
+    texts = [chr(ord("a") + i) * (i + 1) for i in range(7)]
+    embeddings = asyncio.run(client.embed_texts(texts))
+    assert embeddings == [[float(i + 1), 1.0] for i in range(7)], embeddings
+    assert 3 in model.batch_sizes and model.peak <= 2, (model.batch_sizes, model.peak)
+
+    # 已有 embedding 的节点不会重新计算
+    nodes = [TextNode(text="hello"), TextNode(text="world!", embedding=[0.0, 0.0])]
+    model.batch_sizes.clear()
+    client.embed_nodes_sync(nodes)
+    assert nodes[0].embedding == [5.0, 1.0] and nodes[1].embedding == [0.0, 0.0]
+    assert model.batch_sizes == [1], model.batch_sizes
+
+    # 事件循环中的调用方把同步版本放到工作线程执行，不会与运行中的事件循环冲突
+    threaded = [TextNode(text="abc")]
+    asyncio.run(asyncio.to_thread(client.embed_nodes_sync, threaded))
+    assert threaded[0].embedding is not None
+
+    # 服务不可用时不二分，整批退避重试 max_retries 次后抛出
+    down = DownEmbedding(model_name="bge-m3", batch_sizes=[])
+    down_client = BatchEmbeddingClient(down, max_batch_tokens=1000, max_batch_size=64, max_retries=1)
+    try:
+        asyncio.run(down_client.embed_texts(["text"] * 16))
+        raise AssertionError("expected ConnectionError")
+    except ConnectionError:
+        pass
+    assert down.batch_sizes == [16, 16], down.batch_sizes
+
+    print("BatchEmbeddingClient test passed")
+
+
+if __name__ == "__main__":
+    run_batch_embedding_test()
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.download_index import DownloadIndex, file_sha256
+
+
+def run_download_index_test():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        downloads = os.path.join(tmp_dir, "downloads")
+        os.makedirs(downloads)
+        index = DownloadIndex(os.path.join(tmp_dir, "index.sqlite3"))
+
+        pdf_path = os.path.join(downloads, "openalex_attention.pdf")
+        with open(pdf_path, "wb") as f:
+            f.write(b"%PDF-1.7 attention")
+        index.record(pdf_path, doi="10.48550/arXiv.1706.03762", url="https://arxiv.org/pdf/1706.03762", source="openalex")
+
+        # DOI 前缀 / 大小写、URL 末尾斜杠不影响命中；按目录限定
+        assert index.lookup(doi="https://doi.org/10.48550/ARXIV.1706.03762", directory=downloads) == pdf_path
+        assert index.lookup(url="https://arxiv.org/pdf/1706.03762/") == pdf_path
+        assert index.lookup(doi="10.48550/arXiv.1706.03762", directory=tmp_dir) is None
+        assert index.lookup(doi="10.1000/unknown", url=None) is None
+        assert index.lookup_by_hash(file_sha256(pdf_path)) == pdf_path
+        assert index.get_stats() == {"entries": 1, "bytes": os.path.getsize(pdf_path)}
+
+        # 文件被删除（例如被去重删除）后，记录自动失效
+        os.remove(pdf_path)
+        assert index.lookup(doi="10.48550/arXiv.1706.03762") is None
+        assert index.get_stats()["entries"] == 0
+
+        # 进程重启后仍可命中
+        md_path = os.path.join(downloads, "tavily_page.md")
+        with open(md_path, "w", encoding="utf-8") as f:
+            f.write("# page")
+        index.record(md_path, url="https://example.org/page?utm_source=x", source="tavily")
+        index.close()
+        reopened = DownloadIndex(os.path.join(tmp_dir, "index.sqlite3"))
+        assert reopened.lookup(url="https://EXAMPLE.org/page", directory=downloads) == md_path
+        reopened.close()
+
+        # 索引建立之前已存在的文件：一次性补登记后按文件名中的 DOI 片段命中，不覆盖已有记录
+        legacy = os.path.join(tmp_dir, "legacy")
+        os.makedirs(legacy)
+        legacy_pdf = os.path.join(legacy, "semantic_scholar_10.1145_3292500.pdf")
+        with open(legacy_pdf, "wb") as f:
+            f.write(b"%PDF-1.7 legacy")
+        recorded_pdf = os.path.join(legacy, "10.1000_known.pdf")
+        with open(recorded_pdf, "wb") as f:
+            f.write(b"%PDF-1.7 known")
+        index = DownloadIndex(os.path.join(tmp_dir, "index.sqlite3"))
+        index.record(recorded_pdf, doi="10.1000/known")
+        assert index.lookup_by_filename("10.1145_3292500", directory=legacy) is None
+        assert index.backfill_directory(legacy) == 1
+        assert index.backfill_directory(legacy) == 0
+        assert index.lookup_by_filename("10.1145_3292500", directory=legacy) == legacy_pdf
+        assert index.lookup_by_filename("10.1145_3292500", directory=downloads) is None
+        assert index.lookup(doi="10.1000/known", directory=legacy) == recorded_pdf
+        index.close()
+
+        # 扫描记录持久化，新进程不再重复扫描
+        late_pdf = os.path.join(legacy, "10.2000_late.pdf")
+        with open(late_pdf, "wb") as f:
+            f.write(b"%PDF-1.7 late")
+        reopened = DownloadIndex(os.path.join(tmp_dir, "index.sqlite3"))
+        assert reopened.backfill_directory(legacy) == 0
+        assert reopened.lookup_by_filename("10.2000_late", directory=legacy) is None
+        reopened.close()
+
+    print("DownloadIndex test passed")
+
+
+if __name__ == "__main__":
+    run_download_index_test()
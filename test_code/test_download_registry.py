@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.download_registry import SingleFlightRegistry, atomic_open, canonical_download_key
+
+
+async def run_download_registry_test():
+    # 规范化键：DOI 前缀与大小写、URL 主机大小写、末尾斜杠、跟踪参数、片段不影响
+    assert canonical_download_key(doi="https://doi.org/10.1000/ABC") == canonical_download_key(doi="10.1000/abc")
+    assert canonical_download_key(url="https://Example.org/a/?b=1&utm_source=x#top") == \
+        canonical_download_key(url="https://example.org/a?b=1")
+    assert canonical_download_key(url="https://example.org/a", doi="10.1/x") == "doi:10.1/x"
+    assert canonical_download_key() is None
+
+    registry = SingleFlightRegistry()
+    calls = []
+
+    async def fetch(name):
+        calls.append(name)
+        await asyncio.sleep(0.1)
+        return f"/downloads/{name}.pdf"
+
+    # 并发的相同请求只下载一次，全部拿到同一个结果
+    results = await asyncio.gather(*[registry.arun("doi:10.1/x", fetch, "x") for _ in range(5)])
+    assert calls == ["x"] and set(results) == {"/downloads/x.pdf"}
+    assert registry.get_stats() == {"leaders": 1, "joined": 4, "in_flight": 0}
+
+    # 负责者被取消后，等待者重新竞争并完成下载
+    leader = asyncio.create_task(registry.arun("doi:10.1/y", fetch, "y"))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(registry.arun("doi:10.1/y", fetch, "y"))
+    await asyncio.sleep(0.01)
+    leader.cancel()
+    assert await waiter == "/downloads/y.pdf"
+    assert calls == ["x", "y", "y"]
+
+    # 同步调用方（线程池中的搜索器）同样合并
+    counter = []
+    lock = threading.Lock()
+
+    def save(path):
+        with lock:
+            counter.append(path)
+        time.sleep(0.1)
+        return path
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        paths = list(pool.map(lambda _: registry.run("url:https://a.org/p", save, "/p.md"), range(4)))
+    assert counter == ["/p.md"] and set(paths) == {"/p.md"}
+
+    # 原子写入：失败时不留下目标文件和临时文件
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        target = os.path.join(tmp_dir, "paper.pdf")
+        try:
+            with atomic_open(target, "wb") as f:
+                f.write(b"%PDF-partial")
+                raise IOError("connection reset")
+        except IOError:
+            pass
+        assert os.listdir(tmp_dir) == []
+        with atomic_open(target, "wb") as f:
+            f.write(b"%PDF-1.7")
+        assert os.listdir(tmp_dir) == ["paper.pdf"]
+
+    print("Download single-flight test passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_download_registry_test())
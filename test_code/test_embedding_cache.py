@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+import tempfile
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llama_index.core.base.embeddings.base import BaseEmbedding
+
+from core.rag.embedding_cache import CachedEmbedding, EmbeddingCacheStore
+
+
+class CountingEmbedding(BaseEmbedding):
+    """按文本长度生成向量，并记录真正发给“服务端”的文本"""
+
+    requested: List[str] = []
+
+    def _vector(self, text: str) -> List[float]:
+        return [float(len(text)), 1.0, 0.5]
+
+    def _get_query_embedding(self, query: str) -> List[float]:
+        self.requested.append(query)
+        return self._vector(query)
+
+    async def _aget_query_embedding(self, query: str) -> List[float]:
+        return self._get_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> List[float]:
+        self.requested.append(text)
+        return self._vector(text)
+
+
+def run_embedding_cache_test():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        inner = CountingEmbedding(model_name="bge-m3", embed_batch_size=2)
+        store = EmbeddingCacheStore(model_name="bge-m3", cache_dir=tmp_dir, capacity=3)
+        embedding = CachedEmbedding(embed_model=inner, store=store)
+        flushes = []
+        store_flush = store.flush
+        store.flush = lambda: (flushes.append(True), store_flush())
+
+        first = embedding.get_text_embedding_batch(["a", "bb", "ccc"])
+        assert first == [[1.0, 1.0, 0.5], [2.0, 1.0, 0.5], [3.0, 1.0, 0.5]]
+        assert inner.requested == ["a", "bb", "ccc"]
+
+        # 重复文本全部命中缓存，只有新文本会请求底层模型
+        second = embedding.get_text_embedding_batch(["bb", "a", "dddd"])
+        assert second == [[2.0, 1.0, 0.5], [1.0, 1.0, 0.5], [4.0, 1.0, 0.5]]
+        assert inner.requested == ["a", "bb", "ccc", "dddd"], inner.requested
+
+        # 容量为 3，写入 dddd 时淘汰最久未访问的 ccc
+        stats = store.get_stats()
+        assert stats["entries"] == 3 and stats["hits"] == 2, stats
+
+        # query 与 text 使用独立的键空间，异步接口同样走缓存
+        asyncio.run(embedding.aget_query_embedding("a"))
+        asyncio.run(embedding.aget_query_embedding("a"))
+        assert inner.requested.count("a") == 2, inner.requested
+        # 每批新写入的向量都立即刷盘，全部命中缓存的批次不刷盘
+        assert len(flushes) == 4, flushes
+
+        # 重新打开缓存目录，内容可恢复；写入 query 时淘汰了最久未访问的 bb
+        reopened = EmbeddingCacheStore(model_name="bge-m3", cache_dir=tmp_dir, capacity=3)
+        keys = [reopened.make_key("text", text) for text in ["bb", "dddd", "a"]]
+        vectors = reopened.get_many(keys)
+        assert vectors[0] is None, "evicted entry should stay evicted"
+        assert vectors[1] == [4.0, 1.0, 0.5]
+        assert vectors[2] == [1.0, 1.0, 0.5]
+
+        # 恢复后的 LRU 顺序：dddd、a 刚被访问，下一次写入淘汰 query 条目
+        reopened.put_many([reopened.make_key("text", "eeeee")], [[5.0, 1.0, 0.5]])
+        assert reopened.get_many([reopened.make_key("query", "a")]) == [None]
+
+    print("EmbeddingCache test passed")
+
+
+if __name__ == "__main__":
+    run_embedding_cache_test()
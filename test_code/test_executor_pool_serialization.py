@@ -2,6 +2,7 @@
 import asyncio
 import os
 import sys
+import time
 from typing import Any, Dict, cast
 
 from psycopg import AsyncConnection
@@ -20,18 +21,20 @@ class FakeAgent(ExecutorAgent):
         super().__init__(pool=None, modelname=cast(Any, Config.LLM_EXECUTOR))
         self.agent_id = agent_id
         self.tracker = tracker
+        self.handled = []
 
     async def _ensure_initialized(self):
         return None
 
-    async def ainvoke(self, query, thread_id, user_id, sub_url_pool, user_query):
+    async def ainvoke(self, query, thread_id, user_id, sub_url_pool, user_query, url_registry=None):
         current = self.tracker["current"].get(self.agent_id, 0) + 1
         self.tracker["current"][self.agent_id] = current
         self.tracker["max"][self.agent_id] = max(
             self.tracker["max"].get(self.agent_id, 0),
             current,
         )
-        await asyncio.sleep(0.05)
+        self.handled.append(query)
+        await asyncio.sleep(0.3 if query.startswith("slow") else 0.05)
         self.tracker["current"][self.agent_id] -= 1
         return {
             "sub_url_pool": [f"url-{query}"],
@@ -52,10 +55,8 @@ class TestExecutorAgentPool(ExecutorAgentPool):
 
     def _initialize_agents(self):
         self.agents = []
-        self.agent_locks = []
         for i in range(self.pool_size):
             self.agents.append(cast(ExecutorAgent, FakeAgent(i, self.tracker)))
-            self.agent_locks.append(asyncio.Lock())
 
 
 async def run_serialization_test():
@@ -76,8 +77,49 @@ async def run_serialization_test():
     for agent_id, max_concurrent in tracker["max"].items():
         assert max_concurrent <= 1, f"agent {agent_id} ran concurrently"
 
+    assert all(result["queue_wait_seconds"] is not None for result in results)
+
     print("ExecutorAgentPool serialization test passed")
 
 
+async def run_work_stealing_test():
+    tracker = {"current": {}, "max": {}}
+    pool = TestExecutorAgentPool(pool_size=2, tracker=tracker)
+
+    # 轮询分配时 q2、q4 会排在慢问题之后（约 0.6s）；共享队列下由空闲 Agent 领取
+    questions = ["slow0", "q1", "q2", "q3", "q4"]
+    started = time.monotonic()
+    results, _ = await pool.execute_questions(
+        questions=questions,
+        user_query="test",
+        base_thread_id="thread",
+        user_id="user",
+        url_pool=[],
+    )
+    elapsed = time.monotonic() - started
+    assert [r["downloaded_papers"][0]["id"] for r in results] == questions
+    assert elapsed < 0.45, elapsed
+    assert results[0]["queue_wait_seconds"] < 0.05
+    assert results[4]["queue_wait_seconds"] >= 0.1
+
+    # 优先级：数值小的先被领取
+    for agent in pool.agents:
+        cast(FakeAgent, agent).handled.clear()
+    await pool.execute_questions(
+        questions=["a", "b", "c", "d"],
+        user_query="test",
+        base_thread_id="thread",
+        user_id="user",
+        url_pool=[],
+        priorities=[5, 5, 0, 1],
+    )
+    first_picked = {cast(FakeAgent, agent).handled[0] for agent in pool.agents}
+    assert first_picked == {"c", "d"}, first_picked
+
+    await pool.cleanup()
+    print("ExecutorAgentPool work stealing test passed")
+
+
 if __name__ == "__main__":
     asyncio.run(run_serialization_test())
+    asyncio.run(run_work_stealing_test())
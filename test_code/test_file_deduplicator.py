@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import random
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from core.file_deduplicator import FileDeduplicator
+from core.fingerprint_index import FingerprintIndex
+
+
+def _random_document(rng: random.Random, vocabulary, length: int = 300) -> str:
+    return " ".join(rng.choice(vocabulary) for _ in range(length))
+
+
+def _brute_force(deduplicator: FileDeduplicator, paths):
+    """原始 N×N 方案的结果，用于对照"""
+    matrix = deduplicator._tfidf_matrix(deduplicator._get_fingerprints(paths))
+    similarity = (matrix @ matrix.T).toarray()
+    keep = np.ones(len(paths), dtype=bool)
+    for i in range(len(paths)):
+        if keep[i]:
+            later = np.arange(len(paths)) > i
+            keep[later & (similarity[i] >= deduplicator.similarity_threshold)] = False
+    return [path for path, flag in zip(paths, keep) if flag]
+
+
+def run_file_deduplicator_test():
+    rng = random.Random(7)
+    vocabulary = [f"word{i}" for i in range(2000)]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = []
+        originals = []
+        for i in range(60):
+            text = _random_document(rng, vocabulary)
+            originals.append(text)
+            path = os.path.join(tmp_dir, f"doc_{i:03d}.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            paths.append(path)
+
+        # 近似重复：改动少量词；完全重复：原样复制
+        for i in range(0, 60, 6):
+            words = originals[i].split()
+            for pos in rng.sample(range(len(words)), 10):
+                words[pos] = rng.choice(vocabulary)
+            path = os.path.join(tmp_dir, f"near_{i:03d}.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(" ".join(words))
+            paths.append(path)
+        exact_path = os.path.join(tmp_dir, "exact_copy.md")
+        with open(exact_path, "w", encoding="utf-8") as f:
+            f.write(originals[3])
+        paths.append(exact_path)
+
+        # batch_size 很小时也不会漏掉跨批次的重复
+        index_path = os.path.join(tmp_dir, "fingerprints.sqlite3")
+        deduplicator = FileDeduplicator(
+            similarity_threshold=0.8,
+            batch_size=10,
+            fingerprint_index=FingerprintIndex(index_path)
+        )
+        unique_files, duplicate_files = deduplicator.deduplicate_file_list(paths)
+
+        assert unique_files == paths[:60], [os.path.basename(p) for p in unique_files]
+        assert len(duplicate_files) == 11
+        assert unique_files == _brute_force(deduplicator, paths)
+
+        # 异步接口在进程池中执行，结果一致且去重期间事件循环保持响应
+        async def run_async():
+            ticks = 0
+            task = asyncio.create_task(deduplicator.adeduplicate_file_list(paths))
+            while not task.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+            return await task, ticks
+
+        (async_unique, async_duplicates), ticks = asyncio.run(run_async())
+        assert (async_unique, async_duplicates) == (unique_files, duplicate_files)
+        assert ticks > 1, ticks
+
+        # 先到先得：参考集合中的文件优先保留
+        kept, removed = deduplicator.deduplicate_against_reference(paths[60:61], paths[:1] + paths[1:3])
+        assert kept == paths[1:3] and removed == paths[:1], (kept, removed)
+
+        # 新的去重器（模拟下一次查询）复用持久化指纹：参考集合不再读取文件
+        reader = FileDeduplicator(similarity_threshold=0.8, fingerprint_index=FingerprintIndex(index_path))
+        read_files = []
+        original_read = reader._read_file_content
+        reader._read_file_content = lambda path: read_files.append(path) or original_read(path)
+        new_path = os.path.join(tmp_dir, "new_doc.md")
+        with open(new_path, "w", encoding="utf-8") as f:
+            f.write(originals[5])
+        kept, removed = reader.deduplicate_against_reference(paths[:60], [new_path])
+        assert kept == [] and removed == [new_path]
+        assert read_files == [new_path], read_files
+
+        # 文件被修改（mtime / 大小变化）后重新计算指纹
+        with open(paths[0], "a", encoding="utf-8") as f:
+            f.write(" appended")
+        read_files.clear()
+        reader.deduplicate_file_list(paths[:2])
+        assert read_files == [paths[0]], read_files
+
+    print("FileDeduplicator MinHash/LSH + fingerprint index + process pool test passed")
+
+
+if __name__ == "__main__":
+    run_file_deduplicator_test()
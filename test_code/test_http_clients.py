@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import Config
+from core.http_clients import close_shared_async_clients, get_download_client, get_host_client
+
+
+async def run_http_clients_test():
+    # 同一主机的不同地址复用同一个客户端，不同主机各自独立
+    search = get_host_client("https://api.openalex.org/works?search=x")
+    assert get_host_client("https://api.openalex.org") is search
+    assert str(search.base_url).rstrip("/") == "https://api.openalex.org"
+    assert get_host_client("https://eutils.ncbi.nlm.nih.gov/entrez/eutils") is not search
+
+    # 默认请求头在首次创建时生效
+    wiki = get_host_client("https://en.wikipedia.org/w/api.php", headers={"User-Agent": "widthresearch-test"})
+    assert wiki.headers["User-Agent"] == "widthresearch-test"
+
+    # 下载客户端不绑定主机，全局共用一个
+    download = get_download_client()
+    assert get_download_client(timeout=15.0) is download
+    assert download not in (search, wiki)
+
+    # max_connections 限制整个客户端，下载客户端使用单独的更大上限
+    assert download._transport._pool._max_connections == Config.DOWNLOAD_POOL_MAX_CONNECTIONS
+    assert search._transport._pool._max_connections == Config.HTTP_POOL_MAX_CONNECTIONS
+
+    await close_shared_async_clients()
+    assert search.is_closed and download.is_closed
+    assert get_host_client("https://api.openalex.org") is not search
+    await close_shared_async_clients()
+
+    print("Shared HTTP clients test passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_http_clients_test())
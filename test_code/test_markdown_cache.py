@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.rag.markdown_cache import MarkdownCache
+
+
+def write_pdf(directory: str, name: str, payload: bytes) -> str:
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n" + payload)
+    return path
+
+
+def run_markdown_cache_test():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cache_dir = os.path.join(tmp_dir, "cache")
+        cache = MarkdownCache(cache_dir=cache_dir, max_bytes=64, parser_settings={"backend": "vlm-http-client"})
+
+        pdf_a = write_pdf(tmp_dir, "10.1000_a.pdf", b"paper a")
+        pdf_a_copy = write_pdf(tmp_dir, "10.1000_a_copy.pdf", b"paper a")
+        pdf_b = write_pdf(tmp_dir, "10.1000_b.pdf", b"paper b")
+
+        key_a = cache.make_key(pdf_a)
+        assert key_a == cache.make_key(pdf_a_copy), "same content should share a cache key"
+        assert key_a != cache.make_key(pdf_b), "different content should not share a cache key"
+
+        other_settings = MarkdownCache(cache_dir=cache_dir, max_bytes=64, parser_settings={"backend": "pipeline"})
+        assert key_a != other_settings.make_key(pdf_a), "parser settings should be part of the key"
+
+        assert cache.get(key_a) is None
+        cache.put(key_a, "# A\n" + "a" * 30)
+        assert cache.get(key_a).startswith("# A")
+
+        # 重新打开缓存目录，条目应可恢复
+        reopened = MarkdownCache(cache_dir=cache_dir, max_bytes=64, parser_settings={"backend": "vlm-http-client"})
+        assert reopened.get(key_a).startswith("# A")
+
+        # 写入 B 后超过上限，最久未访问的 A 被淘汰
+        key_b = cache.make_key(pdf_b)
+        cache.put(key_b, "# B\n" + "b" * 40)
+        assert cache.get(key_a) is None, "LRU entry should be evicted"
+        assert cache.get(key_b).startswith("# B")
+
+        stats = cache.get_stats()
+        assert stats["hits"] == 2 and stats["misses"] == 2, stats
+        assert stats["total_bytes"] <= stats["max_bytes"], stats
+
+    print("MarkdownCache test passed")
+
+
+if __name__ == "__main__":
+    run_markdown_cache_test()
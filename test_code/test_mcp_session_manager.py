@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def serve():
+    """测试用 stdio MCP 服务器：返回服务器进程号，或让进程退出以模拟崩溃"""
+    from mcp.server.fastmcp import FastMCP
+    from mcp.types import ToolAnnotations
+
+    server = FastMCP("pid-server")
+
+    @server.tool()
+    async def server_pid(delay: float = 0.0) -> str:
+        await asyncio.sleep(delay)
+        return str(os.getpid())
+
+    @server.tool(annotations=ToolAnnotations(idempotentHint=False))
+    def crash() -> str:
+        with open(os.environ["CRASH_LOG"], "a") as f:
+            f.write("crash\n")
+        os._exit(1)
+
+    @server.tool()
+    def fail() -> str:
+        raise ValueError("bad arguments")
+
+    server.run(transport="stdio")
+
+
+async def run_mcp_session_manager_test():
+    from langchain_core.tools import ToolException
+    from core.mcp.session_manager import (
+        register_mcp_server, get_mcp_tools, get_mcp_session_stats, close_mcp_sessions
+    )
+
+    crash_log = os.path.join(tempfile.mkdtemp(), "crash.log")
+    register_mcp_server("pid-server", {
+        "command": sys.executable,
+        "args": [os.path.abspath(__file__), "--serve"],
+        "env": {**os.environ, "CRASH_LOG": crash_log},
+        "transport": "stdio",
+    })
+    tools = {tool.name: tool for tool in await get_mcp_tools("pid-server")}
+    assert set(tools) == {"server_pid", "crash", "fail"}, tools
+
+    # 多个调用方并发调用，复用同一个服务器进程
+    pids = await asyncio.gather(*[tools["server_pid"].ainvoke({"delay": 0.2}) for _ in range(8)])
+    assert len(set(pids)) == 1, pids
+    assert (await get_mcp_tools("pid-server"))[0] is tools["server_pid"]
+
+    # 工具自身的错误不重启共享会话
+    try:
+        await tools["fail"].ainvoke({})
+        raise AssertionError("fail tool should raise")
+    except ToolException:
+        pass
+    assert get_mcp_session_stats()["pid-server"]["generation"] == 1
+
+    # 服务器进程退出后自动重启会话；crash 标注为非幂等，不会在重启后重复执行
+    try:
+        await tools["crash"].ainvoke({})
+        raise AssertionError("crash tool should raise")
+    except ToolException:
+        raise
+    except Exception:
+        pass
+    new_pid = await tools["server_pid"].ainvoke({})
+    assert new_pid != pids[0]
+    with open(crash_log) as f:
+        assert f.read().count("crash") == 1
+    stats = get_mcp_session_stats()["pid-server"]
+    assert stats["restarts"] == 1 and stats["generation"] == 2 and stats["in_flight"] == 0, stats
+
+    await close_mcp_sessions()
+    assert get_mcp_session_stats() == {}
+    print("MCP shared session test passed")
+
+
+if __name__ == "__main__":
+    if "--serve" in sys.argv:
+        serve()
+    else:
+        asyncio.run(run_mcp_session_manager_test())
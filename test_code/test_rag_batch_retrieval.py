@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import math
+import os
+import sys
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llama_index.core.schema import NodeWithScore, TextNode
+from llama_index.core.vector_stores.utils import node_to_metadata_dict
+
+import core.rag.rag_postprocess_module as rag_postprocess_module
+from core.rag.rag_postprocess_module import RAGPostProcessModule
+
+
+class FakeChromaVectorStore:
+    def __init__(self, collection):
+        self.client = collection
+
+
+class FakeCollection:
+    """记录查询次数，每个查询向量返回 2 个节点"""
+
+    def __init__(self):
+        self.calls: List[int] = []
+        self.get_calls: List[List[str]] = []
+        self.stored = {}
+
+    def query(self, query_embeddings, n_results, include):
+        self.calls.append(len(query_embeddings))
+        ids, documents, metadatas, distances, embeddings = [], [], [], [], []
+        for q_idx, _ in enumerate(query_embeddings):
+            nodes = [TextNode(text=f"q{q_idx}-doc{k}", id_=f"q{q_idx}-{k}") for k in range(2)]
+            ids.append([node.node_id for node in nodes])
+            documents.append([node.text for node in nodes])
+            metadatas.append([node_to_metadata_dict(node) for node in nodes])
+            distances.append([0.1 * (k + 1) for k in range(2)])
+            # 互相正交的 embedding：语义去重不应删除任何节点
+            embeddings.append([[1.0 if d == q_idx * 2 + k else 0.0 for d in range(16)] for k in range(2)])
+        result = {"ids": ids, "documents": documents, "metadatas": metadatas, "distances": distances}
+        if "embeddings" in include:
+            result["embeddings"] = embeddings
+        return result
+
+    def get(self, ids, include):
+        self.get_calls.append(list(ids))
+        found = [node_id for node_id in ids if node_id in self.stored]
+        return {"ids": found, "embeddings": [self.stored[node_id] for node_id in found]}
+
+
+class FakeIndex:
+    def __init__(self, collection):
+        self.vector_store = FakeChromaVectorStore(collection)
+
+
+class FakeBatchEmbedder:
+    def __init__(self):
+        self.calls = 0
+
+    async def embed_texts(self, texts):
+        self.calls += 1
+        return [[float(len(text))] for text in texts]
+
+
+class FakeRetriever:
+    def retrieve(self, question):
+        raise AssertionError("batch path should not use the per-question retriever")
+
+
+class FakePostprocessor:
+    """记录 rerank 并发峰值"""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.peak = 0
+
+    async def _async_postprocess_nodes(self, nodes, query_bundle):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        return [NodeWithScore(node=n.node, score=0.9) for n in nodes]
+
+
+def run_batch_retrieval_test():
+    rag_postprocess_module.ChromaVectorStore = FakeChromaVectorStore
+    collection = FakeCollection()
+    embedder = FakeBatchEmbedder()
+    postprocessor = FakePostprocessor()
+    module = RAGPostProcessModule(
+        vector_store=FakeIndex(collection),
+        retriever=FakeRetriever(),
+        node_postprocessor=postprocessor,
+        top_k=2,
+        batch_embedder=embedder,
+        rerank_concurrency=2,
+    )
+
+    questions = [f"question {i}" for i in range(5)]
+    retrieved = asyncio.run(module._retrieve_questions(questions))
+    assert embedder.calls == 1 and collection.calls == [5], (embedder.calls, collection.calls)
+    assert [n.node.get_content() for n in retrieved[3]] == ["q3-doc0", "q3-doc1"]
+    assert math.isclose(retrieved[3][0].score, math.exp(-0.1))
+
+    nodes = asyncio.run(module.retrieve_postprecess(questions))
+    assert len(nodes) == 10, len(nodes)
+    assert postprocessor.peak == 2, postprocessor.peak
+    assert all(nws.node.embedding is None for nws in nodes), "embedding should be dropped after dedup"
+
+    # 语义去重：近似重复的 embedding 只保留高分节点；缺失的 embedding 按 id 从 Chroma 补取
+    collection.stored = {"c": [0.0, 1.0, 0.0]}
+    candidates = [
+        NodeWithScore(node=TextNode(text="a", id_="a", embedding=[1.0, 0.0, 0.0]), score=0.9),
+        NodeWithScore(node=TextNode(text="b", id_="b", embedding=[0.99, 0.05, 0.0]), score=0.8),
+        NodeWithScore(node=TextNode(text="c", id_="c"), score=0.7),
+    ]
+    deduped = asyncio.run(module._deduplicate_by_embedding(candidates))
+    assert [nws.node.node_id for nws in deduped] == ["a", "c"], deduped
+    assert collection.get_calls == [["c"]], collection.get_calls
+
+    # 无法取得 embedding 时返回 None，由调用方回退到 TF-IDF
+    missing = [NodeWithScore(node=TextNode(text=t, id_=t), score=0.5) for t in ("x", "y")]
+    assert asyncio.run(module._deduplicate_by_embedding(missing)) is None
+
+    # 回退路径（维度不一致、单个节点）同样清除节点上的 embedding
+    mismatched = [
+        NodeWithScore(node=TextNode(text="d", id_="d", embedding=[1.0, 0.0]), score=0.9),
+        NodeWithScore(node=TextNode(text="e", id_="e", embedding=[1.0, 0.0, 0.0]), score=0.8),
+    ]
+    assert asyncio.run(module._deduplicate_by_embedding(mismatched)) is None
+    assert all(nws.node.embedding is None for nws in mismatched)
+    single = [NodeWithScore(node=TextNode(text="f", id_="f", embedding=[1.0]), score=0.9)]
+    assert asyncio.run(module._deduplicate_by_embedding(single)) == single
+    assert single[0].node.embedding is None
+
+    print("RAG batch retrieval test passed")
+
+
+if __name__ == "__main__":
+    run_batch_retrieval_test()
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+import time
+from email.utils import formatdate
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import Config
+from core.rate_limiter import (
+    HostRateLimiter, RateLimitedAsyncClient, get_rate_limiter, get_rate_limiter_stats, parse_retry_after
+)
+
+responses = {"/throttled": [429, 200], "/banned": [429]}
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    queue = responses.get(request.url.path)
+    status = queue.pop(0) if queue and len(queue) > 1 else (queue[0] if queue else 200)
+    if status == 429:
+        retry_after = "3600" if request.url.path == "/banned" else "0.3"
+        return httpx.Response(429, headers={"Retry-After": retry_after})
+    return httpx.Response(200, json={"ok": True})
+
+
+async def run_rate_limiter_test():
+    # Retry-After 支持秒数与 HTTP 日期
+    assert parse_retry_after("5") == 5.0
+    assert 55 < parse_retry_after(formatdate(time.time() + 60, usegmt=True)) <= 60
+    assert parse_retry_after("soon") is None
+
+    # 令牌桶：容量 1、20 次/秒，5 个并发请求约 0.2 秒放行完
+    limiter = HostRateLimiter("bucket.test", rate=20.0, burst=1)
+    begin = time.monotonic()
+    await asyncio.gather(*[limiter.acquire() for _ in range(5)])
+    assert 0.15 < time.monotonic() - begin < 0.5
+    assert limiter.get_stats()["queued"] == 4
+
+    # 按主机名后缀匹配，各语言的 Wikipedia 共用一个限速器；未配置的主机不限速
+    assert get_rate_limiter("https://en.wikipedia.org/w/api.php") is get_rate_limiter("zh.wikipedia.org")
+    assert get_rate_limiter("unknown.example.org").rate is None
+
+    Config.RATE_LIMIT_HOSTS = {**Config.RATE_LIMIT_HOSTS, "api.test.org": 50.0}
+    async with RateLimitedAsyncClient(base_url="https://api.test.org", transport=httpx.MockTransport(handler)) as client:
+        # 429 后按 Retry-After 等待并自动重试，同时降速
+        begin = time.monotonic()
+        response = await client.get("/throttled")
+        assert response.status_code == 200 and time.monotonic() - begin >= 0.3
+        stats = get_rate_limiter_stats()["api.test.org"]
+        assert stats["throttled"] == 1 and stats["queue_time_max"] >= 0.25
+        assert stats["rate"] < 50.0
+
+        # 成功响应逐步恢复速率
+        for _ in range(20):
+            await client.get("/ok")
+        assert get_rate_limiter("api.test.org").rate == 50.0
+
+        # Retry-After 超过上限时不重试，直接返回 429
+        response = await client.get("/banned")
+        assert response.status_code == 429
+        assert get_rate_limiter_stats()["api.test.org"]["throttled"] == 2
+
+    print("Rate limiter test passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_rate_limiter_test())
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+import tempfile
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.rag.rerank_cache import RerankScoreCache
+from core.rag.reranker import BGEReranker
+
+
+class CountingReranker(BGEReranker):
+    """不访问服务端，分数 = 文档长度 / 100，记录真正发往服务端的文档"""
+
+    requested: List[List[str]]
+
+    async def _rerank_backend(self, query, documents):
+        self.requested.append(list(documents))
+        results = [{"index": i, "score": len(doc) / 100} for i, doc in enumerate(documents)]
+        return sorted(results, key=lambda x: x["score"], reverse=True)
+
+
+def run_rerank_cache_test():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "rerank.sqlite3")
+        cache = RerankScoreCache(capacity=2, db_path=db_path)
+        reranker = CountingReranker(base_url="http://localhost:1", score_cache=cache)
+        reranker.requested = []
+
+        docs = ["a" * 10, "b" * 30, "c" * 20]
+        first = asyncio.run(reranker.rerank_async("q", docs))
+        assert [item["index"] for item in first] == [1, 2, 0]
+
+        # 重复请求只发送未命中的文档，下标映射回原始位置
+        second = asyncio.run(reranker.rerank_async("q", ["d" * 40] + docs))
+        assert reranker.requested[-1] == ["d" * 40], reranker.requested
+        assert [item["index"] for item in second] == [0, 2, 3, 1], second
+
+        # 不同 query 不共享分数
+        asyncio.run(reranker.rerank_async("other", docs[:1]))
+        assert reranker.requested[-1] == docs[:1]
+
+        # 内存 LRU 只有 2 条，其余从 SQLite 命中
+        assert cache.get_stats()["entries"] == 2
+        reopened = RerankScoreCache(capacity=10, db_path=db_path)
+        assert reopened.get_many(reranker.model_name, "q", docs) == [0.1, 0.3, 0.2]
+        cache.close()
+        reopened.close()
+
+    print("RerankScoreCache test passed")
+
+
+if __name__ == "__main__":
+    run_rerank_cache_test()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.rag.reranker import BGEReranker
+
+
+class ChunkRecordingReranker(BGEReranker):
+    """不访问服务端：分数 = 文档编号 / 100，记录每个请求的大小和并发峰值"""
+
+    def __init__(self, fail_marker: str = "", **kwargs):
+        super().__init__(**kwargs)
+        self.fail_marker = fail_marker
+        self.request_sizes = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def _rerank_backend(self, query, documents):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            self.request_sizes.append(len(documents))
+            if self.fail_marker and any(self.fail_marker in doc for doc in documents):
+                raise RuntimeError("payload too large")
+            results = [{"index": i, "score": int(doc.split()[-1]) / 100} for i, doc in enumerate(documents)]
+            return sorted(results, key=lambda x: x["score"], reverse=True)
+        finally:
+            self.in_flight -= 1
+
+
+def run_rerank_chunking_test():
+    docs = [f"doc {i}" for i in range(25)]
+
+    reranker = ChunkRecordingReranker(base_url="http://localhost:1", batch_size=4, max_concurrent=2)
+    reranker.score_cache = None
+    results = asyncio.run(reranker.rerank_async("q", docs))
+    assert sorted(reranker.request_sizes) == [1, 4, 4, 4, 4, 4, 4], reranker.request_sizes
+    assert reranker.peak == 2, reranker.peak
+    # 全局下标映射正确，并按分数合并排序
+    assert [item["index"] for item in results] == list(range(24, -1, -1))
+    assert results[0]["score"] == 0.24
+
+    # 单个分块失败只影响该块的文档：这些文档没有分数，从结果中剔除而不是使用编造的默认分数
+    failing = ChunkRecordingReranker(fail_marker="doc 5", base_url="http://localhost:1", batch_size=4)
+    failing.score_cache = None
+    results = asyncio.run(failing.rerank_async("q", docs[:12]))
+    scores = {item["index"]: item["score"] for item in results}
+    assert not set(range(4, 8)) & set(scores), scores
+    assert scores[11] == 0.11 and scores[0] == 0.0 and len(scores) == 8
+
+    # 全部分块失败时返回空结果
+    all_failing = ChunkRecordingReranker(fail_marker="doc", base_url="http://localhost:1", batch_size=4)
+    all_failing.score_cache = None
+    assert asyncio.run(all_failing.rerank_async("q", docs[:12])) == []
+
+    print("BGEReranker chunking test passed")
+
+
+if __name__ == "__main__":
+    run_rerank_chunking_test()
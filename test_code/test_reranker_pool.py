@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.rag.reranker import BGEReranker
+
+
+class FakeTEIHandler(BaseHTTPRequestHandler):
+    """模拟 TEI 的 /info 与 /rerank，统计探测次数和新建连接数"""
+
+    protocol_version = "HTTP/1.1"
+    info_calls = 0
+    connections = 0
+
+    def setup(self):
+        FakeTEIHandler.connections += 1
+        super().setup()
+
+    def _send_json(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/info":
+            FakeTEIHandler.info_calls += 1
+            self._send_json({"model_type": {"reranker": {}}, "model_id": "BAAI/bge-reranker-v2-m3"})
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self._send_json([{"index": i, "score": 1 / (i + 1)} for i in range(len(payload["texts"]))])
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_reranker_pool_test():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTEIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    async def scenario():
+        first = BGEReranker(base_url=base_url, batch_size=2, max_concurrent=1)
+        second = BGEReranker(base_url=base_url, batch_size=2, max_concurrent=1)
+        first.score_cache = second.score_cache = None
+
+        results = await first.rerank_async("q", ["a", "b", "c", "d"])
+        await second.rerank_async("q", ["e", "f"])
+        assert first._get_client() is second._get_client()
+        assert second.model_id == "BAAI/bge-reranker-v2-m3"
+        assert [item["index"] for item in results] == [0, 2, 1, 3], results
+        await first.close()
+
+    asyncio.run(scenario())
+    server.shutdown()
+
+    # 后端探测只发生一次，3 次 rerank 请求复用同一条 keep-alive 连接
+    assert FakeTEIHandler.info_calls == 1, FakeTEIHandler.info_calls
+    assert FakeTEIHandler.connections == 1, FakeTEIHandler.connections
+    print("BGEReranker connection pool test passed")
+
+
+if __name__ == "__main__":
+    run_reranker_pool_test()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.mcp.search_tool_mcp.search_cache import SearchResultCache
+
+
+def run_search_cache_test():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "search.sqlite3")
+        ttls = {"tavily_search": 60, "wikipedia_search": 0.2}
+        cache = SearchResultCache(ttls=ttls, max_entries=10, db_path=db_path)
+        papers = [{"title": "Attention Is All You Need", "url": "https://arxiv.org/abs/1706.03762"}]
+
+        # 规范化参数：大小写、多余空白不影响命中；下载类工具不缓存
+        cache.put("tavily_search", {"query": "Transformer  Architecture "}, papers)
+        hit = cache.get("tavily_search", {"query": "transformer architecture", "type": None})
+        assert hit is not None and hit[0] == papers and hit[1] >= 0
+        assert cache.get("exa_context_search", {"query": "transformer architecture"}) is None
+        cache.put("tavily_download", {"papers": papers}, papers)
+        assert cache.get_stats()["entries"] == 1
+
+        # 各工具独立 TTL
+        cache.put("wikipedia_search", {"query": "bert"}, papers)
+        assert cache.get("wikipedia_search", {"query": "bert"}) is not None
+        time.sleep(0.25)
+        assert cache.get("wikipedia_search", {"query": "bert"}) is None
+
+        # 内存层按条数淘汰，磁盘层仍可命中（模拟进程重启）
+        for i in range(20):
+            cache.put("tavily_search", {"query": f"q{i}"}, papers)
+        assert cache.get_stats()["entries"] <= 10
+        cache.close()
+        restarted = SearchResultCache(ttls=ttls, max_entries=10, db_path=db_path)
+        assert restarted.get("tavily_search", {"query": "q0"}) is not None
+        assert restarted.get("tavily_search", {"query": "TRANSFORMER architecture"}) is not None
+        stats = restarted.get_stats()
+        assert stats["hits"] == {"tavily_search": 2}, stats
+        restarted.close()
+
+        # 内存层按总字节数淘汰
+        small = SearchResultCache(ttls=ttls, max_bytes=300)
+        for i in range(5):
+            small.put("tavily_search", {"query": f"q{i}"}, papers)
+        assert small.get_stats()["bytes"] <= 300
+        assert small.get("tavily_search", {"query": "q4"}) is not None
+
+    print("SearchResultCache test passed")
+
+
+if __name__ == "__main__":
+    run_search_cache_test()
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.config import Config
+from tools.core_tools.sec_edgar import SECEdgarSearcher
+from tools.core_tools.sec_edgar_index import CompanyIndex, SECFilingCache
+
+TICKERS = {
+    "0": {"cik_str": 320193, "ticker": "AAPL", "title": "Apple Inc."},
+    "1": {"cik_str": 1045810, "ticker": "NVDA", "title": "NVIDIA CORP"},
+    "2": {"cik_str": 6951, "ticker": "AMAT", "title": "APPLIED MATERIALS INC /DE"},
+    "3": {"cik_str": 4962, "ticker": "AXP", "title": "AMERICAN EXPRESS CO"},
+    "4": {"cik_str": 1577552, "ticker": "BABA", "title": "Alibaba Group Holding Ltd"},
+    "5": {"cik_str": 9999999, "ticker": "APLE", "title": "Apple Hospitality REIT, Inc."},
+}
+requests_seen = []
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    requests_seen.append(request.url.path)
+    return httpx.Response(200, json=TICKERS)
+
+
+def run_company_index_test():
+    index = CompanyIndex(TICKERS)
+    assert len(index) == 6
+    assert index.lookup("aapl")["cik"] == "0000320193"
+    # 名称精确 / 前缀匹配，多个候选取排名靠前的公司
+    assert index.lookup("Apple")["ticker"] == "AAPL"
+    assert index.lookup("appl")["ticker"] == "AAPL"
+    assert index.lookup("Apple Hospitality")["ticker"] == "APLE"
+    # 单词前缀匹配与模糊匹配
+    assert index.lookup("express")["ticker"] == "AXP"
+    assert index.lookup("alibaba group")["ticker"] == "BABA"
+    assert index.lookup("Alibaba Grup Holding")["ticker"] == "BABA"
+    assert index.lookup("Tesla") is None
+    print("SEC company index test passed")
+
+
+async def run_sec_cache_test():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        Config.SEC_TICKER_CACHE_PATH = os.path.join(tmp_dir, "tickers.json")
+        Config.SEC_FILING_CACHE_PATH = os.path.join(tmp_dir, "filings.sqlite3")
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            # 首次下载并写入磁盘缓存，新进程（新实例）直接读取磁盘缓存
+            searcher = SECEdgarSearcher()
+            assert (await searcher._get_cik_by_ticker(client, "NVIDIA"))["ticker"] == "NVDA"
+            assert os.path.exists(Config.SEC_TICKER_CACHE_PATH) and len(requests_seen) == 1
+            assert (await SECEdgarSearcher()._get_cik_by_ticker(client, "AXP"))["cik"] == "0000004962"
+            assert len(requests_seen) == 1
+
+            # 缓存过期后重新下载；下载失败时退回过期缓存
+            os.utime(Config.SEC_TICKER_CACHE_PATH, (0, 0))
+            stale = SECEdgarSearcher()
+            async with httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(503))) as down:
+                assert (await stale._get_cik_by_ticker(down, "AAPL"))["ticker"] == "AAPL"
+            # 过期数据只沿用 SEC_TICKER_RETRY_INTERVAL，之后重新尝试刷新
+            remaining = stale._company_index_loaded_at + Config.SEC_TICKER_CACHE_TTL - time.time()
+            assert 0 < remaining <= Config.SEC_TICKER_RETRY_INTERVAL
+            stale._company_index_loaded_at -= Config.SEC_TICKER_RETRY_INTERVAL
+            assert (await stale._get_cik_by_ticker(client, "AAPL"))["ticker"] == "AAPL"
+            assert len(requests_seen) == 2
+
+        # 同一 accession number 的年报只下载、解析一次
+        searcher = SECEdgarSearcher()
+        fetched = []
+        html = "<p>ITEM 1. BUSINESS We design phones.</p><p>ITEM 1A. RISK FACTORS Competition.</p>"
+
+        async def fake_fetch(client, cik, filing_info):
+            fetched.append(filing_info["accession_number"])
+            return html
+
+        searcher._fetch_filing_html = fake_fetch
+        filing_info = {"accession_number": "000032019324000123", "accession_number_raw": "0000320193-24-000123",
+                       "form_type": "10-K", "filing_date": "2024-11-01"}
+        first = await searcher._get_filing_sections(None, "0000320193", filing_info)
+        assert "design phones" in first["business_description"]
+        again = await SECEdgarSearcher()._get_filing_sections(None, "0000320193", filing_info)
+        assert again == first and fetched == ["000032019324000123"]
+        cache = SECFilingCache(Config.SEC_FILING_CACHE_PATH)
+        assert cache.get_stats()["entries"] == 1
+        cache.close()
+        searcher._filing_cache.close()
+    print("SEC EDGAR cache test passed")
+
+
+if __name__ == "__main__":
+    run_company_index_test()
+    asyncio.run(run_sec_cache_test())
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import hashlib
+import os
+import sys
+import tempfile
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.streaming_download import hedged_download, stream_download
+
+PDF_BODY = b"%PDF-1.7\n" + b"x" * 50000
+sent_chunks = {"html": 0}
+
+
+async def html_body():
+    for _ in range(100):
+        sent_chunks["html"] += 1
+        yield b"<html>" + b"y" * 10000
+
+
+def handler(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path == "/paper.pdf":
+        return httpx.Response(200, content=PDF_BODY)
+    if path == "/login":
+        return httpx.Response(200, content=html_body())
+    if path == "/huge.pdf":
+        return httpx.Response(200, headers={"Content-Length": str(10 ** 9)}, content=b"%PDF")
+    if path == "/tiny.pdf":
+        return httpx.Response(200, content=b"%PDF-1.4 error")
+    if path == "/efetch.fcgi":
+        return httpx.Response(200, content=b"<?xml version='1.0'?><article/>")
+    return httpx.Response(404)
+
+
+async def run_streaming_download_test():
+    async with httpx.AsyncClient(base_url="https://example.org", transport=httpx.MockTransport(handler)) as client:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            target = os.path.join(tmp_dir, "paper.pdf")
+
+            # 有效 PDF：落盘并返回大小与 SHA-256
+            result = await stream_download(client, "/paper.pdf", target, min_bytes=10000, max_bytes=10 ** 6)
+            assert result is not None and result.size == len(PDF_BODY)
+            assert result.sha256 == hashlib.sha256(PDF_BODY).hexdigest()
+            with open(target, "rb") as f:
+                assert f.read() == PDF_BODY
+
+            # HTML 页面在第一个块后即中止，不会读完整个响应
+            other = os.path.join(tmp_dir, "other.pdf")
+            assert await stream_download(client, "/login", other) is None
+            assert sent_chunks["html"] <= 2, sent_chunks
+
+            # 超过大小上限、过小、非 200 均不落盘
+            assert await stream_download(client, "/huge.pdf", other, max_bytes=10 ** 6) is None
+            assert await stream_download(client, "/paper.pdf", other, max_bytes=20000) is None
+            assert await stream_download(client, "/tiny.pdf", other, min_bytes=10000) is None
+            assert await stream_download(client, "/missing.pdf", other) is None
+            # 格式错误的镜像链接（httpx.InvalidURL）同样只返回 None
+            assert await stream_download(client, "http://\x00/paper.pdf", other) is None
+            assert sorted(os.listdir(tmp_dir)) == ["paper.pdf"]
+
+            # 不校验文件头（PMC XML 全文）
+            xml_path = os.path.join(tmp_dir, "pmc.xml")
+            assert await stream_download(client, "/efetch.fcgi", xml_path, magic=None, params={"id": "1"}) is not None
+
+    print("Streaming download test passed")
+
+
+async def run_hedged_download_test():
+    started, cancelled = [], []
+
+    async def attempt(url):
+        started.append(url)
+        try:
+            if url.startswith("dead"):
+                await asyncio.sleep(5)  # 无响应的镜像
+                return None
+            if url.startswith("broken"):
+                return None  # 立即失败的镜像
+            await asyncio.sleep(0.05)
+            return f"file from {url}"
+        except asyncio.CancelledError:
+            cancelled.append(url)
+            raise
+
+    # 第一个镜像无响应：stagger 后启动下一个，胜出后取消无响应的下载
+    begin = time.monotonic()
+    winner = await hedged_download(["dead-1", "good-1", "good-2"], attempt, max_parallel=3, stagger=0.2)
+    assert winner == ("good-1", "file from good-1"), winner
+    assert time.monotonic() - begin < 1.0
+    assert cancelled == ["dead-1"] and "good-2" not in started
+
+    # 立即失败时不等待 stagger，直接启动下一个候选
+    started.clear()
+    begin = time.monotonic()
+    winner = await hedged_download(["broken-1", "broken-2", "good-3"], attempt, max_parallel=2, stagger=10)
+    assert winner[0] == "good-3" and time.monotonic() - begin < 1.0
+
+    # 全部失败返回 None
+    assert await hedged_download(["broken-1", "broken-1", ""], attempt) is None
+
+    print("Hedged download test passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_streaming_download_test())
+    asyncio.run(run_hedged_download_test())
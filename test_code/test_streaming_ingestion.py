@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+import tempfile
+from typing import Any, List, cast
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from llama_index.core.schema import TextNode
+
+from core.file_deduplicator import FileDeduplicator
+from core.rag.streaming_ingestion import StreamingIngestionPipeline
+
+
+class FakeProcessor:
+    def __init__(self, optional_file: str):
+        self.optional_file = optional_file
+        self.calls: List[List[str]] = []
+        self.optional_flags: List[bool] = []
+
+    async def get_nodes(self, documents, include_optional_file=True):
+        self.calls.append([doc["extra"]["saved_path"] for doc in documents])
+        self.optional_flags.append(include_optional_file)
+        return [TextNode(text=doc["extra"]["saved_path"]) for doc in documents]
+
+    async def get_optional_file_nodes(self):
+        with open(self.optional_file, "r", encoding="utf-8") as f:
+            return [TextNode(text=line.strip()) for line in f if line.strip()]
+
+
+class FakeIndex:
+    def __init__(self):
+        self.inserted: List[TextNode] = []
+
+    def insert_nodes(self, nodes):
+        self.inserted.extend(nodes)
+
+
+def write_doc(directory: str, name: str, text: str) -> dict:
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return {"title": name, "extra": {"saved_path": path}}
+
+
+async def run_streaming_ingestion_test():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        doc_a = write_doc(tmp_dir, "a.md", "transformer attention architecture for language models " * 20)
+        doc_a_dup = write_doc(tmp_dir, "a_dup.md", "transformer attention architecture for language models " * 20)
+        doc_b = write_doc(tmp_dir, "b.md", "photovoltaic module efficiency and solar cell degradation " * 20)
+
+        optional_file = os.path.join(tmp_dir, "context7_grep.json")
+        with open(optional_file, "w", encoding="utf-8") as f:
+            f.write("context7 first\n")
+        processor = FakeProcessor(optional_file)
+        index = FakeIndex()
+        state = {"index": None}
+        pipeline = StreamingIngestionPipeline(
+            document_processor=cast(Any, processor),
+            file_deduplicator=FileDeduplicator(similarity_threshold=0.8),
+            index_provider=lambda: state["index"],
+            index_poll_interval=0.01,
+        )
+
+        # 索引尚未就绪时，第一批结果只完成去重与切割
+        await pipeline.submit({"downloaded_papers": [doc_a]}, stage="first")
+        first_nodes = await pipeline.wait_processed("first")
+        assert [node.text for node in first_nodes] == [doc_a["extra"]["saved_path"]]
+        assert not index.inserted
+
+        # executor 在第一批结果之后继续追加可选工具结果
+        with open(optional_file, "a", encoding="utf-8") as f:
+            f.write("grep second\n")
+
+        # 索引就绪后，后续结果到达即入库，跨结果的重复文档被去掉
+        state["index"] = index
+        await pipeline.submit({"downloaded_papers": [doc_a_dup, doc_b]}, stage="second")
+        second_docs = await pipeline.wait_deduplicated("second")
+        assert [doc["title"] for doc in second_docs] == ["b.md"], second_docs
+
+        summary = await pipeline.finish()
+        assert summary["inserted"] == 4, summary
+        assert not summary["pending_nodes"]
+        assert summary["first_node_latency"] is not None
+        # 可选文件不随各批结果读取，而是在全部结果处理完后读取一次，包含后追加的内容
+        assert processor.optional_flags == [False, False]
+        assert [node.text for node in index.inserted[-2:]] == ["context7 first", "grep second"]
+
+    print("StreamingIngestionPipeline test passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_streaming_ingestion_test())
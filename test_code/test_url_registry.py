@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.url_registry import UrlRegistry
+
+
+async def run_url_registry_test():
+    registry = UrlRegistry(initial_urls=["https://seen.example/a"])
+    urls = [f"https://example.org/{i}" for i in range(20)]
+
+    async def executor(owner: str):
+        claimed = []
+        for url in urls:
+            if await registry.claim(url, owner):
+                claimed.append(url)
+            await asyncio.sleep(0)
+        return claimed
+
+    # 两个阶段的 executor 并发认领：每个 URL 恰好由一个 executor 下载
+    first, second = await asyncio.gather(executor("thread_executor_0"), executor("thread_executor_3"))
+    assert not set(first) & set(second)
+    assert sorted(first + second) == sorted(urls)
+
+    # 同一认领者重复认领返回 True；历史 URL 不可认领
+    owner = "thread_executor_0" if urls[0] in first else "thread_executor_3"
+    assert await registry.claim(urls[0], owner)
+    assert not await registry.claim(" https://seen.example/a ", "thread_executor_0")
+
+    # 释放后其他 executor 可以重新认领
+    await registry.release(urls[0], owner)
+    assert await registry.claim(urls[0], "thread_executor_9")
+    assert len(registry) == len(urls) + 1
+
+    # 两个阶段的 base_thread_id 带阶段后缀，第 i 个子问题的 executor 不会同名：同一 URL 只有一个阶段认领成功
+    shared = UrlRegistry()
+    first_owner, second_owner = "thread_first_executor_0", "thread_second_executor_0"
+    results = await asyncio.gather(
+        shared.claim("https://example.org/paper", first_owner),
+        shared.claim("https://example.org/paper", second_owner),
+    )
+    assert sorted(results) == [False, True]
+
+    print("UrlRegistry claim test passed")
+
+
+if __name__ == "__main__":
+    asyncio.run(run_url_registry_test())
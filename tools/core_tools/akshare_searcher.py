@@ -32,6 +32,8 @@ from typing import List, Union, Optional
 import akshare as ak
 
 from core.config import Config
+from core.download_registry import atomic_write_text
+from core.download_index import get_download_index
 from tools.core_tools.paper import Paper
 
 
@@ -258,7 +260,7 @@ class AkShareSearcher:
             content = self._paper_to_markdown(paper)
 
             # 保存文件
-            file_path = self._save_markdown(content, save_path, current_filename)
+            file_path = self._save_markdown(content, save_path, current_filename, url=paper.url)
             if "失败" in file_path:
                 file_path = "save_failed"
             # 更新 Paper 的 saved_path
@@ -347,7 +349,7 @@ class AkShareSearcher:
         # 如果为空，返回默认值
         return safe if safe else "unnamed"
 
-    def _save_markdown(self, content: str, save_path: str, filename: str) -> str:
+    def _save_markdown(self, content: str, save_path: str, filename: str, url: Optional[str] = None) -> str:
         """
         保存 Markdown 内容到文件
         
@@ -355,6 +357,7 @@ class AkShareSearcher:
             content: Markdown 内容
             save_path: 保存目录
             filename: 文件名
+            url: 原文链接，用于登记下载索引
             
         Returns:
             str: 完整文件路径，失败时返回错误信息
@@ -370,11 +373,14 @@ class AkShareSearcher:
                     raise IOError(error_msg)
             
             file_path = os.path.join(save_path, filename)
-            if os.path.exists(file_path):
-                print(f"文件已存在，跳过保存: {file_path}")
-                return file_path
-            with open(file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
+            index = get_download_index()
+            existing = index.lookup(url=url, directory=save_path)
+            if existing or os.path.exists(file_path):
+                existing = existing or file_path
+                print(f"文件已存在，跳过保存: {existing}")
+                return existing
+            atomic_write_text(file_path, content)
+            index.record(file_path, url=url, source="akshare")
             
             return file_path
         except IOError as e:
@@ -19,6 +19,8 @@ from exa_py import Exa
 from dotenv import load_dotenv
 
 from core.config import Config
+from core.download_registry import atomic_write_text
+from core.download_index import get_download_index
 from .paper import Paper
 
 load_dotenv()
@@ -342,16 +344,18 @@ class ExaSearcherSummary:
 
                 filename = f"exa_{self._sanitize_filename(title)}.md"
                 file_path = os.path.join(saved_path, filename)
-                if os.path.exists(file_path):
-                    print(f"文件已存在，跳过下载: {paper.title} -> {file_path}")
+                existing = get_download_index().lookup(url=paper.url, directory=saved_path)
+                if existing or os.path.exists(file_path):
+                    existing = existing or file_path
+                    print(f"文件已存在，跳过下载: {paper.title} -> {existing}")
                     if paper.extra is None:
                         paper.extra = {}
-                    paper.extra["saved_path"] = file_path
+                    paper.extra["saved_path"] = existing
                     continue
                 # 保存文件
                 markdown_content = self._generate_markdown(result_dict)
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(markdown_content)
+                atomic_write_text(file_path, markdown_content)
+                get_download_index().record(file_path, url=paper.url, source="exa")
 
                 # 设置 extra["saved_path"]
                 if paper.extra is None:
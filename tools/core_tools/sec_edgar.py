@@ -29,12 +29,17 @@ Version: 1.0.0
 
 import os
 import re
+import time
 import httpx
 from typing import List, Union, Optional, Dict
 from datetime import datetime
 
 from tools.core_tools.paper import Paper
 from core.config import Config
+from core.http_clients import get_host_client
+from core.download_registry import atomic_write_text
+from core.download_index import get_download_index
+from tools.core_tools.sec_edgar_index import CompanyIndex, SECFilingCache, load_cached_tickers, save_cached_tickers
 
 
 class SECEdgarSearcher:
@@ -64,39 +69,54 @@ class SECEdgarSearcher:
             "User-Agent": self.user_agent,
             "Accept": "application/json",
         }
-        # 缓存公司代码映射
-        self._ticker_cache: Optional[Dict] = None
+        # 公司代码 / 名称索引（company_tickers.json 同时缓存在磁盘，定期刷新）
+        self._company_index: Optional[CompanyIndex] = None
+        self._company_index_loaded_at = 0.0
+        # 年报章节解析结果，按 accession number 缓存
+        self._filing_cache = SECFilingCache(Config.SEC_FILING_CACHE_PATH)
 
+    def _get_client(self, url: str) -> httpx.AsyncClient:
+        """获取 url 所在主机（www.sec.gov / data.sec.gov）的共享客户端"""
+        return get_host_client(url, timeout=60.0)
 
-    async def _load_ticker_mapping(self, client: httpx.AsyncClient) -> Dict:
+
+    async def _load_ticker_mapping(self, client: httpx.AsyncClient) -> Optional[CompanyIndex]:
         """
-        加载股票代码到 CIK 的映射表
+        加载股票代码 / 公司名称到 CIK 的索引
+        
+        优先使用有效期内的磁盘缓存，过期后重新下载 company_tickers.json；
+        下载失败时退回过期的磁盘缓存
         
         Returns:
-            Dict: {ticker: {"cik": str, "name": str}, ...}
+            CompanyIndex: 公司索引，无可用数据时返回 None
         """
-        if self._ticker_cache is not None:
-            return self._ticker_cache
-        
-        url = f"{self.sec_url}/files/company_tickers.json"
-        try:
-            response = await client.get(url, headers=self.headers)
-            response.raise_for_status()
-            data = response.json()
-            
-            # 构建映射: ticker -> {cik, name}
-            self._ticker_cache = {}
-            for item in data.values():
-                ticker = item.get("ticker", "").upper()
-                cik = str(item.get("cik_str", "")).zfill(10)
-                name = item.get("title", "")
-                if ticker:
-                    self._ticker_cache[ticker] = {"cik": cik, "name": name}
-            
-            return self._ticker_cache
-        except Exception as e:
-            print(f"加载股票代码映射失败: {e}")
-            return {}
+        ttl = Config.SEC_TICKER_CACHE_TTL
+        if self._company_index is not None and time.time() - self._company_index_loaded_at < ttl:
+            return self._company_index
+        
+        path = Config.SEC_TICKER_CACHE_PATH
+        data = load_cached_tickers(path, ttl)
+        loaded_at = os.path.getmtime(path) if data is not None else time.time()
+        if data is None:
+            url = f"{self.sec_url}/files/company_tickers.json"
+            try:
+                response = await client.get(url, headers=self.headers)
+                response.raise_for_status()
+                data = response.json()
+                save_cached_tickers(path, data)
+            except Exception as e:
+                print(f"加载股票代码映射失败: {e}")
+                # 退回过期数据时只沿用 SEC_TICKER_RETRY_INTERVAL 秒，之后再次尝试刷新
+                loaded_at = time.time() - ttl + Config.SEC_TICKER_RETRY_INTERVAL
+                data = load_cached_tickers(path, None)
+                if data is None:
+                    if self._company_index is not None:
+                        self._company_index_loaded_at = loaded_at
+                    return self._company_index
+        
+        self._company_index = CompanyIndex(data)
+        self._company_index_loaded_at = loaded_at
+        return self._company_index
 
     async def _get_cik_by_ticker(
         self, 
@@ -113,24 +133,12 @@ class SECEdgarSearcher:
         Returns:
             Dict: {"cik": str, "name": str, "ticker": str} 或 None
         """
-        ticker_map = await self._load_ticker_mapping(client)
-        if not ticker_map:
+        company_index = await self._load_ticker_mapping(client)
+        if not company_index:
             return None
         
-        query_upper = query.upper().strip()
-        
-        # 精确匹配股票代码
-        if query_upper in ticker_map:
-            info = ticker_map[query_upper]
-            return {"cik": info["cik"], "name": info["name"], "ticker": query_upper}
-        
-        # 模糊匹配公司名称
-        query_lower = query.lower()
-        for ticker, info in ticker_map.items():
-            if query_lower in info["name"].lower():
-                return {"cik": info["cik"], "name": info["name"], "ticker": ticker}
-        
-        return None
+        # 股票代码精确匹配，其次公司名称精确 / 前缀 / 单词前缀 / 模糊匹配
+        return company_index.lookup(query)
 
     async def _get_company_submissions(
         self, 
@@ -231,6 +239,41 @@ class SECEdgarSearcher:
             print(f"下载 10-K 文件失败: {e}")
             return None
 
+    async def _get_filing_sections(
+        self, 
+        client: httpx.AsyncClient, 
+        cik: str, 
+        filing_info: Dict
+    ) -> Dict[str, str]:
+        """
+        获取年报的企业介绍、风险因素、MD&A 章节，按 accession number 缓存解析结果
+        
+        Args:
+            client: HTTP 客户端
+            cik: 公司 CIK
+            filing_info: 文件信息
+            
+        Returns:
+            Dict: {"business_description": str, "risk_factors": str, "mda": str}
+        """
+        accession = filing_info["accession_number"]
+        sections = self._filing_cache.get(accession)
+        if sections is not None:
+            print(f"命中年报解析缓存: {filing_info.get('accession_number_raw', accession)}")
+            return sections
+        
+        html = await self._fetch_filing_html(client, cik, filing_info)
+        if not html:
+            return {"business_description": "", "risk_factors": "", "mda": ""}
+        
+        sections = {
+            "business_description": self._extract_business_description(html),
+            "risk_factors": self._extract_risk_factors(html),
+            "mda": self._extract_mda(html),
+        }
+        self._filing_cache.put(accession, sections, filing_info, cik)
+        return sections
+
 
     def _clean_html(self, html: str) -> str:
         """
@@ -600,61 +643,56 @@ class SECEdgarSearcher:
         max_results = Config.SEC_NUM
         papers = []
         
-        async with httpx.AsyncClient(timeout=60.0) as client:
-            # 1. 获取公司 CIK
-            company_info = await self._get_cik_by_ticker(client, query)
-            if not company_info:
-                print(f"未找到公司: {query}")
-                return []
-            
-            cik = company_info["cik"]
-            print(f"找到公司: {company_info['name']} (CIK: {cik}, Ticker: {company_info['ticker']})")
-            
-            # 2. 获取公司提交历史
-            submissions = await self._get_company_submissions(client, cik)
-            if not submissions:
-                return []
-            
-            # 更新公司名称（使用 SEC 官方名称）
-            company_info["name"] = submissions.get("name", company_info["name"])
-            
-            # 3. 获取最新 10-K 信息
-            filing_info = self._get_latest_10k_info(submissions)
-            if not filing_info:
-                print(f"未找到年报文件 (10-K/20-F): {company_info['name']}")
-                return []
-            
-            print(f"找到 {filing_info.get('form_type', '10-K')} 文件: {filing_info['accession_number_raw']} ({filing_info['filing_date']})")
-            
-            # 4. 下载并解析年报 HTML
-            html = await self._fetch_filing_html(client, cik, filing_info)
-            
-            business_description = ""
-            risk_factors = ""
-            mda = ""
-            if html:
-                business_description = self._extract_business_description(html)
-                risk_factors = self._extract_risk_factors(html)
-                mda = self._extract_mda(html)
-                print(f"提取企业介绍: {len(business_description)} 字符")
-                print(f"提取风险因素: {len(risk_factors)} 字符")
-                print(f"提取 MD&A: {len(mda)} 字符")
-            
-            # 5. 获取财务快照
-            financial_snapshot = await self._get_financial_snapshot(client, cik)
-            if financial_snapshot.get("revenue"):
-                print(f"获取财务快照: 收入 ${financial_snapshot['revenue']:,.0f}")
-            
-            # 6. 映射到 Paper
-            paper = self._map_to_paper(
-                company_info,
-                filing_info,
-                business_description,
-                risk_factors,
-                mda,
-                financial_snapshot
-            )
-            papers.append(paper)
+        client = self._get_client(self.sec_url)
+        # 1. 获取公司 CIK
+        company_info = await self._get_cik_by_ticker(client, query)
+        if not company_info:
+            print(f"未找到公司: {query}")
+            return []
+            
+        cik = company_info["cik"]
+        print(f"找到公司: {company_info['name']} (CIK: {cik}, Ticker: {company_info['ticker']})")
+            
+        # 2. 获取公司提交历史
+        submissions = await self._get_company_submissions(self._get_client(self.base_url), cik)
+        if not submissions:
+            return []
+            
+        # 更新公司名称（使用 SEC 官方名称）
+        company_info["name"] = submissions.get("name", company_info["name"])
+            
+        # 3. 获取最新 10-K 信息
+        filing_info = self._get_latest_10k_info(submissions)
+        if not filing_info:
+            print(f"未找到年报文件 (10-K/20-F): {company_info['name']}")
+            return []
+            
+        print(f"找到 {filing_info.get('form_type', '10-K')} 文件: {filing_info['accession_number_raw']} ({filing_info['filing_date']})")
+            
+        # 4. 下载并解析年报 HTML（同一份年报只解析一次）
+        sections = await self._get_filing_sections(client, cik, filing_info)
+        business_description = sections["business_description"]
+        risk_factors = sections["risk_factors"]
+        mda = sections["mda"]
+        print(f"提取企业介绍: {len(business_description)} 字符")
+        print(f"提取风险因素: {len(risk_factors)} 字符")
+        print(f"提取 MD&A: {len(mda)} 字符")
+            
+        # 5. 获取财务快照
+        financial_snapshot = await self._get_financial_snapshot(self._get_client(self.base_url), cik)
+        if financial_snapshot.get("revenue"):
+            print(f"获取财务快照: 收入 ${financial_snapshot['revenue']:,.0f}")
+            
+        # 6. 映射到 Paper
+        paper = self._map_to_paper(
+            company_info,
+            filing_info,
+            business_description,
+            risk_factors,
+            mda,
+            financial_snapshot
+        )
+        papers.append(paper)
         
         return papers[:max_results]
 
@@ -809,12 +847,15 @@ class SECEdgarSearcher:
                 filename = f"sec_edgar_{datetime.now().strftime('%Y%m%d%H%M%S')}.md"
             
             file_path = os.path.join(save_path, filename)
-            if os.path.exists(file_path):
-                print(f"文件已存在，跳过下载: {paper.title} -> {file_path}")
-                return file_path
+            index = get_download_index()
+            existing = index.lookup(url=paper.url, directory=save_path)
+            if existing or os.path.exists(file_path):
+                existing = existing or file_path
+                print(f"文件已存在，跳过下载: {paper.title} -> {existing}")
+                return existing
             
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(markdown_content)
+            atomic_write_text(file_path, markdown_content)
+            index.record(file_path, url=paper.url, source="sec_edgar")
             
             return file_path
             
@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+SEC EDGAR 公司索引与年报解析缓存
+
+- CompanyIndex: 由 company_tickers.json 构建的公司索引。股票代码精确匹配为字典查询，
+  公司名称按规范化名称与名称中各单词建立有序表，前缀匹配用二分查找，最后才退回模糊匹配；
+  多个候选时取 company_tickers.json 中排名靠前（市值较大）的公司，与原先顺序扫描的结果一致
+- company_tickers.json 原始数据缓存到磁盘，有效期内 MCP 服务器进程重启不再重新下载，
+  下载失败时退回过期的磁盘缓存
+- SECFilingCache: 按 accession number 缓存年报章节的解析结果（SQLite），
+  已提交的年报内容不会变化，同一份 10-K / 20-F 只下载、解析一次
+"""
+
+import difflib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.download_registry import atomic_write_text
+from core.log_config import setup_logger
+
+logger = setup_logger(__name__)
+
+# 公司名称中不参与匹配的后缀
+_NAME_SUFFIXES = {
+    "inc", "incorporated", "corp", "corporation", "co", "company", "ltd", "limited",
+    "plc", "llc", "lp", "sa", "ag", "nv", "se", "the",
+}
+
+
+def normalize_company_name(name: str) -> str:
+    """规范化公司名称：转小写、去标点、去掉 Inc. / Corp. / Ltd. 等后缀"""
+    words = re.sub(r"[^\w\s]", " ", (name or "").lower()).split()
+    while len(words) > 1 and words[-1] in _NAME_SUFFIXES:
+        words.pop()
+    if len(words) > 1 and words[0] == "the":
+        words.pop(0)
+    return " ".join(words)
+
+
+class CompanyIndex:
+    """股票代码 / 公司名称 -> CIK 的内存索引"""
+
+    def __init__(self, data: Dict[str, Any]):
+        """由 company_tickers.json 的内容构建索引
+
+        Args:
+            data: {"0": {"cik_str": int, "ticker": str, "title": str}, ...}，按 SEC 给出的顺序排名
+        """
+        # rank -> {"cik", "name", "ticker"}
+        self._companies: List[Dict[str, str]] = []
+        self._by_ticker: Dict[str, int] = {}
+        names: List[Tuple[str, int]] = []
+        words: List[Tuple[str, int]] = []
+        for item in data.values():
+            ticker = str(item.get("ticker", "")).upper()
+            if not ticker or ticker in self._by_ticker:
+                continue
+            rank = len(self._companies)
+            name = item.get("title", "")
+            self._companies.append({"cik": str(item.get("cik_str", "")).zfill(10), "name": name, "ticker": ticker})
+            self._by_ticker[ticker] = rank
+            normalized = normalize_company_name(name)
+            if normalized:
+                names.append((normalized, rank))
+                words.extend((word, rank) for word in set(normalized.split()))
+        self._names = sorted(names)
+        self._words = sorted(words)
+        self._name_ranks: Dict[str, int] = {}
+        for normalized, rank in names:
+            self._name_ranks.setdefault(normalized, rank)
+
+    def __len__(self) -> int:
+        return len(self._companies)
+
+    @staticmethod
+    def _prefix_ranks(entries: List[Tuple[str, int]], prefix: str) -> List[int]:
+        """有序表中以 prefix 开头的条目的排名"""
+        ranks = []
+        i = bisect_left(entries, (prefix, -1))
+        while i < len(entries) and entries[i][0].startswith(prefix):
+            ranks.append(entries[i][1])
+            i += 1
+        return ranks
+
+    def _result(self, rank: int) -> Dict[str, str]:
+        return dict(self._companies[rank])
+
+    def lookup(self, query: str) -> Optional[Dict[str, str]]:
+        """按股票代码或公司名称查找公司
+
+        Args:
+            query: 股票代码或公司名称
+
+        Returns:
+            Dict: {"cik": str, "name": str, "ticker": str} 或 None
+        """
+        query = (query or "").strip()
+        if not query:
+            return None
+        # 1. 股票代码精确匹配
+        rank = self._by_ticker.get(query.upper())
+        if rank is not None:
+            return self._result(rank)
+        normalized = normalize_company_name(query)
+        if not normalized:
+            return None
+        # 2. 规范化名称精确匹配
+        rank = self._name_ranks.get(normalized)
+        if rank is not None:
+            return self._result(rank)
+        # 3. 名称前缀匹配（"apple" -> "apple inc"）
+        ranks = self._prefix_ranks(self._names, normalized)
+        if ranks:
+            return self._result(min(ranks))
+        # 4. 名称中的单词前缀匹配，查询的每个单词都要命中（"nvidia" / "american express"）
+        tokens = normalized.split()
+        candidates = set(self._prefix_ranks(self._words, tokens[0]))
+        for token in tokens[1:]:
+            if not candidates:
+                break
+            candidates &= set(self._prefix_ranks(self._words, token))
+        if candidates:
+            return self._result(min(candidates))
+        # 5. 模糊匹配（拼写错误）
+        matches = difflib.get_close_matches(normalized, self._name_ranks.keys(), n=1, cutoff=0.85)
+        if matches:
+            return self._result(self._name_ranks[matches[0]])
+        return None
+
+
+def load_cached_tickers(path: str, max_age: Optional[float]) -> Optional[Dict[str, Any]]:
+    """读取磁盘上的 company_tickers.json 缓存
+
+    Args:
+        path: 缓存文件路径
+        max_age: 有效期（秒），为 None 时忽略有效期（下载失败时使用过期缓存）
+
+    Returns:
+        缓存内容，文件不存在、已过期或损坏时返回 None
+    """
+    try:
+        if max_age is not None and time.time() - os.path.getmtime(path) > max_age:
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_cached_tickers(path: str, data: Dict[str, Any]) -> None:
+    """原子写入 company_tickers.json 缓存（写入失败只记录日志）"""
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        atomic_write_text(path, json.dumps(data))
+    except OSError as e:
+        logger.warning(f"写入 SEC 公司代码缓存失败: {e}")
+
+
+class SECFilingCache:
+    """按 accession number 缓存年报章节解析结果（线程安全）"""
+
+    SECTIONS = ("business_description", "risk_factors", "mda")
+
+    def __init__(self, db_path: str):
+        """初始化
+
+        Args:
+            db_path: SQLite 文件路径
+        """
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        """延迟建立连接（调用方持有锁）"""
+        if self._conn is None:
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sec_filings ("
+                "accession TEXT PRIMARY KEY, cik TEXT, form_type TEXT, filing_date TEXT, "
+                "sections TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def get(self, accession: str) -> Optional[Dict[str, str]]:
+        """读取已解析的章节
+
+        Args:
+            accession: accession number（不含连字符）
+
+        Returns:
+            {"business_description": str, "risk_factors": str, "mda": str}，未缓存时返回 None
+        """
+        try:
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT sections FROM sec_filings WHERE accession = ?", (accession,)
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                self.hits += 1
+            return json.loads(row[0])
+        except (sqlite3.Error, ValueError) as e:
+            logger.warning(f"读取年报解析缓存失败: {accession}, {e}")
+            return None
+
+    def put(self, accession: str, sections: Dict[str, str], filing_info: Optional[Dict] = None,
+            cik: Optional[str] = None) -> None:
+        """写入解析结果（写入失败只记录日志）
+
+        Args:
+            accession: accession number（不含连字符）
+            sections: 各章节文本
+            filing_info: 年报文件信息（form_type / filing_date）
+            cik: 公司 CIK
+        """
+        filing_info = filing_info or {}
+        payload = json.dumps({key: sections.get(key, "") for key in self.SECTIONS}, ensure_ascii=False)
+        try:
+            with self._lock:
+                conn = self._connect()
+                conn.execute(
+                    "INSERT OR REPLACE INTO sec_filings VALUES (?, ?, ?, ?, ?, ?)",
+                    (accession, cik, filing_info.get("form_type"), filing_info.get("filing_date"), payload, time.time())
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"写入年报解析缓存失败: {accession}, {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """命中 / 未命中次数与缓存条数"""
+        try:
+            with self._lock:
+                (count,) = self._connect().execute("SELECT COUNT(*) FROM sec_filings").fetchone()
+        except sqlite3.Error:
+            count = 0
+        return {"hits": self.hits, "misses": self.misses, "entries": count}
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
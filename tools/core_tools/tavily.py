@@ -10,6 +10,8 @@ from typing import List
 
 from tavily import TavilyClient
 from core.config.config import Config
+from core.download_registry import atomic_write_text, canonical_download_key, download_registry
+from core.download_index import get_download_index
 from .paper import Paper
 from dotenv import load_dotenv
 load_dotenv()  # 从 .env 文件加载环境变量
@@ -107,22 +109,14 @@ class TavilySearch:
 
                 # 构造完整路径
                 file_path = os.path.join(save_dir, filename)
-                # 如果文件已存在，跳过保存,可以防止多个executoragent共同编辑一个文件
-                if os.path.exists(file_path):
-                    print(f"文件已存在，跳过下载: {paper.title} -> {file_path}")
-                    if paper.extra is None:
-                        paper.extra = {}
-                    paper.extra["saved_path"] = file_path
-                    saved_papers.append(paper)
-                    continue
-                # abstract 中保存的是 raw_content
-                markdown_content = paper.abstract
-                # 写入文件
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(markdown_content)
+                # 同一 URL 的并发下载只执行一次，其余 executor 等待并复用结果
+                key = canonical_download_key(url=paper.url) or file_path
+                saved_path = download_registry.run(key, self._save_markdown, paper, file_path)
 
                 # 更新 Paper 对象的 saved_path
-                paper.extra['saved_path'] = file_path
+                if paper.extra is None:
+                    paper.extra = {}
+                paper.extra['saved_path'] = saved_path
                 saved_papers.append(paper)
 
             except Exception as e:
@@ -131,6 +125,22 @@ class TavilySearch:
 
         return saved_papers
 
+    def _save_markdown(self, paper: Paper, file_path: str) -> str:
+        """将 raw_content 原子写入 Markdown 文件，同一 URL 或文件已存在时直接复用"""
+        index = get_download_index()
+        existing = index.lookup(url=paper.url, directory=os.path.dirname(file_path))
+        if existing:
+            print(f"URL 已下载，跳过下载: {paper.title} -> {existing}")
+            return existing
+        # 如果文件已存在，跳过保存,可以防止多个executoragent共同编辑一个文件
+        if os.path.exists(file_path):
+            print(f"文件已存在，跳过下载: {paper.title} -> {file_path}")
+            return file_path
+        # abstract 中保存的是 raw_content
+        atomic_write_text(file_path, paper.abstract)
+        index.record(file_path, url=paper.url, source="tavily")
+        return file_path
+
     def _sanitize_filename(self, filename: str) -> str:
         """清理文件名，移除非法字符"""
         filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
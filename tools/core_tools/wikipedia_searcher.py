@@ -7,6 +7,9 @@ from datetime import datetime
 
 from tools.core_tools.paper import Paper
 from core.config import Config
+from core.http_clients import get_host_client
+from core.download_registry import atomic_write_text, canonical_download_key, download_registry
+from core.download_index import get_download_index
 
 
 class WikipediaSearcher:
@@ -44,6 +47,10 @@ class WikipediaSearcher:
         lang = language or self.language
         return f"https://{lang}.wikipedia.org/w/api.php"
 
+    def _get_client(self, language: str = None) -> httpx.AsyncClient:
+        """获取该语言 Wikipedia 主机的共享客户端（进程内复用 keep-alive 连接）"""
+        return get_host_client(self._get_api_url(language), timeout=self.timeout, headers=self.headers)
+
     async def _search_articles(self, query: str, limit: int, language: str) -> List[dict]:
         """搜索 Wikipedia 词条"""
         api_url = self._get_api_url(language)
@@ -56,18 +63,18 @@ class WikipediaSearcher:
         }
         
         try:
-            async with httpx.AsyncClient(headers=self.headers, timeout=self.timeout) as client:
-                response = await client.get(api_url, params=params)
-                if response.status_code != 200:
-                    print(f"Wikipedia API 请求失败: HTTP {response.status_code}")
-                    return []
+            client = self._get_client(language)
+            response = await client.get(api_url, params=params)
+            if response.status_code != 200:
+                print(f"Wikipedia API 请求失败: HTTP {response.status_code}")
+                return []
                 
-                data = response.json()
-                if "query" not in data or "search" not in data["query"]:
-                    return []
+            data = response.json()
+            if "query" not in data or "search" not in data["query"]:
+                return []
                 
-                return [{"pageid": item.get("pageid"), "title": item.get("title", "")} 
-                        for item in data["query"]["search"]]
+            return [{"pageid": item.get("pageid"), "title": item.get("title", "")} 
+                    for item in data["query"]["search"]]
         except Exception as e:
             print(f"Wikipedia API 请求异常: {e}")
             return []
@@ -169,20 +176,20 @@ class WikipediaSearcher:
         
         # 异步并发获取词条内容
         papers = []
-        async with httpx.AsyncClient(headers=self.headers, timeout=self.timeout) as client:
-            tasks = [
-                self._get_article_content(client, item["pageid"], lang)
-                for item in search_results if item.get("pageid")
-            ]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+        client = self._get_client(lang)
+        tasks = [
+            self._get_article_content(client, item["pageid"], lang)
+            for item in search_results if item.get("pageid")
+        ]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
             
-            for article_data in results:
-                if isinstance(article_data, Exception):
-                    continue
-                if article_data and article_data.get("extract"):
-                    paper = self._map_to_paper(article_data, lang)
-                    papers.append(paper)
-                    print(f"  ✓ {paper.title}")
+        for article_data in results:
+            if isinstance(article_data, Exception):
+                continue
+            if article_data and article_data.get("extract"):
+                paper = self._map_to_paper(article_data, lang)
+                papers.append(paper)
+                print(f"  ✓ {paper.title}")
         
         print(f"成功获取 {len(papers)} 个词条")
         return papers
@@ -223,12 +230,26 @@ class WikipediaSearcher:
         try:
             os.makedirs(save_path, exist_ok=True)
             file_path = os.path.join(save_path, filename)
-            with open(file_path, "w", encoding="utf-8") as f:
-                f.write(content)
-            return file_path
+            return atomic_write_text(file_path, content)
         except Exception as e:
             return f"Error: {e}"
 
+    async def _export_markdown(self, paper: Paper, save_path: str, filename: str) -> str:
+        """导出单个词条，文件已存在时直接复用"""
+        file_path = os.path.join(save_path, filename)
+        index = get_download_index()
+        existing = index.lookup(url=paper.url, directory=save_path)
+        # 检查文件是否已存在
+        if existing or os.path.exists(file_path):
+            existing = existing or file_path
+            print(f"文件已存在，跳过下载: {paper.title} -> {existing}")
+            return existing
+        markdown_content = self._generate_markdown(paper)
+        saved_path = self._save_file(markdown_content, save_path, filename)
+        if not saved_path.startswith("Error:"):
+            index.record(saved_path, url=paper.url, source="wikipedia")
+        return saved_path
+
     async def download(self, papers: Union[Paper, List[Paper]], save_path: str =Config.DOC_SAVE_PATH) -> List[Paper]:
         """
         将 Paper 对象导出为 Markdown 文件
@@ -250,16 +271,9 @@ class WikipediaSearcher:
             filename = f"wiki_{paper.paper_id}.md"
             file_path = os.path.join(save_path, filename)
             
-            # 检查文件是否已存在
-            if os.path.exists(file_path):
-                print(f"文件已存在，跳过下载: {paper.title} -> {file_path}")
-                if paper.extra is None:
-                    paper.extra = {}
-                paper.extra["saved_path"] = file_path
-                continue
-            
-            markdown_content = self._generate_markdown(paper)
-            saved_path = self._save_file(markdown_content, save_path, filename)
+            # 同一词条的并发导出只执行一次，其余 executor 等待并复用结果
+            key = canonical_download_key(url=paper.url) or file_path
+            saved_path = await download_registry.arun(key, self._export_markdown, paper, save_path, filename)
             
             if paper.extra is None:
                 paper.extra = {}
@@ -7,6 +7,9 @@ import feedparser
 from .paper import Paper
 import os
 from core.config.config import Config
+from core.streaming_download import stream_download
+from core.download_index import get_download_index
+from core.http_clients import get_host_client
 
 class PaperSource:
     """Abstract base class for paper sources"""
@@ -23,7 +26,12 @@ class ArxivSearcher(PaperSource):
     """Searcher for arXiv papers"""
     def __init__(self):
         self.BASE_URL = "https://export.arxiv.org/api/query"
-        self.session = httpx.AsyncClient(timeout=30.0)
+
+    @property
+    def session(self) -> httpx.AsyncClient:
+        """arXiv 检索 API 主机的共享客户端（复用 keep-alive 连接）"""
+        return get_host_client(self.BASE_URL, timeout=30.0)
+
     async  def search(self, query: str, max_results: int = 10) -> List[Paper]:
         params = {
             'search_query': query,
@@ -91,18 +99,20 @@ class ArxivSearcher(PaperSource):
         print(f"共 {len(papers_with_pdf)} 篇论文待下载")
 
         success_count = 0
+        index = get_download_index()
         for paper in paper_list:
+            existing = index.lookup(doi=paper.doi, url=paper.pdf_url, directory=save_path)
             if not paper.pdf_url:
                 saved_path = "No fulltext available"
+            elif existing:
+                saved_path = existing
+                print(f"文件已存在，跳过下载: {saved_path}")
+                success_count += 1
             else:
                 try:
                     # 添加延迟避免频繁请求
                     await asyncio.sleep(0.5)
 
-                    # 下载 PDF
-                    response = await self.session.get(paper.pdf_url, timeout=30.0)
-                    response.raise_for_status()
-
                     # 使用 DOI 命名，将 / 替换为 _ 避免路径问题
                     if paper.doi:
                         filename = paper.doi.replace('/', '_')
@@ -110,9 +120,14 @@ class ArxivSearcher(PaperSource):
                         filename = paper.paper_id
                     output_file = os.path.join(save_path, f"{filename}.pdf")
 
-                    # 保存文件
-                    with open(output_file, 'wb') as f:
-                        f.write(response.content)
+                    # 流式下载 PDF 并保存文件
+                    client = get_host_client(paper.pdf_url, timeout=30.0)
+                    downloaded = await stream_download(client, paper.pdf_url, output_file, timeout=30.0)
+                    if downloaded is None:
+                        raise ValueError(f"PDF 下载失败或内容无效: {paper.pdf_url}")
+                    index.record(
+                        output_file, doi=paper.doi, url=paper.pdf_url, source="arxiv", content_hash=downloaded.sha256
+                    )
                     saved_path = output_file
                     print(f"已保存: {saved_path}")
                     success_count += 1
@@ -41,6 +41,7 @@ from datetime import datetime
 
 from tools.core_tools.paper import Paper
 from core.config import Config
+from core.http_clients import get_host_client
 
 
 class CrunchbaseSearcher:
@@ -281,18 +282,18 @@ class CrunchbaseSearcher:
         """
         papers = []
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # 调用 _search_organizations 获取组织列表
-            organizations = await self._search_organizations(client, query, limit)
+        client = get_host_client(self.base_url, timeout=30.0)
+        # 调用 _search_organizations 获取组织列表
+        organizations = await self._search_organizations(client, query, limit)
             
-            # 遍历调用 _map_to_paper 转换为 Paper 列表
-            for org in organizations:
-                try:
-                    paper = self._map_to_paper(org)
-                    papers.append(paper)
-                except Exception as e:
-                    print(f"解析公司数据失败: {e}")
-                    continue
+        # 遍历调用 _map_to_paper 转换为 Paper 列表
+        for org in organizations:
+            try:
+                paper = self._map_to_paper(org)
+                papers.append(paper)
+            except Exception as e:
+                print(f"解析公司数据失败: {e}")
+                continue
         
         return papers
 
@@ -17,6 +17,10 @@ from datetime import datetime
 import asyncio
 from .paper import Paper
 from core.config.base import Config
+from core.download_registry import canonical_download_key, download_registry
+from core.streaming_download import StreamedFile, hedged_download, stream_download
+from core.download_index import get_download_index
+from core.http_clients import get_download_client, get_host_client
 
 
 class OpenAlexSearcher:
@@ -288,20 +292,6 @@ class OpenAlexSearcher:
             headers["Referer"] = referer
         return headers
 
-    def _is_valid_pdf(self, content: bytes) -> bool:
-        """
-        检查下载的内容是否为有效的 PDF 文件
-        
-        Args:
-            content: 下载的文件内容
-            
-        Returns:
-            bool: 是否为有效 PDF
-        """
-        if len(content) < 4:
-            return False
-        return content[:4] == b'%PDF'
-
     def _find_existing_paper_by_doi(self, save_path: str, doi: str) -> Optional[str]:
         """
         在保存目录中查找是否已存在具有相同 DOI 的文件
@@ -325,15 +315,14 @@ class OpenAlexSearcher:
         if os.path.exists(expected_path):
             return expected_path
         
-        # 遍历目录中的所有 PDF 文件，检查文件名是否包含该 DOI
-        try:
-            for filename in os.listdir(save_path):
-                if filename.endswith(".pdf") and safe_doi in filename:
-                    return os.path.join(save_path, filename)
-        except Exception:
-            pass
-        
-        return None
+        # 查询下载索引（其他搜索器以不同文件名保存的同一 DOI 论文）
+        index = get_download_index()
+        existing = index.lookup(doi=doi, directory=save_path)
+        if existing:
+            return existing
+        # 索引建立之前已下载的文件：一次性补登记后按文件名中的 DOI 片段查找
+        index.backfill_directory(save_path)
+        return index.lookup_by_filename(safe_doi, directory=save_path)
 
     def _get_all_pdf_urls(self, paper: Paper) -> List[str]:
         """
@@ -380,9 +369,9 @@ class OpenAlexSearcher:
         url: str, 
         file_path: str,
         referer: str = None
-    ) -> bool:
+    ) -> Optional[StreamedFile]:
         """
-        尝试从单个 URL 下载文件
+        尝试从单个 URL 流式下载文件（读到文件头即校验 %PDF，超过大小上限时中止）
         
         Args:
             client: HTTP 客户端
@@ -391,39 +380,17 @@ class OpenAlexSearcher:
             referer: Referer 头
             
         Returns:
-            bool: 是否下载成功
+            Optional[StreamedFile]: 下载成功时返回文件信息，否则返回 None
         """
-        try:
-            headers = self._get_browser_headers(referer)
-            
-            response = await client.get(
-                url,
-                headers=headers,
-                follow_redirects=True,
-                timeout=30.0
-            )
-            
-            if response.status_code != 200:
-                return False
-            
-            content = response.content
-            
-            # 检查文件大小（PDF 通常大于 10KB）
-            if len(content) < 10000:
-                return False
-            
-            # 验证是否为有效 PDF
-            if not self._is_valid_pdf(content):
-                return False
-            
-            # 保存文件
-            with open(file_path, "wb") as f:
-                f.write(content)
-            
-            return True
-            
-        except Exception:
-            return False
+        # PDF 通常大于 10KB，更小的响应多为错误页
+        return await stream_download(
+            client,
+            url,
+            file_path,
+            min_bytes=Config.DOWNLOAD_MIN_PDF_BYTES,
+            headers=self._get_browser_headers(referer),
+            timeout=30.0
+        )
 
     async def _download_file(
         self,
@@ -433,7 +400,7 @@ class OpenAlexSearcher:
         max_retries: int = 3
     ) -> str:
         """
-        下载单个文件，带多源重试机制
+        下载单个文件；同一 DOI/URL 的并发下载只执行一次，其余调用方等待并复用结果
 
         Args:
             client: HTTP 客户端
@@ -441,6 +408,28 @@ class OpenAlexSearcher:
             save_path: 保存目录
             max_retries: 每个 URL 的最大重试次数
 
+        Returns:
+            str: 文件保存路径或 "No fulltext available"
+        """
+        key = canonical_download_key(url=paper.pdf_url, doi=paper.doi)
+        return await download_registry.arun(key, self._fetch_file, client, paper, save_path, max_retries)
+
+    async def _fetch_file(
+        self,
+        client: httpx.AsyncClient,
+        paper: Paper,
+        save_path: str,
+        max_retries: int = 3
+    ) -> str:
+        """
+        下载单个文件，带多源重试机制
+
+        Args:
+            client: HTTP 客户端
+            paper: Paper 对象
+            save_path: 保存目录
+            max_retries: 每个 URL 的最大重试次数（仅串行模式，对冲模式下每个链接尝试一次）
+
         Returns:
             str: 文件保存路径或 "No fulltext available"
         """
@@ -480,6 +469,26 @@ class OpenAlexSearcher:
         if alt_url and alt_url not in urls_to_try:
             urls_to_try.insert(1, alt_url)  # 插入到第二位
         
+        from urllib.parse import urlparse
+
+        async def record(url: str, downloaded: StreamedFile) -> str:
+            await asyncio.to_thread(
+                get_download_index().record, file_path, doi=paper.doi, url=url,
+                source="openalex", content_hash=downloaded.sha256
+            )
+            return file_path
+
+        if Config.HEDGED_DOWNLOAD_ENABLED:
+            # 对冲下载：按优先级错开启动多个链接，第一个有效 PDF 胜出，其余取消
+            async def attempt_url(url: str) -> Optional[StreamedFile]:
+                parsed = urlparse(url)
+                return await self._try_download_url(client, url, file_path, f"{parsed.scheme}://{parsed.netloc}/")
+
+            winner = await hedged_download(urls_to_try, attempt_url)
+            if winner:
+                return await record(*winner)
+            return "No fulltext available"
+        
         tried_urls = set()
         
         for url in urls_to_try:
@@ -488,7 +497,6 @@ class OpenAlexSearcher:
             tried_urls.add(url)
             
             # 从 URL 提取 referer
-            from urllib.parse import urlparse
             parsed = urlparse(url)
             referer = f"{parsed.scheme}://{parsed.netloc}/"
             
@@ -498,8 +506,9 @@ class OpenAlexSearcher:
                     delay = random.uniform(1, 3) * attempt
                     await asyncio.sleep(delay)
                 
-                if await self._try_download_url(client, url, file_path, referer):
-                    return file_path
+                downloaded = await self._try_download_url(client, url, file_path, referer)
+                if downloaded:
+                    return await record(url, downloaded)
         
         return "No fulltext available"
 
@@ -595,18 +604,18 @@ class OpenAlexSearcher:
 
         papers = []
         
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # 调用 _search_works 获取 Work 列表
-            works = await self._search_works(client, query, limit, sort_by, filter_params)
+        client = get_host_client(self.base_url, timeout=30.0)
+        # 调用 _search_works 获取 Work 列表
+        works = await self._search_works(client, query, limit, sort_by, filter_params)
             
-            # 遍历调用 _map_to_paper 转换为 Paper 列表
-            for work in works:
-                try:
-                    paper = self._map_to_paper(work)
-                    papers.append(paper)
-                except Exception as e:
-                    print(f"Error mapping work to paper: {e}")
-                    continue
+        # 遍历调用 _map_to_paper 转换为 Paper 列表
+        for work in works:
+            try:
+                paper = self._map_to_paper(work)
+                papers.append(paper)
+            except Exception as e:
+                print(f"Error mapping work to paper: {e}")
+                continue
         
         return papers
 
@@ -644,22 +653,22 @@ class OpenAlexSearcher:
         papers_with_pdf = [p for p in paper_list if p.pdf_url]
         print(f"共 {len(papers_with_pdf)} 篇论文待下载")
         
-        # 创建 httpx.AsyncClient 并下载文件
+        # 使用共享的下载客户端（跨调用复用各镜像主机的 keep-alive 连接）
         success_count = 0
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            for paper in paper_list:
-                # 调用 _download_file 下载文件
-                saved_path = await self._download_file(client, paper, save_path)
+        client = get_download_client(timeout=30.0)
+        for paper in paper_list:
+            # 调用 _download_file 下载文件
+            saved_path = await self._download_file(client, paper, save_path)
                 
-                # 更新 Paper.extra["saved_path"]
-                if paper.extra is None:
-                    paper.extra = {}
-                paper.extra["saved_path"] = saved_path
+            # 更新 Paper.extra["saved_path"]
+            if paper.extra is None:
+                paper.extra = {}
+            paper.extra["saved_path"] = saved_path
                 
-                # 打印成功下载的文件路径
-                if saved_path and saved_path != "No fulltext available":
-                    print(f"已保存: {saved_path}")
-                    success_count += 1
+            # 打印成功下载的文件路径
+            if saved_path and saved_path != "No fulltext available":
+                print(f"已保存: {saved_path}")
+                success_count += 1
         
         print(f"下载完成: {success_count}/{len(papers_with_pdf)}")
         
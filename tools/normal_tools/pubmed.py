@@ -3,6 +3,9 @@ import httpx
 import xmltodict
 import os
 from core.config import Config
+from core.streaming_download import stream_download
+from core.download_index import get_download_index
+from core.http_clients import get_download_client, get_host_client
 from datetime import datetime
 from typing import List, Optional, Union
 from tools.core_tools.paper import Paper
@@ -45,28 +48,28 @@ class PubMedSearcher:
                 - extra: 额外元数据（如 pmcid）
 
         """
-        async with httpx.AsyncClient(timeout=30.0, headers=self.headers) as client:
-            # Step 1: 检索 ID 列表
-            print(f"正在检索关键词: {query}...")
-            pmids = await self._search_ids(client, query, limit)
-            if not pmids:
-                print("未找到相关文献。")
-                return []
-
-            # Step 2: 获取元数据并解析为 Paper 对象
-            print(f"正在获取 {len(pmids)} 篇文献的元数据...")
-            papers = await self._fetch_and_parse(client, pmids)
-
-            # Step 3: 相关性筛选
-            final_results = []
-            for paper in papers:
-                if self._check_relevance(query, paper.abstract):
-                    print(f"匹配成功: {paper.title[:50]}...")
-                    final_results.append(paper)
-                else:
-                    print(f"跳过不相关文献: {paper.title[:50]}")
+        client = get_host_client(self.base_url, timeout=30.0, headers=self.headers)
+        # Step 1: 检索 ID 列表
+        print(f"正在检索关键词: {query}...")
+        pmids = await self._search_ids(client, query, limit)
+        if not pmids:
+            print("未找到相关文献。")
+            return []
+
+        # Step 2: 获取元数据并解析为 Paper 对象
+        print(f"正在获取 {len(pmids)} 篇文献的元数据...")
+        papers = await self._fetch_and_parse(client, pmids)
+
+        # Step 3: 相关性筛选
+        final_results = []
+        for paper in papers:
+            if self._check_relevance(query, paper.abstract):
+                print(f"匹配成功: {paper.title[:50]}...")
+                final_results.append(paper)
+            else:
+                print(f"跳过不相关文献: {paper.title[:50]}")
 
-            return final_results
+        return final_results
 
     async def download(
         self, 
@@ -103,14 +106,14 @@ class PubMedSearcher:
         if not os.path.exists(save_path):
             os.makedirs(save_path)
         
-        # 创建 HTTP 客户端并下载文件
-        async with httpx.AsyncClient(timeout=30.0, headers=self.headers) as client:
-            for paper in paper_list:
-                saved_path = await self._download_file(client, paper, save_path)
-                if paper.extra is None:
-                    paper.extra = {}
-                paper.extra["saved_path"] = saved_path
-                print(f"下载完成: {paper.title[:50]}... -> {saved_path}")
+        # 使用共享的下载客户端（PDF 所在主机不固定，请求头逐个请求传入）
+        client = get_download_client(timeout=30.0)
+        for paper in paper_list:
+            saved_path = await self._download_file(client, paper, save_path)
+            if paper.extra is None:
+                paper.extra = {}
+            paper.extra["saved_path"] = saved_path
+            print(f"下载完成: {paper.title[:50]}... -> {saved_path}")
         
         return paper_list
 
@@ -308,31 +311,39 @@ class PubMedSearcher:
         Returns:
             str: 文件保存路径（下载成功时）或 "No fulltext available"（下载失败或无链接时）
         """
+        index = get_download_index()
+        existing = index.lookup(doi=paper.doi, url=paper.pdf_url or paper.url, directory=save_path)
+        if existing:
+            print(f"文件已存在，跳过下载: {existing}")
+            return existing
+
         # 尝试下载 PDF (如果有 pdf_url)
         if paper.pdf_url:
             file_path = os.path.join(save_path, f"{paper.paper_id}.pdf")
-            try:
-                resp = await client.get(paper.pdf_url, follow_redirects=True)
-                if resp.status_code == 200:
-                    with open(file_path, "wb") as f:
-                        f.write(resp.content)
-                    return file_path
-            except Exception as e:
-                print(f"PDF 下载失败: {e}")
+            downloaded = await stream_download(client, paper.pdf_url, file_path, headers=self.headers)
+            if downloaded:
+                index.record(
+                    file_path, doi=paper.doi, url=paper.pdf_url, source="pubmed", content_hash=downloaded.sha256
+                )
+                return file_path
+            print(f"PDF 下载失败或内容无效: {paper.pdf_url}")
 
         # 如果没有 PDF 或下载失败，尝试获取 XML 全文作为 fallback
         pmcid = paper.extra.get("pmcid") if paper.extra else None
         if pmcid:
-            try:
-                params = {"db": "pmc", "id": pmcid, "retmode": "xml", "email": self.email}
-                resp = await client.get(f"{self.base_url}/efetch.fcgi", params=params)
-                if resp.status_code == 200:
-                    file_path = os.path.join(save_path, f"{paper.paper_id}.xml")
-                    with open(file_path, "w", encoding="utf-8") as f:
-                        f.write(resp.text)
-                    return file_path
-            except Exception as e:
-                print(f"XML 下载失败: {e}")
+            params = {"db": "pmc", "id": pmcid, "retmode": "xml", "email": self.email}
+            file_path = os.path.join(save_path, f"{paper.paper_id}.xml")
+            # XML 全文不校验文件头，仍受大小上限约束
+            downloaded = await stream_download(
+                client, f"{self.base_url}/efetch.fcgi", file_path, magic=None, params=params, headers=self.headers
+            )
+            if downloaded:
+                index.record(
+                    file_path, doi=paper.doi, url=paper.pdf_url or paper.url, source="pmc",
+                    content_hash=downloaded.sha256
+                )
+                return file_path
+            print(f"XML 下载失败: {pmcid}")
 
         return "No fulltext available"
 
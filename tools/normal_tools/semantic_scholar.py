@@ -25,6 +25,9 @@ from datetime import datetime
 from dotenv import load_dotenv
 from tools.core_tools.paper import Paper
 from core.config import Config
+from core.streaming_download import StreamedFile, hedged_download, stream_download
+from core.download_index import get_download_index
+from core.http_clients import get_download_client, get_host_client
 import asyncio
 load_dotenv()
 class SemanticScholarSearcher:
@@ -274,10 +277,6 @@ class SemanticScholarSearcher:
             "Accept-Language": "en-US,en;q=0.9",
         }
 
-    def _is_valid_pdf(self, content: bytes) -> bool:
-        """检查内容是否为有效 PDF"""
-        return len(content) > 10000 and content[:4] == b'%PDF'
-
     def _find_existing_paper_by_doi(self, save_path: str, doi: str) -> Optional[str]:
         """
         在保存目录中查找是否已存在具有相同 DOI 的文件
@@ -301,15 +300,14 @@ class SemanticScholarSearcher:
         if os.path.exists(expected_path):
             return expected_path
         
-        # 遍历目录中的所有 PDF 文件，检查文件名是否包含该 DOI
-        try:
-            for filename in os.listdir(save_path):
-                if filename.endswith(".pdf") and safe_doi in filename:
-                    return os.path.join(save_path, filename)
-        except Exception:
-            pass
-        
-        return None
+        # 查询下载索引（其他搜索器以不同文件名保存的同一 DOI 论文）
+        index = get_download_index()
+        existing = index.lookup(doi=doi, directory=save_path)
+        if existing:
+            return existing
+        # 索引建立之前已下载的文件：一次性补登记后按文件名中的 DOI 片段查找
+        index.backfill_directory(save_path)
+        return index.lookup_by_filename(safe_doi, directory=save_path)
 
     def _get_alternative_pdf_urls(self, paper: Paper) -> List[str]:
         """
@@ -367,25 +365,16 @@ class SemanticScholarSearcher:
         
         return None
 
-    async def _try_download_url(self, client: httpx.AsyncClient, url: str, file_path: str) -> bool:
-        """尝试从单个 URL 下载文件"""
-        try:
-            headers = self._get_browser_headers()
-            response = await client.get(url, headers=headers, follow_redirects=True, timeout=15.0)
-            
-            if response.status_code != 200:
-                return False
-            
-            content = response.content
-            if not self._is_valid_pdf(content):
-                return False
-            
-            with open(file_path, "wb") as f:
-                f.write(content)
-            
-            return True
-        except Exception:
-            return False
+    async def _try_download_url(self, client: httpx.AsyncClient, url: str, file_path: str) -> Optional[StreamedFile]:
+        """尝试从单个 URL 流式下载文件（读到文件头即校验 %PDF，超过大小上限时中止）"""
+        return await stream_download(
+            client,
+            url,
+            file_path,
+            min_bytes=Config.DOWNLOAD_MIN_PDF_BYTES,
+            headers=self._get_browser_headers(),
+            timeout=15.0
+        )
 
     async def _download_file(
         self, 
@@ -455,23 +444,23 @@ class SemanticScholarSearcher:
         high_priority_urls = [u for u in urls_to_try if "arxiv.org" in u or "ncbi.nlm.nih.gov/pmc" in u]
         medium_priority_urls = [u for u in urls_to_try if u not in high_priority_urls]
 
-        async def try_download_stage(url_list):
-            """尝试某一阶段的 URL 列表"""
-            if not url_list:
+        async def try_download_with_retry(url):
+            """对单个 URL 进行重试下载"""
+            if url in tried_urls:
                 return None
 
-            async def try_download_with_retry(url):
-                """对单个 URL 进行重试下载"""
-                if url in tried_urls:
-                    return None
+            for attempt in range(max_retries):
+                if attempt > 0:
+                    await asyncio.sleep(1)
 
-                for attempt in range(max_retries):
-                    if attempt > 0:
-                        await asyncio.sleep(1)
+                if await self._try_download_url(client, url, file_path):
+                    return url
 
-                    if await self._try_download_url(client, url, file_path):
-                        return url
+            return None
 
+        async def try_download_stage(url_list):
+            """尝试某一阶段的 URL 列表"""
+            if not url_list:
                 return None
 
             # 并发执行当前阶段的所有 URL 尝试
@@ -485,14 +474,22 @@ class SemanticScholarSearcher:
 
             return None
 
-        # Stage 1: 先尝试高成功率源
-        result = await try_download_stage(high_priority_urls)
-        if result:
-            return file_path
+        if Config.HEDGED_DOWNLOAD_ENABLED:
+            # 对冲下载：高成功率源排在前面先启动，错开启动后续链接，第一个有效 PDF 胜出，其余取消
+            winner = await hedged_download(high_priority_urls + medium_priority_urls, try_download_with_retry)
+            result = winner[0] if winner else None
+        else:
+            # Stage 1: 先尝试高成功率源
+            result = await try_download_stage(high_priority_urls)
+
+            # Stage 2: 高成功率源都失败后，尝试中等成功率源
+            if not result:
+                result = await try_download_stage(medium_priority_urls)
 
-        # Stage 2: 高成功率源都失败后，尝试中等成功率源
-        result = await try_download_stage(medium_priority_urls)
         if result:
+            await asyncio.to_thread(
+                get_download_index().record, file_path, doi=doi, url=result, source="semantic_scholar"
+            )
             return file_path
 
         return "No fulltext available"
@@ -513,19 +510,19 @@ class SemanticScholarSearcher:
         
         papers = []
         
-        # 创建 httpx.AsyncClient
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            # 调用 _search_papers 获取 Paper 数据列表
-            paper_data_list = await self._search_papers(client, query, limit)
+        # 使用 Semantic Scholar API 主机的共享客户端
+        client = get_host_client(self.base_url, timeout=30.0)
+        # 调用 _search_papers 获取 Paper 数据列表
+        paper_data_list = await self._search_papers(client, query, limit)
             
-            # 遍历调用 _map_to_paper 转换为 Paper 列表
-            for paper_data in paper_data_list:
-                try:
-                    paper = self._map_to_paper(paper_data)
-                    papers.append(paper)
-                except Exception as e:
-                    print(f"解析论文数据失败: {e}")
-                    continue
+        # 遍历调用 _map_to_paper 转换为 Paper 列表
+        for paper_data in paper_data_list:
+            try:
+                paper = self._map_to_paper(paper_data)
+                papers.append(paper)
+            except Exception as e:
+                print(f"解析论文数据失败: {e}")
+                continue
         
         return papers
 
@@ -563,39 +560,35 @@ class SemanticScholarSearcher:
         papers_with_pdf = [p for p in paper_list if p.pdf_url]
         print(f"共 {len(papers_with_pdf)} 篇论文待下载")
 
-        # 创建 httpx.AsyncClient 并并发下载
+        # 使用共享的下载客户端并发下载（跨调用复用各镜像主机的 keep-alive 连接）
         success_count = 0
-        async with httpx.AsyncClient(
-            timeout=15.0,
-            follow_redirects=True,
-            limits=httpx.Limits(max_connections=50, max_keepalive_connections=20)
-        ) as client:
-            # 并发下载所有论文
-            async def download_single_paper(paper):
-                """下载单个论文的辅助函数"""
-                saved_path = await self._download_file(client, paper, save_path)
-                # 更新 Paper.extra["saved_path"]
-                if paper.extra is None:
-                    paper.extra = {}
-                paper.extra["saved_path"] = saved_path
-                return saved_path
-
-            # 使用 gather 并发执行所有下载任务
-            tasks = [download_single_paper(paper) for paper in paper_list]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-
-            # 处理结果
-            for i, result in enumerate(results):
-                if isinstance(result, Exception):
-                    logger.error(f"下载第 {i+1} 篇论文失败: {result}")
-                    # 设置失败状态
-                    if paper_list[i].extra is None:
-                        paper_list[i].extra = {}
-                    paper_list[i].extra["saved_path"] = "No fulltext available"
-                elif result:
-                    if result != "No fulltext available":
-                        print(f"已保存: {result}")
-                        success_count += 1
+        client = get_download_client(timeout=15.0)
+        # 并发下载所有论文
+        async def download_single_paper(paper):
+            """下载单个论文的辅助函数"""
+            saved_path = await self._download_file(client, paper, save_path)
+            # 更新 Paper.extra["saved_path"]
+            if paper.extra is None:
+                paper.extra = {}
+            paper.extra["saved_path"] = saved_path
+            return saved_path
+
+        # 使用 gather 并发执行所有下载任务
+        tasks = [download_single_paper(paper) for paper in paper_list]
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        # 处理结果
+        for i, result in enumerate(results):
+            if isinstance(result, Exception):
+                logger.error(f"下载第 {i+1} 篇论文失败: {result}")
+                # 设置失败状态
+                if paper_list[i].extra is None:
+                    paper_list[i].extra = {}
+                paper_list[i].extra["saved_path"] = "No fulltext available"
+            elif result:
+                if result != "No fulltext available":
+                    print(f"已保存: {result}")
+                    success_count += 1
 
         print(f"下载完成: {success_count}/{len(papers_with_pdf)}")
         